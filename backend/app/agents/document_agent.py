@@ -91,9 +91,10 @@ class DocumentAgent:
         
 Your job is to:
 1. First, use get_database_schema to understand what tables and columns are available
-2. Use execute_sql_query to run SQL queries to answer questions
-3. Use check_missing_values when asked about data quality
-4. Provide clear, accurate answers based on the data
+2. Use get_column_statistics to see value ranges, distinct counts and common values of a table's columns (instead of exploratory queries)
+3. Use execute_sql_query to run SQL queries to answer questions
+4. Use check_missing_values when asked about data quality (missing values, inconsistencies, duplicates, outliers)
+5. Provide clear, accurate answers based on the data
 
 IMPORTANT SQL GUIDELINES:
 1. QUOTING RULES (CRITICAL):
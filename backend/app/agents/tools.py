@@ -1,4 +1,6 @@
 from langchain_core.tools import tool
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import List
 import pandas as pd
 from app.core.logger import logger
@@ -7,6 +9,9 @@ from app.core.logger import logger
 # Global reference to processor (will be set by main app)
 excel_processor = None
 
+# Processor of the session the agent is currently answering for
+_session_processor: ContextVar = ContextVar("session_processor", default=None)
+
 
 def set_processor(processor):
     """Set the global excel processor instance"""
@@ -14,24 +19,58 @@ def set_processor(processor):
     excel_processor = processor
 
 
+def get_processor():
+    """Get the processor of the current session (falls back to the global one)"""
+    return _session_processor.get() or excel_processor
+
+
+@contextmanager
+def use_processor(processor):
+    """Run the tools against a session's processor within this context"""
+    token = _session_processor.set(processor)
+    try:
+        yield processor
+    finally:
+        _session_processor.reset(token)
+
+
+# Tables described per get_database_schema call
+SCHEMA_PAGE_SIZE = 50
+
+# Rows fetched by execute_sql_query for queries without a LIMIT
+QUERY_ROW_LIMIT = 1000
+
+
 @tool
-def get_database_schema() -> str:
-    """Get the schema of all available database tables including column names and types.
-    Use this first to understand what data is available."""
+def get_database_schema(name_filter: str = "", offset: int = 0) -> str:
+    """Get the schema of the available database tables including column names and types.
+    Use this first to understand what data is available.
+    
+    Args:
+        name_filter: Only tables whose name contains this text (or matches this glob pattern, e.g. "sales_*")
+        offset: Number of matching tables to skip, to read the next page of a large schema
+        
+    Returns:
+        Description of the tables
+    """
     logger.info("[bold magenta]🔧 Tool called: get_database_schema[/bold magenta]", extra={"markup": True})
     
-    schema = excel_processor.get_schema()
+    text, total = get_processor().get_schema_text(name_filter or None, offset, SCHEMA_PAGE_SIZE)
     
-    result = "Available Tables:\n\n"
-    for table_name, info in schema.items():
-        result += f"Table: {table_name}\n"
-        result += f"  Rows: {info['row_count']}\n"
-        result += f"  Columns:\n"
-        for col, dtype in zip(info['columns'], info['types']):
-            result += f"    - {col} ({dtype})\n"
+    if total == 0:
+        return f"No tables match '{name_filter}'." if name_filter else "No tables are loaded."
+    if offset >= total:
+        return f"There are only {total} matching tables."
+    
+    result = "Available Tables:\n\n" + text + "\n"
+    shown = min(total - offset, SCHEMA_PAGE_SIZE)
+    if shown < total:
+        result += f"Showing tables {offset + 1}-{offset + shown} of {total}."
+        if offset + shown < total:
+            result += f" Call again with offset={offset + shown} for more, or use name_filter."
         result += "\n"
     
-    logger.info(f"[green]✓ Returned schema for {len(schema)} tables[/green]", extra={"markup": True})
+    logger.info(f"[green]✓ Returned schema for {shown} of {total} tables[/green]", extra={"markup": True})
     return result
 
 
@@ -39,6 +78,9 @@ def get_database_schema() -> str:
 def execute_sql_query(query: str) -> str:
     """Execute a SQL query on the database and return results.
     
+    Queries without a LIMIT return at most 1000 rows. Queries that join
+    tables without a join condition are rejected.
+    
     Args:
         query: SQL query to execute
         
@@ -48,13 +90,18 @@ def execute_sql_query(query: str) -> str:
     logger.info(f"[bold magenta]🔧 Tool called: execute_sql_query[/bold magenta]", extra={"markup": True})
     
     try:
-        result_df = excel_processor.execute_query(query)
+        result_df = get_processor().execute_query(query, row_limit=QUERY_ROW_LIMIT)
         
         if result_df.empty:
             return "Query returned no results."
         
         # Format results
         result_str = result_df.to_string(index=False, max_rows=100)
+        if result_df.attrs.get("truncated"):
+            result_str += (
+                f"\n\n(Only the first {QUERY_ROW_LIMIT} rows were fetched; the query returns more. "
+                "Aggregate or filter to get the rows that answer the question.)"
+            )
         logger.info(f"[green]✓ Query executed successfully, {len(result_df)} rows returned[/green]", extra={"markup": True})
         return result_str
         
@@ -78,7 +125,7 @@ def preview_table(table_name: str, num_rows: int = 5) -> str:
     logger.info(f"[bold magenta]🔧 Tool called: preview_table ({table_name})[/bold magenta]", extra={"markup": True})
     
     try:
-        df = excel_processor.get_table_preview(table_name, num_rows)
+        df = get_processor().get_table_preview(table_name, num_rows)
         result = df.to_string(index=False)
         logger.info(f"[green]✓ Preview retrieved[/green]", extra={"markup": True})
         return result
@@ -88,31 +135,106 @@ def preview_table(table_name: str, num_rows: int = 5) -> str:
         return error_msg
 
 
+def _format_value(value) -> str:
+    """Compact rendering of a statistic"""
+    if isinstance(value, float):
+        return f"{value:,.4g}"
+    return str(value)
+
+
+@tool
+def get_column_statistics(table_name: str) -> str:
+    """Get precomputed statistics for every column of a table: NULL count,
+    distinct count, min/max, mean/standard deviation and most frequent values.
+    Use this instead of exploratory SELECT DISTINCT/MIN/MAX queries.
+    
+    Args:
+        table_name: Name of the table
+        
+    Returns:
+        Statistics per column
+    """
+    logger.info(f"[bold magenta]🔧 Tool called: get_column_statistics ({table_name})[/bold magenta]", extra={"markup": True})
+    
+    try:
+        stats = get_processor().get_column_stats(table_name)
+    except KeyError:
+        return f"Unknown table: {table_name}"
+    
+    if not stats:
+        return f"No statistics were gathered for table {table_name}."
+    
+    result = f"Column statistics for {table_name}:\n\n"
+    for column, info in stats.items():
+        approx = "~" if info['distinct_approximate'] else ""
+        result += f"- {column}: {info['null_count']} NULL, {approx}{info['distinct_count']} distinct"
+        if info['min'] is not None:
+            result += f", range {_format_value(info['min'])} to {_format_value(info['max'])}"
+        if info['mean'] is not None:
+            result += f", mean {_format_value(info['mean'])}"
+            if info['std'] is not None:
+                result += f" (std {_format_value(info['std'])})"
+        if info['top_values']:
+            top = ", ".join(f"{_format_value(value)} ({count})" for value, count in info['top_values'])
+            result += f"\n    top values: {top}"
+        result += "\n"
+    
+    logger.info(f"[green]✓ Returned statistics for {len(stats)} columns[/green]", extra={"markup": True})
+    return result
+
+
 @tool
 def check_missing_values() -> str:
-    """Check for missing values (NULL/NaN) across all tables.
+    """Check data quality across all tables: missing values (NULL/NaN), cells
+    whose type does not match their column, duplicate keys, outliers and
+    categorical values spelled inconsistently within or across tables.
     
     Returns:
-        Report of missing values
+        Data-quality report
     """
     logger.info("[bold magenta]🔧 Tool called: check_missing_values[/bold magenta]", extra={"markup": True})
     
-    report = "Missing Values Report:\n\n"
+    quality = get_processor().check_data_quality()
+    
+    report = "Data Quality Report:\n\n"
     
-    for table_name, df in excel_processor.tables.items():
-        missing = df.isnull().sum()
-        missing_cols = missing[missing > 0]
+    for table_name, issues in quality["tables"].items():
+        lines = []
+        for col, count in issues["nulls"].items():
+            lines.append(f"  - {col}: {count} missing values")
+        for col, info in issues["type_mismatches"].items():
+            examples = ", ".join(repr(value) for value in info["examples"])
+            lines.append(f"  - {col}: {info['count']} cells are not a {info['expected']} (e.g. {examples})")
+        for col, info in issues["duplicate_keys"].items():
+            examples = ", ".join(_format_value(value) for value in info["examples"])
+            lines.append(f"  - {col}: {info['count']} rows share a key value (e.g. {examples})")
+        if issues["duplicate_rows"]:
+            lines.append(f"  - {issues['duplicate_rows']} duplicate rows")
+        for col, info in issues["outliers"].items():
+            examples = ", ".join(_format_value(value) for value in info["examples"])
+            lines.append(
+                f"  - {col}: {info['count']} outliers outside "
+                f"[{_format_value(info['low_fence'])}, {_format_value(info['high_fence'])}] (e.g. {examples})"
+            )
         
-        if not missing_cols.empty:
-            report += f"Table: {table_name}\n"
-            for col, count in missing_cols.items():
-                report += f"  - {col}: {count} missing values\n"
-            report += "\n"
+        if lines:
+            sampled = f" (first {issues['rows_checked']} rows checked)" if issues["sampled"] else ""
+            report += f"Table: {table_name}{sampled}\n" + "\n".join(lines) + "\n\n"
+    
+    if quality["inconsistent_spellings"]:
+        report += "Inconsistent spellings:\n"
+        for issue in quality["inconsistent_spellings"]:
+            variants = ", ".join(f"{value!r} ({count})" for value, count in issue["variants"].items())
+            report += f"  - {issue['column']} in {', '.join(issue['tables'])}: {variants}\n"
+        report += "\n"
+    
+    for table_name, error in quality["errors"].items():
+        report += f"Table {table_name} could not be checked: {error}\n"
     
-    if report == "Missing Values Report:\n\n":
-        report += "No missing values found in any table."
+    if report == "Data Quality Report:\n\n":
+        report += "No data-quality issues found in any table."
     
-    logger.info("[green]✓ Missing values check completed[/green]", extra={"markup": True})
+    logger.info("[green]✓ Data-quality check completed[/green]", extra={"markup": True})
     return report
 
 
@@ -121,5 +243,6 @@ tools = [
     get_database_schema,
     execute_sql_query,
     preview_table,
+    get_column_statistics,
     check_missing_values
 ]
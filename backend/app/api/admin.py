@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from app.core.slow_queries import SlowQueryLog
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+# This will be set by main.py
+slow_query_log: Optional[SlowQueryLog] = None
+
+
+def set_slow_query_log(log: Optional[SlowQueryLog]):
+    """Set the shared slow-query log"""
+    global slow_query_log
+    slow_query_log = log
+
+
+@router.get("/slow_queries")
+async def get_slow_queries(recent: int = Query(0, ge=0, le=500)):
+    """Get slow queries aggregated by fingerprint (queries differing only in literals)
+    
+    Args:
+        recent: Also return this many of the latest individual entries
+        
+    Returns:
+        Per fingerprint: count, durations, latest plan and suggested indexes
+    """
+    if slow_query_log is None:
+        raise HTTPException(status_code=404, detail="The slow-query log is disabled")
+    
+    result = {
+        "threshold_ms": int(slow_query_log.threshold_s * 1000),
+        "queries": slow_query_log.aggregate()
+    }
+    if recent:
+        result["recent"] = slow_query_log.recent(recent)
+    return result
+
+
+@router.delete("/slow_queries")
+async def clear_slow_queries():
+    """Clear the slow-query log"""
+    if slow_query_log is None:
+        raise HTTPException(status_code=404, detail="The slow-query log is disabled")
+    
+    slow_query_log.clear()
+    return {"status": "success"}
@@ -1,31 +1,40 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 import httpx
+import shutil
 import tempfile
 from app.models.schemas import AgentExcelRequest, AgentExcelLocalRequest, AgentExcelResponse
+from app.core.excel_processor import SUPPORTED_EXTENSIONS
+from app.core.ingestion import IngestionError
+from app.core.sessions import SessionQuotaError
+from app.api.sessions import get_session_id
+from app.agents.tools import use_processor
+from app.core.fast_json import FastJSONResponse
 from app.core.logger import logger
 from app.agents.document_agent import get_agent
 from datetime import datetime
 
-router = APIRouter(prefix="/agent_excel", tags=["agent_excel"])
+router = APIRouter(prefix="/agent_excel", tags=["agent_excel"], default_response_class=FastJSONResponse)
 
 # This will be set by main.py
-excel_processor = None
+session_manager = None
 
 
-def set_excel_processor(processor):
-    """Set the global excel processor"""
-    global excel_processor
-    excel_processor = processor
+def set_session_manager(manager):
+    """Set the global session manager"""
+    global session_manager
+    session_manager = manager
 
 
 @router.post("/", response_model=AgentExcelResponse)
-async def process_excel_query(request: AgentExcelRequest):
+async def process_excel_query(request: AgentExcelRequest, session_id: Optional[str] = Depends(get_session_id)):
     """Process Excel files from URLs and answer a query
     
     Args:
         request: AgentExcelRequest with query and either excel_urls or openaiFileIdRefs
+        session_id: Session from the X-Session-ID / openai-conversation-id header
         
     Returns:
         AgentExcelResponse with answer and metadata
@@ -70,59 +79,69 @@ async def process_excel_query(request: AgentExcelRequest):
                 logger.info(f"[cyan]📥 Downloading file {idx + 1}/{len(excel_urls)}:[/cyan] {url}", extra={"markup": True})
                 
                 try:
-                    response = await client.get(url)
-                    response.raise_for_status()
-                    
                     # Determine filename from URL or use default
-                    filename = url.split("/")[-1]
-                    if not filename.endswith(('.xlsx', '.xls')):
+                    filename = url.split("?")[0].split("/")[-1]
+                    if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
                         filename = f"file_{idx + 1}.xlsx"
                     
-                    # Save to temporary file
-                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-                    temp_file.write(response.content)
-                    temp_file.close()
-                    
+                    # Stream to a temporary file instead of holding the download in memory
+                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=Path(filename).suffix.lower())
                     downloaded_files.append((temp_file.name, filename))
+                    try:
+                        async with client.stream("GET", url) as response:
+                            response.raise_for_status()
+                            async for block in response.aiter_bytes():
+                                temp_file.write(block)
+                    finally:
+                        temp_file.close()
                     
                 except httpx.HTTPError as e:
                     logger.error(f"[red]Failed to download {url}: {e}[/red]", extra={"markup": True})
                     raise HTTPException(status_code=400, detail=f"Failed to download {url}: {str(e)}")
         
-        # Process downloaded files
-        for temp_path, original_name in downloaded_files:
-            logger.info(f"[blue]📊 Processing:[/blue] {original_name}", extra={"markup": True})
+        with session_manager.use(request.session_id or session_id) as excel_processor, use_processor(excel_processor):
+            # Process downloaded files (sheets are parsed in parallel)
+            original_names = {Path(temp_path): name for temp_path, name in downloaded_files}
+            logger.info(f"[blue]📊 Processing:[/blue] {', '.join(original_names.values())}", extra={"markup": True})
             
             try:
-                tables = excel_processor.load_excel_file(Path(temp_path))
-                all_tables.extend(tables)
-                logger.info(f"[green]✓ Created {len(tables)} table(s) from {original_name}[/green]", extra={"markup": True})
-            except Exception as e:
+                results = await run_in_threadpool(excel_processor.load_excel_files, list(original_names))
+            except IngestionError as e:
+                original_name = original_names.get(e.file_path, e.file_path.name)
                 logger.error(f"[red]Error processing {original_name}: {e}[/red]", extra={"markup": True})
                 raise HTTPException(status_code=500, detail=f"Error processing {original_name}: {str(e)}")
-        
-        # Execute query
-        logger.info(f"[yellow]❓ Executing query:[/yellow] {request.query}", extra={"markup": True})
-        
-        try:
-            agent = get_agent()
-            result = agent.query(request.query)
             
-            logger.info("[bold green]✓ Query executed successfully[/bold green]", extra={"markup": True})
+            try:
+                await run_in_threadpool(session_manager.check_quota, excel_processor, [table for tables in results.values() for table in tables])
+            except SessionQuotaError as e:
+                raise HTTPException(status_code=413, detail=str(e))
             
-            return AgentExcelResponse(
-                query=request.query,
-                answer=result["answer"],
-                sql_queries=result.get("sql_queries"),
-                model=result["model"],
-                files_processed=len(excel_urls),
-                tables_created=all_tables,
-                timestamp=datetime.now()
-            )
+            for temp_path, tables in results.items():
+                all_tables.extend(tables)
+                logger.info(f"[green]✓ Created {len(tables)} table(s) from {original_names[temp_path]}[/green]", extra={"markup": True})
+            
+            # Execute query
+            logger.info(f"[yellow]❓ Executing query:[/yellow] {request.query}", extra={"markup": True})
             
-        except Exception as e:
-            logger.error(f"[bold red]✗ Error executing query:[/bold red] {e}", extra={"markup": True})
-            raise HTTPException(status_code=500, detail=f"Query execution error: {str(e)}")
+            try:
+                agent = get_agent()
+                result = await run_in_threadpool(agent.query, request.query)
+                
+                logger.info("[bold green]✓ Query executed successfully[/bold green]", extra={"markup": True})
+                
+                return AgentExcelResponse(
+                    query=request.query,
+                    answer=result["answer"],
+                    sql_queries=result.get("sql_queries"),
+                    model=result["model"],
+                    files_processed=len(excel_urls),
+                    tables_created=all_tables,
+                    timestamp=datetime.now()
+                )
+                
+            except Exception as e:
+                logger.error(f"[bold red]✗ Error executing query:[/bold red] {e}", extra={"markup": True})
+                raise HTTPException(status_code=500, detail=f"Query execution error: {str(e)}")
     
     finally:
         # Clean up temporary files
@@ -137,13 +156,17 @@ async def process_excel_query(request: AgentExcelRequest):
 @router.post("/local", response_model=AgentExcelResponse)
 async def process_excel_local_query(
     query: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    session_id: Optional[str] = Form(None),
+    header_session_id: Optional[str] = Depends(get_session_id)
 ):
     """Process uploaded Excel files from local machine and answer a query
     
     Args:
         query: User's question (form field)
-        files: List of Excel files to upload from local machine (form files)
+        files: Excel, CSV/TSV or NDJSON files to upload from local machine (form files)
+        session_id: Session to load the files into (form field, overrides the header)
+        header_session_id: Session from the X-Session-ID / openai-conversation-id header
         
     Returns:
         AgentExcelResponse with answer and metadata
@@ -157,56 +180,66 @@ async def process_excel_local_query(
         raise HTTPException(status_code=400, detail="No query provided")
     
     temp_files = []
+    original_names = {}
     all_tables = []
     
     try:
         # Process uploaded files
         for idx, file in enumerate(files):
             # Validate file extension
-            if not file.filename.endswith(('.xlsx', '.xls')):
+            if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
                 raise HTTPException(status_code=400, detail=f"Invalid file type: {file.filename}")
             
             logger.info(f"[cyan]📥 Processing file {idx + 1}/{len(files)}:[/cyan] {file.filename}", extra={"markup": True})
             
-            # Save to temporary file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-            content = await file.read()
-            temp_file.write(content)
+            # Save to temporary file (copied in blocks; uploads can be multi-GB CSVs)
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix.lower())
+            await run_in_threadpool(shutil.copyfileobj, file.file, temp_file)
             temp_file.close()
             
             temp_files.append(temp_file.name)
+            original_names[Path(temp_file.name)] = file.filename
+        
+        with session_manager.use(session_id or header_session_id) as excel_processor, use_processor(excel_processor):
+            try:
+                # Process Excel files (sheets are parsed in parallel)
+                results = await run_in_threadpool(excel_processor.load_excel_files, list(original_names))
+            except IngestionError as e:
+                filename = original_names.get(e.file_path, e.file_path.name)
+                logger.error(f"[red]Error processing {filename}: {e}[/red]", extra={"markup": True})
+                raise HTTPException(status_code=500, detail=f"Error processing {filename}: {str(e)}")
             
             try:
-                # Process Excel file
-                tables = excel_processor.load_excel_file(Path(temp_file.name))
-                all_tables.extend(tables)
-                logger.info(f"[green]✓ Created {len(tables)} table(s) from {file.filename}[/green]", extra={"markup": True})
-            except Exception as e:
-                logger.error(f"[red]Error processing {file.filename}: {e}[/red]", extra={"markup": True})
-                raise HTTPException(status_code=500, detail=f"Error processing {file.filename}: {str(e)}")
-        
-        # Execute query
-        logger.info(f"[yellow]❓ Executing query:[/yellow] {query}", extra={"markup": True})
-        
-        try:
-            agent = get_agent()
-            result = agent.query(query)
+                await run_in_threadpool(session_manager.check_quota, excel_processor, [table for tables in results.values() for table in tables])
+            except SessionQuotaError as e:
+                raise HTTPException(status_code=413, detail=str(e))
             
-            logger.info("[bold green]✓ Query executed successfully[/bold green]", extra={"markup": True})
+            for temp_path, tables in results.items():
+                all_tables.extend(tables)
+                logger.info(f"[green]✓ Created {len(tables)} table(s) from {original_names[temp_path]}[/green]", extra={"markup": True})
             
-            return AgentExcelResponse(
-                query=query,
-                answer=result["answer"],
-                sql_queries=result.get("sql_queries"),
-                model=result["model"],
-                files_processed=len(files),
-                tables_created=all_tables,
-                timestamp=datetime.now()
-            )
+            # Execute query
+            logger.info(f"[yellow]❓ Executing query:[/yellow] {query}", extra={"markup": True})
             
-        except Exception as e:
-            logger.error(f"[bold red]✗ Error executing query:[/bold red] {e}", extra={"markup": True})
-            raise HTTPException(status_code=500, detail=f"Query execution error: {str(e)}")
+            try:
+                agent = get_agent()
+                result = await run_in_threadpool(agent.query, query)
+                
+                logger.info("[bold green]✓ Query executed successfully[/bold green]", extra={"markup": True})
+                
+                return AgentExcelResponse(
+                    query=query,
+                    answer=result["answer"],
+                    sql_queries=result.get("sql_queries"),
+                    model=result["model"],
+                    files_processed=len(files),
+                    tables_created=all_tables,
+                    timestamp=datetime.now()
+                )
+                
+            except Exception as e:
+                logger.error(f"[bold red]✗ Error executing query:[/bold red] {e}", extra={"markup": True})
+                raise HTTPException(status_code=500, detail=f"Query execution error: {str(e)}")
     
     finally:
         # Clean up temporary files
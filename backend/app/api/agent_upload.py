@@ -1,34 +1,46 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+import shutil
 import tempfile
 from app.models.schemas import AgentExcelResponse
+from app.core.excel_processor import SUPPORTED_EXTENSIONS
+from app.core.ingestion import IngestionError
+from app.core.sessions import SessionQuotaError
+from app.api.sessions import get_session_id
+from app.agents.tools import use_processor
+from app.core.fast_json import FastJSONResponse
 from app.core.logger import logger
 from app.agents.document_agent import get_agent
 from datetime import datetime
 
-router = APIRouter(prefix="/agent_upload", tags=["agent_upload"])
+router = APIRouter(prefix="/agent_upload", tags=["agent_upload"], default_response_class=FastJSONResponse)
 
 # This will be set by main.py
-excel_processor = None
+session_manager = None
 
 
-def set_excel_processor(processor):
-    """Set the global excel processor"""
-    global excel_processor
-    excel_processor = processor
+def set_session_manager(manager):
+    """Set the global session manager"""
+    global session_manager
+    session_manager = manager
 
 
 @router.post("/", response_model=AgentExcelResponse)
 async def process_upload_query(
     query: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    session_id: Optional[str] = Form(None),
+    header_session_id: Optional[str] = Depends(get_session_id)
 ):
     """Process uploaded Excel files and answer a query in one request
     
     Args:
         query: User's question (form field)
-        files: List of Excel files to upload (form files)
+        files: Excel, CSV/TSV or NDJSON files to upload (form files)
+        session_id: Session to load the files into (form field, overrides the header)
+        header_session_id: Session from the X-Session-ID / openai-conversation-id header
         
     Returns:
         AgentExcelResponse with answer and metadata
@@ -42,56 +54,66 @@ async def process_upload_query(
         raise HTTPException(status_code=400, detail="No query provided")
     
     temp_files = []
+    original_names = {}
     all_tables = []
     
     try:
         # Process uploaded files
         for idx, file in enumerate(files):
             # Validate file extension
-            if not file.filename.endswith(('.xlsx', '.xls')):
+            if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
                 raise HTTPException(status_code=400, detail=f"Invalid file type: {file.filename}")
             
             logger.info(f"[cyan]📥 Processing file {idx + 1}/{len(files)}:[/cyan] {file.filename}", extra={"markup": True})
             
-            # Save to temporary file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-            content = await file.read()
-            temp_file.write(content)
+            # Save to temporary file (copied in blocks; uploads can be multi-GB CSVs)
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix.lower())
+            await run_in_threadpool(shutil.copyfileobj, file.file, temp_file)
             temp_file.close()
             
             temp_files.append(temp_file.name)
+            original_names[Path(temp_file.name)] = file.filename
+        
+        with session_manager.use(session_id or header_session_id) as excel_processor, use_processor(excel_processor):
+            try:
+                # Process Excel files (sheets are parsed in parallel)
+                results = await run_in_threadpool(excel_processor.load_excel_files, list(original_names))
+            except IngestionError as e:
+                filename = original_names.get(e.file_path, e.file_path.name)
+                logger.error(f"[red]Error processing {filename}: {e}[/red]", extra={"markup": True})
+                raise HTTPException(status_code=500, detail=f"Error processing {filename}: {str(e)}")
             
             try:
-                # Process Excel file
-                tables = excel_processor.load_excel_file(Path(temp_file.name))
-                all_tables.extend(tables)
-                logger.info(f"[green]✓ Created {len(tables)} table(s) from {file.filename}[/green]", extra={"markup": True})
-            except Exception as e:
-                logger.error(f"[red]Error processing {file.filename}: {e}[/red]", extra={"markup": True})
-                raise HTTPException(status_code=500, detail=f"Error processing {file.filename}: {str(e)}")
-        
-        # Execute query
-        logger.info(f"[yellow]❓ Executing query:[/yellow] {query}", extra={"markup": True})
-        
-        try:
-            agent = get_agent()
-            result = agent.query(query)
+                await run_in_threadpool(session_manager.check_quota, excel_processor, [table for tables in results.values() for table in tables])
+            except SessionQuotaError as e:
+                raise HTTPException(status_code=413, detail=str(e))
             
-            logger.info("[bold green]✓ Query executed successfully[/bold green]", extra={"markup": True})
+            for temp_path, tables in results.items():
+                all_tables.extend(tables)
+                logger.info(f"[green]✓ Created {len(tables)} table(s) from {original_names[temp_path]}[/green]", extra={"markup": True})
             
-            return AgentExcelResponse(
-                query=query,
-                answer=result["answer"],
-                sql_queries=result.get("sql_queries"),
-                model=result["model"],
-                files_processed=len(files),
-                tables_created=all_tables,
-                timestamp=datetime.now()
-            )
+            # Execute query
+            logger.info(f"[yellow]❓ Executing query:[/yellow] {query}", extra={"markup": True})
             
-        except Exception as e:
-            logger.error(f"[bold red]✗ Error executing query:[/bold red] {e}", extra={"markup": True})
-            raise HTTPException(status_code=500, detail=f"Query execution error: {str(e)}")
+            try:
+                agent = get_agent()
+                result = await run_in_threadpool(agent.query, query)
+                
+                logger.info("[bold green]✓ Query executed successfully[/bold green]", extra={"markup": True})
+                
+                return AgentExcelResponse(
+                    query=query,
+                    answer=result["answer"],
+                    sql_queries=result.get("sql_queries"),
+                    model=result["model"],
+                    files_processed=len(files),
+                    tables_created=all_tables,
+                    timestamp=datetime.now()
+                )
+                
+            except Exception as e:
+                logger.error(f"[bold red]✗ Error executing query:[/bold red] {e}", extra={"markup": True})
+                raise HTTPException(status_code=500, detail=f"Query execution error: {str(e)}")
     
     finally:
         # Clean up temporary files
@@ -1,28 +1,51 @@
-from fastapi import APIRouter, HTTPException
+import json
+from contextlib import ExitStack
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Optional
 from app.models.schemas import QuestionRequest, QuestionResponse, SQLQueryRequest, SQLQueryResponse
+from app.core.config import get_settings
+from app.core.connections import PoolTimeoutError
+from app.core.engine import QueryTimeoutError
+from app.core.query_guard import QueryRejectedError
+from app.core.fast_json import FastJSONResponse
 from app.core.logger import logger
+from app.core.result_cursors import CursorExpiredError, ResultCursors
+from app.core.result_stream import STREAM_FORMATS, SpooledStream, encode_batches
+from app.api.sessions import get_session_id
+from app.agents.tools import use_processor
 from datetime import datetime
 
 from app.agents.document_agent import get_agent, reset_agent
 
-router = APIRouter(prefix="/query", tags=["query"])
+router = APIRouter(prefix="/query", tags=["query"], default_response_class=FastJSONResponse)
 
-# This will be set by main.py
-excel_processor = None
+# These will be set by main.py
+session_manager = None
+result_cursors: Optional[ResultCursors] = None
 
 
-def set_excel_processor(processor):
-    """Set the global excel processor"""
-    global excel_processor
-    excel_processor = processor
+def set_session_manager(manager):
+    """Set the global session manager"""
+    global session_manager
+    session_manager = manager
+
+
+def set_result_cursors(cursors: ResultCursors):
+    """Set the store of paginated results"""
+    global result_cursors
+    result_cursors = cursors
 
 
 @router.post("/", response_model=QuestionResponse)
-async def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest, session_id: Optional[str] = Depends(get_session_id)):
     """Ask a question about the uploaded documents
     
     Args:
         request: Question request
+        session_id: Session from the X-Session-ID / openai-conversation-id header
         
     Returns:
         Answer with metadata
@@ -32,7 +55,8 @@ async def ask_question(request: QuestionRequest):
     try:
         # Query the agent
         agent = get_agent()
-        result = agent.query(request.question)
+        with session_manager.use(request.session_id or session_id) as excel_processor, use_processor(excel_processor):
+            result = await run_in_threadpool(agent.query, request.question)
         
         return QuestionResponse(
             question=request.question,
@@ -47,39 +71,162 @@ async def ask_question(request: QuestionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def request_timeout(timeout_s: Optional[float]) -> Optional[float]:
+    """Timeout requested by a client, capped at the configured maximum (None = processor default)"""
+    if timeout_s is None:
+        return None
+    
+    max_timeout = get_settings().query_timeout_max_s
+    if max_timeout and (not timeout_s or timeout_s > max_timeout):
+        return max_timeout
+    return timeout_s
+
+
 @router.post("/sql", response_model=SQLQueryResponse)
-async def execute_sql(request: SQLQueryRequest):
+async def execute_sql(request: SQLQueryRequest, session_id: Optional[str] = Depends(get_session_id)):
     """Execute a custom SQL query directly on the database
     
+    With ``stream`` set, rows are fetched in batches and streamed as
+    NDJSON, CSV or an Arrow IPC stream instead. With ``page_size`` set,
+    one page is returned along with a cursor for the next; requests with
+    that cursor page through a snapshot of the result without re-running
+    the query.
+    
     Args:
         request: SQL query request
+        session_id: Session from the X-Session-ID / openai-conversation-id header
         
     Returns:
         Query results with columns and rows
     """
     logger.info(f"[bold magenta]🔧 Direct SQL query:[/bold magenta] {request.query}", extra={"markup": True})
     
+    if request.stream:
+        return await stream_sql(request, session_id)
+    
+    owner = request.session_id or session_id or ""
+    # Pages of a cursor belong to one query with one set of parameter values
+    query_key = request.query + ("\n" + json.dumps(request.params, sort_keys=True) if request.params else "")
+    page_size = request.page_size or get_settings().query_page_size
+    total_rows = next_cursor = None
+    
     try:
-        # Execute the query
-        result_df = excel_processor.execute_query(request.query)
+        if request.cursor:
+            # Next page of a snapshot: no query runs
+            result_df, total_rows, next_cursor = result_cursors.page(request.cursor, page_size, owner, query_key)
+        else:
+            # Execute the query
+            with session_manager.use(request.session_id or session_id) as excel_processor:
+                # Off the event loop, so concurrent queries run on pooled connections
+                result_df = await run_in_threadpool(
+                    excel_processor.execute_query, request.query, request_timeout(request.timeout_s), request.params
+                )
+            
+            if request.page_size:
+                total_rows = len(result_df)
+                if total_rows > page_size:
+                    try:
+                        cursor = result_cursors.open(result_df, owner, query_key)
+                    except ValueError as e:
+                        raise HTTPException(status_code=413, detail=str(e))
+                    result_df, total_rows, next_cursor = result_cursors.page(cursor, page_size, owner, query_key)
         
-        # Convert to response format
-        columns = result_df.columns.tolist()
-        rows = result_df.values.tolist()
+        logger.info(f"[green]✓ Query executed: {len(result_df)} rows returned[/green]", extra={"markup": True})
         
-        logger.info(f"[green]✓ Query executed: {len(rows)} rows returned[/green]", extra={"markup": True})
+        # Shaped like SQLQueryResponse; the rows are encoded straight from the DataFrame
+        return FastJSONResponse({
+            "query": request.query,
+            "columns": result_df.columns.tolist(),
+            "rows": result_df,
+            "row_count": len(result_df),
+            "status": "success",
+            "total_rows": total_rows,
+            "next_cursor": next_cursor
+        })
         
-        return SQLQueryResponse(
-            query=request.query,
-            columns=columns,
-            rows=rows,
-            row_count=len(rows),
-            status="success"
+    except HTTPException:
+        raise
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=408, detail=str(e))
+    except QueryRejectedError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except CursorExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except PoolTimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"[bold red]✗ SQL query error:[/bold red] {e}", extra={"markup": True})
+        raise HTTPException(status_code=400, detail=f"SQL Error: {str(e)}")
+
+
+async def stream_sql(request: SQLQueryRequest, session_id: Optional[str]) -> StreamingResponse:
+    """Stream the results of a SQL query batch by batch
+    
+    The first batch is fetched before responding, so SQL errors and
+    timeouts still get a proper status code. The rest is fetched and
+    encoded into a spool at the speed of the query; the session and its
+    connection are released once the last batch is fetched, whether or not
+    the client reads the response.
+    """
+    stack = ExitStack()
+    try:
+        excel_processor = stack.enter_context(session_manager.use(request.session_id or session_id))
+        batches = await run_in_threadpool(
+            excel_processor.stream_query,
+            request.query,
+            get_settings().query_stream_batch_rows,
+            request_timeout(request.timeout_s),
+            request.params
         )
-        
+    except QueryTimeoutError as e:
+        stack.close()
+        raise HTTPException(status_code=408, detail=str(e))
+    except QueryRejectedError as e:
+        stack.close()
+        raise HTTPException(status_code=422, detail=str(e))
+    except PoolTimeoutError as e:
+        stack.close()
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
+        stack.close()
         logger.error(f"[bold red]✗ SQL query error:[/bold red] {e}", extra={"markup": True})
         raise HTTPException(status_code=400, detail=f"SQL Error: {str(e)}")
+    
+    stack.callback(batches.close)
+    
+    def encoded():
+        rows = 0
+        
+        def counted():
+            nonlocal rows
+            for batch in batches:
+                rows += len(batch)
+                yield batch
+        
+        try:
+            yield from encode_batches(counted(), request.stream)
+            logger.info(f"[green]✓ Query streamed: {rows} rows[/green]", extra={"markup": True})
+        except Exception as e:
+            # Headers are sent already; the client sees a truncated body
+            logger.error(f"[bold red]✗ SQL stream error after {rows} rows:[/bold red] {e}", extra={"markup": True})
+            raise
+    
+    try:
+        spool = SpooledStream(encoded(), on_done=stack.close)
+    except Exception:
+        stack.close()
+        raise
+    return StreamingResponse(spool, media_type=STREAM_FORMATS[request.stream], background=BackgroundTask(spool.close))
+
+
+@router.get("/cache")
+async def get_query_cache_stats():
+    """Get result-cache counters (hit rate, evictions, invalidations, size)"""
+    cache = session_manager.default.query_cache
+    if cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **cache.stats()}
 
 
 @router.post("/reset")
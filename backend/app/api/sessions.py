@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from app.core.logger import logger
+from app.core.sessions import SessionBusyError
+
+router = APIRouter(prefix="/sessions", tags=["sessions"])
+
+# This will be set by main.py
+session_manager = None
+
+
+def set_session_manager(manager):
+    """Set the global session manager"""
+    global session_manager
+    session_manager = manager
+
+
+def get_session_id(
+    x_session_id: Optional[str] = Header(None),
+    openai_conversation_id: Optional[str] = Header(None)
+) -> Optional[str]:
+    """Session ID of a request (dependency)
+
+    Explicit ``X-Session-ID`` headers take precedence over the conversation
+    ID that Custom GPT actions send with every call.
+    """
+    return x_session_id or openai_conversation_id
+
+
+@router.get("/")
+async def list_sessions():
+    """Get open sessions and budget usage"""
+    return session_manager.stats()
+
+
+@router.delete("/{session_id}")
+async def drop_session(session_id: str):
+    """Close a session and discard its tables"""
+    try:
+        dropped = await run_in_threadpool(session_manager.drop, session_id)
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not dropped:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+
+    logger.info(f"[yellow]🗑️  Dropped session {session_id}[/yellow]", extra={"markup": True})
+    return {"status": "success", "session_id": session_id}
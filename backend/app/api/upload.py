@@ -1,29 +1,48 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from app.models.schemas import FileUploadResponse, ErrorResponse
 from app.core.config import get_settings
+from app.core.catalog import SchemaMismatchError
+from app.core.excel_processor import SUPPORTED_EXTENSIONS, WRITE_MODES, DatabaseSizeError, LoadOptions
+from app.core.ingestion import IngestionError
+from app.core.sessions import SessionQuotaError
+from app.api.sessions import get_session_id
+from app.core.fast_json import FastJSONResponse
 from app.core.logger import logger
 import shutil
 
-router = APIRouter(prefix="/upload", tags=["upload"])
+router = APIRouter(prefix="/upload", tags=["upload"], default_response_class=FastJSONResponse)
 
 # This will be set by main.py
-excel_processor = None
+session_manager = None
 
 
-def set_excel_processor(processor):
-    """Set the global excel processor"""
-    global excel_processor
-    excel_processor = processor
+def set_session_manager(manager):
+    """Set the global session manager"""
+    global session_manager
+    session_manager = manager
 
 
 @router.post("/", response_model=FileUploadResponse)
-async def upload_files(files: List[UploadFile] = File(...)):
-    """Upload Excel files for processing
+async def upload_files(
+    files: List[UploadFile] = File(...),
+    streaming: Optional[bool] = Query(None, description="Stream sheets in chunks (default: server setting)"),
+    mode: str = Query("replace", description=f"How to write tables: {', '.join(WRITE_MODES)}"),
+    key: Optional[List[str]] = Query(None, description="Key column(s) for upsert mode"),
+    table: Optional[str] = Query(None, description="Table name to use instead of the file name (e.g. for daily exports)"),
+    session_id: Optional[str] = Depends(get_session_id)
+):
+    """Upload Excel, CSV/TSV or NDJSON files for processing
     
     Args:
-        files: List of Excel files to upload
+        files: List of files to upload
+        streaming: Override the server's ingestion mode for this request
+        mode: "replace" tables, "append" rows to existing tables, or "upsert" rows by key
+        key: Key column(s) identifying rows in upsert mode
+        table: Base table name replacing the file name
+        session_id: Session to load the files into (default: shared database)
         
     Returns:
         Upload status and metadata
@@ -34,12 +53,11 @@ async def upload_files(files: List[UploadFile] = File(...)):
     
     logger.info(f"[bold blue]📤 Uploading {len(files)} file(s)[/bold blue]", extra={"markup": True})
     
-    all_tables = []
-    total_rows = 0
+    saved_files = []
     
     for file in files:
         # Validate file extension
-        if not file.filename.endswith(('.xlsx', '.xls')):
+        if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
             raise HTTPException(status_code=400, detail=f"Invalid file type: {file.filename}")
         
         # Save file
@@ -47,40 +65,109 @@ async def upload_files(files: List[UploadFile] = File(...)):
         
         try:
             with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Process Excel file
-            tables = excel_processor.load_excel_file(file_path)
-            all_tables.extend(tables)
-            
-            # Count rows
-            for table in tables:
-                total_rows += len(excel_processor.tables[table])
-            
+                await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
+            saved_files.append(file_path)
         except Exception as e:
             logger.error(f"[red]Error processing {file.filename}: {e}[/red]", extra={"markup": True})
             raise HTTPException(status_code=500, detail=str(e))
     
+    reused_tables: List[str] = []
+    appended_tables: List[str] = []
+    options = LoadOptions(mode=mode, key_columns=key or [], base_name=table)
+    
+    with session_manager.use(session_id) as excel_processor:
+        try:
+            # Process Excel files (sheets are parsed in parallel, unchanged sheets are skipped)
+            results = await run_in_threadpool(
+                excel_processor.load_excel_files, saved_files, streaming=streaming, reused=reused_tables,
+                options=options, appended=appended_tables
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except IngestionError as e:
+            logger.error(f"[red]Error processing {e.file_path.name}: {e}[/red]", extra={"markup": True})
+            # Rows that do not fit the table (or the session quota) they are appended to are the client's problem
+            if isinstance(e.error, SchemaMismatchError):
+                status_code = 409
+            elif isinstance(e.error, DatabaseSizeError):
+                status_code = 413
+            else:
+                status_code = 500
+            raise HTTPException(status_code=status_code, detail=str(e))
+        
+        # Several files may add to the same table
+        all_tables = list(dict.fromkeys(table for tables in results.values() for table in tables))
+        
+        try:
+            await run_in_threadpool(
+                session_manager.check_quota, excel_processor,
+                [table for table in all_tables if table not in reused_tables and table not in appended_tables]
+            )
+        except SessionQuotaError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        # Count rows
+        total_rows = sum(excel_processor.catalog[table].row_count for table in all_tables)
+    
     logger.info(f"[bold green]✓ Successfully uploaded and processed {len(files)} file(s)[/bold green]", extra={"markup": True})
     
     return FileUploadResponse(
         filename=f"{len(files)} files",
         tables_created=all_tables,
+        tables_reused=reused_tables,
+        tables_rebuilt=[table for table in all_tables if table not in reused_tables and table not in appended_tables],
+        tables_appended=appended_tables,
         row_count=total_rows,
         status="success"
     )
 
 
 @router.get("/schema")
-async def get_schema():
-    """Get the database schema"""
+async def get_schema(
+    stats: bool = Query(False, description="Include per-column statistics gathered at load time"),
+    filter: Optional[str] = Query(None, description="Only tables whose name contains this text or matches this glob"),
+    offset: int = Query(0, ge=0, description="Matching tables to skip"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum tables to return (default: all)"),
+    session_id: Optional[str] = Depends(get_session_id)
+):
+    """Get the database schema (optionally filtered by table name and paged)"""
     logger.info("[blue]📋 Fetching database schema[/blue]", extra={"markup": True})
     
-    schema = excel_processor.get_schema()
+    with session_manager.use(session_id) as excel_processor:
+        schema = await run_in_threadpool(
+            excel_processor.get_schema, include_stats=stats, name_filter=filter, offset=offset, limit=limit
+        )
+        matching = excel_processor.count_tables(filter)
+        data_version = excel_processor.data_version
     total_rows = sum(info['row_count'] for info in schema.values())
     
-    return {
+    return FastJSONResponse({
         "tables": schema,
-        "total_tables": len(schema),
-        "total_rows": total_rows
-    }
+        "total_tables": matching,
+        "total_rows": total_rows,
+        "offset": offset,
+        "limit": limit,
+        "data_version": data_version
+    })
+
+
+@router.get("/quality")
+async def get_data_quality(
+    table: Optional[List[str]] = Query(None, description="Tables to check (default: all)"),
+    session_id: Optional[str] = Depends(get_session_id)
+):
+    """Get data-quality issues of the loaded tables (cached per table version)"""
+    logger.info("[blue]🩺 Checking data quality[/blue]", extra={"markup": True})
+    
+    with session_manager.use(session_id) as excel_processor:
+        return await run_in_threadpool(excel_processor.check_data_quality, table)
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Get parsed-workbook cache counters"""
+    cache = session_manager.default.cache
+    if cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **cache.stats()}
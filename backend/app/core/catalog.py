@@ -0,0 +1,226 @@
+"""
+Lightweight metadata catalog for loaded tables.
+
+The data itself lives in the database; the catalog only keeps what the API
+and the agent tools need to know about each table, so DataFrames can be
+released as soon as a sheet has been written.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.column_stats import ColumnStats, merge_stats
+from app.core.sql_utils import quote_identifier
+
+# pandas dtype reported for each column type the streaming loader creates
+SQLITE_TO_DTYPE = {
+    "INTEGER": "int64",
+    "REAL": "float64",
+    "TIMESTAMP": "datetime64[ns]",
+    "TEXT": "object",
+}
+
+
+def dtype_for_sql_type(sql_type: str) -> str:
+    """pandas dtype closest to a declared SQLite or DuckDB column type"""
+    sql_type = (sql_type or "").upper()
+    if sql_type in SQLITE_TO_DTYPE:
+        return SQLITE_TO_DTYPE[sql_type]
+    if sql_type.startswith("BOOL"):
+        return "bool"
+    if "INT" in sql_type and not sql_type.startswith("INTERVAL"):
+        return "int64"
+    if sql_type.startswith(("REAL", "DOUBLE", "FLOAT", "DECIMAL", "NUMERIC")):
+        return "float64"
+    if sql_type.startswith(("TIMESTAMP", "DATE", "DATETIME")):
+        return "datetime64[ns]"
+    return "object"
+
+
+class SchemaMismatchError(ValueError):
+    """Raised when new rows do not fit the table they are appended to"""
+
+
+def dtype_kind(dtype: str) -> str:
+    """Coarse kind of a pandas dtype: integer, float, bool, datetime or text"""
+    dtype = dtype.lower()
+    if dtype.startswith(("int", "uint")):
+        return "integer"
+    if dtype.startswith("float"):
+        return "float"
+    if dtype == "bool" or dtype == "boolean":
+        return "bool"
+    if dtype.startswith("datetime"):
+        return "datetime"
+    return "text"
+
+
+@dataclass
+class TableInfo:
+    """Metadata of one loaded table"""
+    name: str
+    row_count: int
+    columns: List[str]
+    dtypes: List[str]
+    null_counts: Dict[str, int] = field(default_factory=dict)
+    byte_size: int = 0  # Approximate in-memory size of the data
+    indexes: List[str] = field(default_factory=list)  # Automatically indexed columns
+    fingerprint: Optional[str] = None  # Content fingerprint of the source sheet (None = unknown)
+    column_stats: Dict[str, ColumnStats] = field(default_factory=dict)  # Empty when not gathered
+    version: int = 0  # Changes whenever the table is (re)written or appended to
+
+    @classmethod
+    def from_dataframe(cls, name: str, df: pd.DataFrame) -> "TableInfo":
+        """Collect metadata from a DataFrame before it is released"""
+        columns = [str(col) for col in df.columns]
+        nulls = df.isnull().sum()
+        return cls(
+            name=name,
+            row_count=len(df),
+            columns=columns,
+            dtypes=[str(dtype) for dtype in df.dtypes],
+            null_counts={col: int(count) for col, count in zip(columns, nulls)},
+            byte_size=int(df.memory_usage(index=False, deep=True).sum())
+        )
+
+    @classmethod
+    def from_database(cls, conn: Any, name: str, column_types: List[Tuple[str, str]]) -> "TableInfo":
+        """Rebuild metadata of a table that already exists in the database
+
+        Used when reopening a persistent database after a restart. The SQL
+        is portable across the supported engines.
+
+        Args:
+            conn: DB-API connection (SQLite or DuckDB)
+            name: Table name
+            column_types: Column names and declared types
+        """
+        quoted = quote_identifier(name)
+        columns = [column for column, _ in column_types]
+        dtypes = [dtype_for_sql_type(column_type) for _, column_type in column_types]
+
+        # Row count, NULL counts and text size in a single scan
+        aggregates = ["COUNT(*)"]
+        for column in columns:
+            aggregates.append(f"COUNT(*) - COUNT({quote_identifier(column)})")
+            aggregates.append(f"SUM(LENGTH(CAST({quote_identifier(column)} AS TEXT)))")
+        row = conn.execute(f"SELECT {', '.join(aggregates)} FROM {quoted}").fetchone()
+        row_count = row[0]
+        null_counts = {column: int(row[1 + 2 * idx] or 0) for idx, column in enumerate(columns)}
+        byte_size = sum(int(row[2 + 2 * idx] or 0) for idx in range(len(columns)))
+
+        return cls(
+            name=name,
+            row_count=row_count,
+            columns=columns,
+            dtypes=dtypes,
+            null_counts=null_counts,
+            byte_size=byte_size
+        )
+
+    def check_appendable(self, new: "TableInfo", key_columns: Sequence[str] = ()) -> List[str]:
+        """Check that rows described by ``new`` can be appended to this table
+
+        New rows may lack columns (they are filled with NULLs) but not add
+        any. A column's values must be of the table column's kind, except
+        that any value fits a text column, integers fit a float column and
+        all-NULL columns fit anywhere.
+
+        Args:
+            new: Catalog entry of the new rows
+            key_columns: Upsert key, required in both
+
+        Returns:
+            Integer columns that must become floating-point to hold the new rows
+
+        Raises:
+            SchemaMismatchError: If the new rows do not fit
+        """
+        missing_keys = [key for key in key_columns if key not in self.columns or key not in new.columns]
+        if missing_keys:
+            raise SchemaMismatchError(f"Key column(s) {', '.join(missing_keys)} missing from table '{self.name}' or the new rows")
+
+        extra = [column for column in new.columns if column not in self.columns]
+        if extra:
+            raise SchemaMismatchError(
+                f"New rows have column(s) {', '.join(extra)} that table '{self.name}' does not have "
+                f"(load them in replace mode to change the schema)"
+            )
+
+        kinds = {column: dtype_kind(dtype) for column, dtype in zip(self.columns, self.dtypes)}
+        widen = []
+        for column, dtype in zip(new.columns, new.dtypes):
+            if new.null_counts.get(column, 0) >= new.row_count:
+                continue
+            kind, new_kind = kinds[column], dtype_kind(dtype)
+            if kind == new_kind or kind == "text" or (kind == "float" and new_kind in ("integer", "bool")):
+                continue
+            if kind == "integer" and new_kind == "bool":
+                continue
+            if kind == "integer" and new_kind == "float":
+                widen.append(column)
+                continue
+            raise SchemaMismatchError(
+                f"Column '{column}' of table '{self.name}' holds {kind} values, the new rows {new_kind} values"
+            )
+        return widen
+
+    def appended(
+        self,
+        new: "TableInfo",
+        replaced: Tuple[int, Dict[str, int]] = (0, {}),
+        superseded: Tuple[int, Dict[str, int]] = (0, {}),
+        widen: Sequence[str] = ()
+    ) -> "TableInfo":
+        """Catalog entry after appending ``new`` rows, computed without scanning the table
+
+        Args:
+            new: Catalog entry of the appended rows
+            replaced: Row and NULL counts of the table rows an upsert removed
+            superseded: Row and NULL counts of new rows that were not inserted
+                because a later new row had the same key
+            widen: Columns turned floating-point
+
+        Returns:
+            Updated catalog entry
+        """
+        replaced_rows, replaced_nulls = replaced
+        superseded_rows, superseded_nulls = superseded
+        inserted_rows = new.row_count - superseded_rows
+        average_row_size = self.byte_size / self.row_count if self.row_count else 0
+        average_new_row_size = new.byte_size / new.row_count if new.row_count else 0
+        info = TableInfo(
+            name=self.name,
+            row_count=self.row_count - replaced_rows + inserted_rows,
+            columns=list(self.columns),
+            dtypes=["float64" if column in widen else dtype for column, dtype in zip(self.columns, self.dtypes)],
+            null_counts={
+                column: self.null_counts.get(column, 0) - replaced_nulls.get(column, 0) + (
+                    new.null_counts.get(column, 0) - superseded_nulls.get(column, 0)
+                    if column in new.columns else inserted_rows
+                )
+                for column in self.columns
+            },
+            byte_size=int(
+                max(0, self.byte_size - average_row_size * replaced_rows) + average_new_row_size * inserted_rows
+            ),
+            indexes=list(self.indexes),
+            fingerprint=self.fingerprint
+        )
+
+        if self.column_stats and new.column_stats:
+            # Sketches cannot forget values: after an upsert, distinct counts,
+            # top values and ranges still reflect the rows it replaced
+            info.column_stats = merge_stats(self.column_stats, new.column_stats, new.row_count)
+            for column, stats in info.column_stats.items():
+                stats.null_count = info.null_counts[column]
+                stats.count = info.row_count - stats.null_count
+                if replaced_rows or superseded_rows:
+                    stats.counts_complete = False
+        return info
+
+    @property
+    def missing_values(self) -> Dict[str, int]:
+        """Columns that contain at least one NULL, with their counts"""
+        return {col: count for col, count in self.null_counts.items() if count > 0}
@@ -0,0 +1,256 @@
+"""
+Per-column statistics gathered while tables are loaded.
+
+Every parsed sheet (or streamed chunk) is summarized column by column with
+vectorized pandas/NumPy operations: NULL and distinct counts, min/max,
+mean and standard deviation, and the most frequent values. Summaries of
+chunks merge into one per column, so streaming loads and appends never
+rescan a table. The agent reads them instead of issuing exploratory
+``SELECT DISTINCT``/``MIN``/``MAX`` queries.
+
+Distinct counts and top values are exact while a column has at most
+``EXACT_DISTINCT_LIMIT`` distinct values. Beyond that, distinct counts
+come from a HyperLogLog sketch (about 2% error) and the top values from
+the most frequent candidates seen so far.
+"""
+import base64
+import math
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# HyperLogLog registers: 2^11 = 2048, standard error 1.04 / sqrt(2048) = 2.3%
+HLL_PRECISION = 11
+
+# Columns with more distinct values switch to approximate counting
+EXACT_DISTINCT_LIMIT = 256
+
+# Most frequent values reported per column
+TOP_K = 5
+
+
+def _plain(value: Any) -> Any:
+    """JSON-friendly Python value (NumPy scalars unwrapped, timestamps as ISO strings)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _hll_registers(values: pd.Series) -> np.ndarray:
+    """HyperLogLog registers of non-NULL values"""
+    registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+    if len(values):
+        hashes = pd.util.hash_array(values.to_numpy())
+        buckets = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << (64 - HLL_PRECISION)) - 1)
+        # Rank = position of the leftmost 1-bit in the remaining bits (frexp gives the bit length)
+        _, bit_length = np.frexp(remainder.astype(np.float64))
+        ranks = (64 - HLL_PRECISION + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(registers, buckets, ranks)
+    return registers
+
+
+def _hll_estimate(registers: np.ndarray) -> int:
+    """Cardinality estimated from HyperLogLog registers"""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -registers.astype(np.int32))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        # Linear counting is more accurate for small cardinalities
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+
+def _smaller(a: Any, b: Any) -> Any:
+    """Minimum of two optional values"""
+    if a is None or b is None:
+        return b if a is None else a
+    return a if a <= b else b
+
+
+def _larger(a: Any, b: Any) -> Any:
+    """Maximum of two optional values"""
+    if a is None or b is None:
+        return b if a is None else a
+    return a if a >= b else b
+
+
+@dataclass
+class ColumnStats:
+    """Mergeable summary of one column"""
+    count: int = 0  # Non-NULL values
+    null_count: int = 0
+    min: Any = None  # Numeric and date columns only
+    max: Any = None
+    mean: Optional[float] = None  # Numeric columns only
+    m2: float = 0.0  # Sum of squared deviations from the mean (for the standard deviation)
+    value_counts: Dict[Any, int] = field(default_factory=dict)  # Exact counts, or the top candidates
+    counts_complete: bool = True  # ``value_counts`` holds every distinct value
+    registers: Optional[np.ndarray] = field(default=None, repr=False)  # HyperLogLog sketch
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "ColumnStats":
+        """Summarize a column (or one chunk of it)"""
+        values = series.dropna()
+        stats = cls(count=len(values), null_count=len(series) - len(values))
+        if not len(values):
+            return stats
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+
+        if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            numbers = values.to_numpy(dtype=np.float64)
+            stats.min, stats.max = _plain(values.min()), _plain(values.max())
+            stats.mean = float(numbers.mean())
+            stats.m2 = float(np.square(numbers - stats.mean).sum())
+            # 1 and 1.0 are the same value whether a chunk came out integer or float
+            hashed = pd.Series(numbers)
+        elif pd.api.types.is_datetime64_any_dtype(values.dtype):
+            stats.min, stats.max = _plain(values.min()), _plain(values.max())
+            hashed = values
+        else:
+            hashed = values.astype(str)
+
+        counts = values.value_counts()
+        if len(counts) > EXACT_DISTINCT_LIMIT:
+            counts = counts.head(EXACT_DISTINCT_LIMIT)
+            stats.counts_complete = False
+        stats.value_counts = {_plain(value): int(count) for value, count in counts.items()}
+        stats.registers = _hll_registers(hashed)
+        return stats
+
+    def merge(self, other: "ColumnStats") -> "ColumnStats":
+        """Summary of both parts of a column"""
+        count = self.count + other.count
+        mean, m2 = self.mean, self.m2
+        if other.mean is not None:
+            if mean is None:
+                mean, m2 = other.mean, other.m2
+            else:
+                # Chan et al.'s pairwise update
+                delta = other.mean - self.mean
+                mean = self.mean + delta * other.count / count
+                m2 = self.m2 + other.m2 + delta * delta * self.count * other.count / count
+
+        value_counts = dict(self.value_counts)
+        for value, value_count in other.value_counts.items():
+            value_counts[value] = value_counts.get(value, 0) + value_count
+        counts_complete = self.counts_complete and other.counts_complete
+        if len(value_counts) > EXACT_DISTINCT_LIMIT:
+            value_counts = dict(sorted(value_counts.items(), key=lambda item: -item[1])[:EXACT_DISTINCT_LIMIT])
+            counts_complete = False
+
+        if self.registers is None or other.registers is None:
+            registers = self.registers if other.registers is None else other.registers
+        else:
+            registers = np.maximum(self.registers, other.registers)
+
+        try:
+            low, high = _smaller(self.min, other.min), _larger(self.max, other.max)
+        except TypeError:
+            # Parts of different kinds (e.g. after a type change): no meaningful range
+            low = high = None
+
+        return ColumnStats(
+            count=count,
+            null_count=self.null_count + other.null_count,
+            min=low,
+            max=high,
+            mean=mean,
+            m2=m2,
+            value_counts=value_counts,
+            counts_complete=counts_complete,
+            registers=registers
+        )
+
+    @property
+    def distinct_count(self) -> int:
+        """Distinct non-NULL values (estimated unless ``counts_complete``)"""
+        if self.counts_complete:
+            return len(self.value_counts)
+        estimate = _hll_estimate(self.registers) if self.registers is not None else 0
+        return max(estimate, len(self.value_counts))
+
+    @property
+    def std(self) -> Optional[float]:
+        """Sample standard deviation (numeric columns)"""
+        if self.mean is None or self.count < 2:
+            return None
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+    def top_values(self, k: int = TOP_K) -> List[Tuple[Any, int]]:
+        """Most frequent values with their counts"""
+        return sorted(self.value_counts.items(), key=lambda item: -item[1])[:k]
+
+    def summary(self) -> Dict[str, Any]:
+        """Statistics as reported to the API and the agent"""
+        return {
+            "null_count": self.null_count,
+            "distinct_count": self.distinct_count,
+            "distinct_approximate": not self.counts_complete,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "std": self.std,
+            "top_values": [[value, count] for value, count in self.top_values()],
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Complete state, JSON-serializable (for the sidecar file)"""
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "m2": self.m2,
+            "value_counts": [[value, count] for value, count in self.value_counts.items()],
+            "counts_complete": self.counts_complete,
+            "registers": base64.b64encode(self.registers.tobytes()).decode() if self.registers is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnStats":
+        """Rebuild from ``to_dict`` output"""
+        registers = data.get("registers")
+        return cls(
+            count=data["count"],
+            null_count=data["null_count"],
+            min=data.get("min"),
+            max=data.get("max"),
+            mean=data.get("mean"),
+            m2=data.get("m2", 0.0),
+            value_counts={value: count for value, count in data.get("value_counts", [])},
+            counts_complete=data.get("counts_complete", True),
+            registers=np.frombuffer(base64.b64decode(registers), dtype=np.uint8).copy() if registers else None
+        )
+
+
+def dataframe_stats(df: pd.DataFrame) -> Dict[str, ColumnStats]:
+    """Statistics of every column of a parsed sheet"""
+    return {str(column): ColumnStats.from_series(df.iloc[:, idx]) for idx, column in enumerate(df.columns)}
+
+
+def merge_stats(
+    current: Dict[str, ColumnStats],
+    new: Dict[str, ColumnStats],
+    new_rows: int
+) -> Dict[str, ColumnStats]:
+    """Statistics after adding rows to a table
+
+    Args:
+        current: Statistics of the table's columns
+        new: Statistics of the added rows (columns they lack are all NULL)
+        new_rows: Number of added rows
+    """
+    return {
+        column: stats.merge(new[column]) if column in new else stats.merge(ColumnStats(null_count=new_rows))
+        for column, stats in current.items()
+    }
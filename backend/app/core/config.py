@@ -17,6 +17,71 @@ class Settings(BaseSettings):
     # Application Settings
     upload_dir: str = "uploads"
     max_file_size_mb: int = 50
+    response_gzip_min_bytes: int = 1024  # Larger responses are gzipped for clients that accept it (0 = never)
+    
+    # Database Settings
+    query_engine: str = "sqlite"  # "sqlite" (row store), "duckdb" (columnar, faster aggregations) or "parquet" (compressed Parquet files queried by DuckDB)
+    database_path: str = ":memory:"  # Set a file path (e.g. data/askmydoc.db, or a directory for parquet) to persist tables across restarts
+    duckdb_threads: int = 0  # Threads per DuckDB query (0 = one per core)
+    duckdb_memory_limit_mb: int = 0  # 0 = DuckDB default (80% of RAM)
+    parquet_compression_level: int = 3  # zstd level for the parquet engine (1 = fastest, 22 = smallest)
+    sqlite_page_size: int = 4096  # Applies when the database file is created
+    sqlite_cache_size_mb: int = 64
+    sqlite_mmap_size_mb: int = 256  # File-backed databases only
+    sqlite_temp_store: str = "memory"  # memory, file or default
+    sqlite_synchronous: str = "normal"  # Durability outside loads (WAL makes normal safe)
+    sqlite_bulk_synchronous: str = "off"  # Durability while loading files ("off": power loss mid-load can corrupt the file)
+    sqlite_vacuum_free_ratio: float = 0.25  # VACUUM after a load once this share of pages is free
+    sqlite_read_connections: int = 4  # Read-only connections per database for concurrent queries
+    
+    # Session Settings (one database per X-Session-ID / openai-conversation-id)
+    session_dir: str = ""  # Directory for session databases (empty = in memory)
+    session_max_count: int = 100  # Least recently used idle sessions are evicted beyond this
+    session_budget_mb: int = 2048  # Combined size of all session databases
+    session_quota_mb: int = 256  # Maximum size of a single session
+    session_max_tables: int = 200
+    session_idle_timeout_s: int = 3600  # 0 = sessions never expire
+    
+    # Ingestion Settings
+    ingest_streaming: bool = False  # Stream sheets in chunks instead of whole DataFrames
+    ingest_chunk_size: int = 5000  # Rows per chunk in streaming mode
+    ingest_workers: int = 0  # Worker processes for parsing sheets (0 = one per CPU core, 1 = no pool)
+    ingest_infer_types: bool = True  # Downcast numbers, parse numeric/date text, categorize low-cardinality text
+    ingest_strict_tables: bool = False  # Create SQLite STRICT tables (DataFrame mode only)
+    ingest_incremental: bool = True  # On re-upload, keep tables whose sheet is unchanged
+    ingest_column_stats: bool = True  # Gather per-column statistics (ranges, distinct counts, top values)
+    
+    # Data-quality checks (missing values, type mismatches, duplicate keys, outliers, spellings)
+    quality_check_on_load: bool = True  # Check loaded tables in the background
+    quality_max_rows: int = 200000  # Larger tables are checked on their first rows
+    
+    # Automatic indexing (followed by ANALYZE) after each load
+    auto_index: bool = True
+    auto_index_min_rows: int = 1000  # Smaller tables are scanned anyway
+    
+    # Query limits
+    query_timeout_s: float = 30  # Queries running longer are cancelled (0 = no limit)
+    query_timeout_max_s: float = 300  # Upper bound for per-request timeouts on /query/sql
+    query_max_join_rows: int = 50000000  # Tables combined without a join condition into more rows are rejected (0 = no check)
+    query_statement_cache_size: int = 128  # Prepared statements kept per connection (parameterized queries)
+    query_stream_batch_rows: int = 10000  # Rows fetched and sent at a time by streaming /query/sql
+    query_page_size: int = 100  # Rows per page when /query/sql is given a cursor but no page_size
+    query_cursor_ttl_s: int = 300  # Result snapshots behind cursors expire after this long unused
+    query_cursor_max_mb: int = 256  # Combined size of all result snapshots
+    
+    # Slow-query log (GET /admin/slow_queries)
+    slow_query_log_enabled: bool = True
+    slow_query_threshold_ms: int = 1000  # Queries taking at least this long are recorded with their plan
+    slow_query_log_size: int = 500  # Entries kept (oldest dropped first)
+    
+    # Query result cache (shared by all sessions, invalidated per table)
+    query_cache_enabled: bool = True
+    query_cache_mb: int = 64
+    
+    # Parsed-workbook cache (Arrow IPC files keyed by SHA-256 of the upload)
+    parse_cache_enabled: bool = True
+    parse_cache_dir: str = "cache/workbooks"
+    parse_cache_max_mb: int = 1024  # Least recently used workbooks are evicted beyond this
     
     class Config:
         # Look for .env file in the backend directory
@@ -0,0 +1,222 @@
+"""
+SQLite connection management for ExcelProcessor.
+
+A database gets one writer connection and a bounded pool of read-only
+connections, so queries from different request threads and agent tool
+calls run side by side instead of queuing on one shared connection.
+
+File-backed databases run in WAL mode, where readers never block the
+writer. In-memory databases are opened as a named shared-cache database
+(so every pooled connection sees the same data) and guarded by a
+readers-writer lock: queries run concurrently with each other, while a
+load waits for running queries and holds new ones back until it is done.
+A query that finds every reader busy waits a bounded time for one.
+
+Every connection keeps its most recently used statements compiled (the
+sqlite3 module's statement cache, keyed by SQL text), so parameterized
+queries repeated with new values skip parsing and planning. SQLite
+recompiles a cached statement by itself once the schema has changed.
+
+Read-only connections run with ``query_only`` and an authorizer that
+allows reading tables and calling functions and denies everything else:
+writes, ATTACH, transactions, and pragmas that change settings (so a
+query cannot switch ``query_only`` off on a pooled connection).
+"""
+import queue
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List
+
+from app.core.sqlite_config import SQLiteOptions, apply_pragmas, is_memory_database
+
+# Actions a read-only connection may take
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+# Pragmas that only report, allowed with an argument (a table or index name)
+_REPORTING_PRAGMAS = {
+    "table_info", "table_xinfo", "table_list", "index_list", "index_info", "index_xinfo", "foreign_key_list",
+    "integrity_check", "quick_check",
+}
+
+
+def read_only_authorizer(action: int, arg1, arg2, db_name, trigger) -> int:
+    """SQLite authorizer allowing reads only (pragmas without a value are reads)"""
+    if action in _READ_ACTIONS:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and (arg2 is None or arg1.lower() in _REPORTING_PRAGMAS):
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_UPDATE and arg1 in ("sqlite_master", "sqlite_schema"):
+        # Checked when pragma table functions (pragma_table_info(...)) are set up;
+        # the schema itself stays read-only under query_only
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+class PoolTimeoutError(Exception):
+    """No read-only connection became free in time"""
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer (writers are not starved)"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock shared"""
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively"""
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class ConnectionPool:
+    """One writer connection and a bounded pool of read-only connections"""
+
+    def __init__(
+        self,
+        db_path: str,
+        options: SQLiteOptions,
+        max_readers: int = 4,
+        statement_cache_size: int = 128,
+        reader_wait_s: float = 30
+    ):
+        """Open the writer connection (readers are opened on demand)
+
+        Args:
+            db_path: Path to the database file, or ``:memory:``
+            options: Pragmas applied to every connection
+            max_readers: Maximum number of read-only connections
+            statement_cache_size: Compiled statements kept per connection
+            reader_wait_s: Seconds a query waits for a busy pool before failing
+        """
+        self.file_backed = not is_memory_database(db_path)
+        self.options = options
+        self.max_readers = max(1, max_readers)
+        self.reader_wait_s = reader_wait_s
+        self.statement_cache_size = statement_cache_size
+
+        if self.file_backed:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.uri = Path(db_path).resolve().as_uri()
+            self._reader_uri = self.uri + "?mode=ro"
+        else:
+            # A private name keeps every processor's in-memory database separate
+            self.uri = f"file:askmydoc-{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self._reader_uri = self.uri
+
+        self.writer = sqlite3.connect(
+            self.uri, uri=True, check_same_thread=False, cached_statements=statement_cache_size
+        )
+        apply_pragmas(self.writer, options, self.file_backed)
+
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all_readers: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+        self._write_mutex = threading.Lock()
+        self._rw_lock = ReadWriteLock()
+
+    def _open_reader(self) -> sqlite3.Connection:
+        """Open a new read-only connection"""
+        conn = sqlite3.connect(
+            self._reader_uri, uri=True, check_same_thread=False, cached_statements=self.statement_cache_size
+        )
+        apply_pragmas(conn, self.options, self.file_backed, read_only=True)
+        conn.execute("PRAGMA query_only = ON")
+        conn.set_authorizer(read_only_authorizer)
+        return conn
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        """Take an idle reader, open one if below the limit, or wait a bounded time
+
+        Raises:
+            PoolTimeoutError: If every reader stays busy for ``reader_wait_s``
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._pool_lock:
+            if len(self._all_readers) < self.max_readers:
+                conn = self._open_reader()
+                self._all_readers.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.reader_wait_s)
+        except queue.Empty:
+            raise PoolTimeoutError(
+                f"All {self.max_readers} read connections stayed busy for {self.reader_wait_s:g}s; try again later"
+            ) from None
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection for the duration of a query"""
+        with self._read_guard():
+            conn = self._acquire_reader()
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+
+    @contextmanager
+    def writing(self) -> Iterator[sqlite3.Connection]:
+        """Use the writer connection exclusively among writers
+
+        For in-memory databases readers are locked out as well, since
+        shared-cache connections cannot read tables that are being written.
+        """
+        with self._write_mutex:
+            if self.file_backed:
+                yield self.writer
+            else:
+                with self._rw_lock.write():
+                    yield self.writer
+
+    @contextmanager
+    def _read_guard(self):
+        """Shared side of the readers-writer lock (in-memory databases only)"""
+        if self.file_backed:
+            yield
+        else:
+            with self._rw_lock.read():
+                yield
+
+    def close(self):
+        """Close all connections"""
+        with self._pool_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+        self.writer.close()
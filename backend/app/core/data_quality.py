@@ -0,0 +1,305 @@
+"""
+Data-quality checks across loaded tables.
+
+Each table is checked with vectorized pandas operations for:
+
+- missing values (from the catalog, no scan needed)
+- type-mismatched cells: text in numeric columns, and the odd non-number
+  or non-date in a column that otherwise holds numbers or dates
+- duplicate keys in identifier columns that are meant to be unique
+- outliers in numeric columns (beyond 3 interquartile ranges)
+- inconsistent spellings of categorical values ("USA", "usa", "U.S.A."),
+  compared within and across tables by column name
+
+Tables are checked in parallel on a shared thread pool, right after they
+are loaded and on demand. Results are cached per table version, so a
+repeat check only waits for tables that changed since.
+"""
+import os
+import re
+import threading
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.catalog import TableInfo, dtype_kind
+from app.core.engine import QueryEngine
+from app.core.logger import logger
+from app.core.sql_utils import quote_identifier
+
+# Identifier columns expected to hold unique values
+ID_NAME_PATTERN = re.compile(r"(^id$|_id$|^id_|_key$|_code$|^sku$|_number$|_no$)", re.IGNORECASE)
+
+# An identifier column with fewer distinct values than this share of rows is a foreign key
+UNIQUE_KEY_MIN_RATIO = 0.9
+
+# A text column is numeric/date-like when at least this share of its values parses
+MOSTLY_TYPED_RATIO = 0.8
+
+# Tukey's "far out" fences: beyond Q1 - k * IQR or Q3 + k * IQR
+OUTLIER_IQR_FACTOR = 3.0
+OUTLIER_MIN_VALUES = 20
+
+# Text columns with at most this many distinct values are treated as categories
+MAX_CATEGORIES = 100
+
+# Example values reported per issue
+MAX_EXAMPLES = 5
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by all checkers (created on first use)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="quality")
+        return _executor
+
+
+def _examples(values: pd.Series) -> List[Any]:
+    """A few distinct example values, JSON-friendly"""
+    return [value.item() if isinstance(value, np.generic) else value for value in values.drop_duplicates().head(MAX_EXAMPLES)]
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    """Parse text as dates, NaT where it fails
+
+    ISO 8601 (how the engines store timestamps) is parsed vectorized; only
+    the remaining values go through the slower per-value parser.
+    """
+    dates = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    failed = dates.isna()
+    if failed.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            dates[failed] = pd.to_datetime(values[failed], errors="coerce", format="mixed")
+    return dates
+
+
+def _mismatch(text: pd.Series, failed: pd.Series, expected: str) -> Dict[str, Any]:
+    """Report of the cells that are not of the expected type"""
+    return {"expected": expected, "count": int(failed.sum()), "examples": _examples(text[failed])}
+
+
+def spelling_key(values: pd.Series) -> pd.Series:
+    """Normalized form of text values: case, spacing and punctuation removed"""
+    return values.astype(str).str.casefold().str.replace(r"[\W_]+", "", regex=True)
+
+
+@dataclass
+class TableQuality:
+    """Issues found in one table version"""
+    table: str
+    version: int
+    rows_checked: int
+    sampled: bool = False  # Only the first ``rows_checked`` rows were checked
+    nulls: Dict[str, int] = field(default_factory=dict)
+    type_mismatches: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    duplicate_keys: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    duplicate_rows: int = 0
+    outliers: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    categories: Dict[str, Dict[str, int]] = field(default_factory=dict)  # Value counts of categorical columns
+
+    def summary(self) -> Dict[str, Any]:
+        """Issues as reported to the API and the agent"""
+        return {
+            "version": self.version,
+            "rows_checked": self.rows_checked,
+            "sampled": self.sampled,
+            "nulls": self.nulls,
+            "type_mismatches": self.type_mismatches,
+            "duplicate_keys": self.duplicate_keys,
+            "duplicate_rows": self.duplicate_rows,
+            "outliers": self.outliers,
+        }
+
+
+def check_table(info: TableInfo, df: pd.DataFrame, sampled: bool = False) -> TableQuality:
+    """Check one table
+
+    Args:
+        info: Catalog entry of the table
+        df: The table's rows (or its first rows if ``sampled``)
+        sampled: Whether ``df`` is only part of the table
+
+    Returns:
+        Issues found
+    """
+    quality = TableQuality(
+        table=info.name,
+        version=info.version,
+        rows_checked=len(df),
+        sampled=sampled,
+        nulls=info.missing_values
+    )
+    kinds = dict(zip(info.columns, (dtype_kind(dtype) for dtype in info.dtypes)))
+
+    for idx, column in enumerate(df.columns):
+        column = str(column)
+        values = df.iloc[:, idx].dropna()
+        if values.empty:
+            continue
+        kind = kinds.get(column, "text")
+        stored_as_text = values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype)
+
+        if stored_as_text:
+            # Text in a typed column, or the odd non-number/non-date among numbers or dates
+            text = values.astype(str)
+            if kind in ("integer", "float"):
+                failed = pd.to_numeric(text, errors="coerce").isna()
+                if failed.any():
+                    quality.type_mismatches[column] = _mismatch(text, failed, "number")
+            elif kind == "datetime":
+                failed = _to_datetime(text).isna()
+                if failed.any():
+                    quality.type_mismatches[column] = _mismatch(text, failed, "date")
+            elif kind == "text":
+                failed = pd.to_numeric(text, errors="coerce").isna()
+                if failed.any() and failed.mean() <= 1 - MOSTLY_TYPED_RATIO:
+                    quality.type_mismatches[column] = _mismatch(text, failed, "number")
+                elif failed.all() and _to_datetime(text.head(100)).notna().mean() >= MOSTLY_TYPED_RATIO:
+                    # Only columns that look like dates are parsed in full
+                    failed = _to_datetime(text).isna()
+                    if failed.any() and failed.mean() <= 1 - MOSTLY_TYPED_RATIO:
+                        quality.type_mismatches[column] = _mismatch(text, failed, "date")
+
+            if kind == "text" and column not in quality.type_mismatches:
+                counts = text.value_counts()
+                if len(counts) <= MAX_CATEGORIES and len(counts) <= len(text) // 2:
+                    quality.categories[column] = {str(value): int(count) for value, count in counts.items()}
+
+        elif pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            if len(values) >= OUTLIER_MIN_VALUES and not ID_NAME_PATTERN.search(column):
+                q1, q3 = np.percentile(values.to_numpy(dtype=np.float64), [25, 75])
+                low, high = q1 - OUTLIER_IQR_FACTOR * (q3 - q1), q3 + OUTLIER_IQR_FACTOR * (q3 - q1)
+                outside = (values < low) | (values > high)
+                if q3 > q1 and outside.any():
+                    extreme = values[outside].sort_values(key=lambda v: (v - values.median()).abs(), ascending=False)
+                    quality.outliers[column] = {
+                        "count": int(outside.sum()),
+                        "low_fence": float(low),
+                        "high_fence": float(high),
+                        "examples": _examples(extreme)
+                    }
+
+        if ID_NAME_PATTERN.search(column):
+            duplicated = values.duplicated(keep=False)
+            distinct = len(values) - int(values.duplicated().sum())
+            if duplicated.any() and distinct >= UNIQUE_KEY_MIN_RATIO * len(values):
+                quality.duplicate_keys[column] = {
+                    "count": int(duplicated.sum()), "examples": _examples(values[duplicated])
+                }
+
+    if len(df.columns):
+        quality.duplicate_rows = int(pd.util.hash_pandas_object(df, index=False).duplicated().sum())
+
+    return quality
+
+
+def inconsistent_spellings(results: Sequence[TableQuality]) -> List[Dict[str, Any]]:
+    """Categorical values spelled differently, within and across tables
+
+    Columns are matched by (case-insensitive) name, so "Country" in one
+    sheet is compared with "country" in another.
+
+    Returns:
+        One entry per group of variants: column, tables and variant counts
+    """
+    by_column: Dict[str, List[Tuple[str, Dict[str, int]]]] = {}
+    for result in results:
+        for column, counts in result.categories.items():
+            by_column.setdefault(column.casefold(), []).append((result.table, counts))
+
+    issues = []
+    for column, entries in sorted(by_column.items()):
+        rows = [(table, value, count) for table, counts in entries for value, count in counts.items()]
+        frame = pd.DataFrame(rows, columns=["table", "value", "count"])
+        frame["key"] = spelling_key(frame["value"])
+        variants = frame.groupby("key")["value"].transform("nunique")
+        for _, group in frame[variants > 1].groupby("key"):
+            issues.append({
+                "column": column,
+                "tables": sorted(group["table"].unique().tolist()),
+                "variants": group.groupby("value")["count"].sum().sort_values(ascending=False).astype(int).to_dict()
+            })
+    return issues
+
+
+class DataQualityChecker:
+    """Checks a processor's tables in the background and caches the results per table version"""
+
+    def __init__(self, engine: QueryEngine, catalog: Dict[str, TableInfo], max_rows: int = 200_000):
+        """Create a checker
+
+        Args:
+            engine: Engine the tables are read from
+            catalog: The processor's catalog (read, never modified)
+            max_rows: Larger tables are checked on their first ``max_rows`` rows
+        """
+        self.engine = engine
+        self.catalog = catalog
+        self.max_rows = max_rows
+        self._results: Dict[str, Tuple[int, Future]] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, info: TableInfo) -> TableQuality:
+        """Read a table and check it"""
+        sql = f"SELECT * FROM {quote_identifier(info.name)}"
+        if self.max_rows:
+            sql += f" LIMIT {int(self.max_rows)}"
+        df = self.engine.query(sql)
+        return check_table(info, df, sampled=bool(self.max_rows) and info.row_count > self.max_rows)
+
+    def submit(self, table_names: Sequence[str]) -> Dict[str, Future]:
+        """Start checking tables whose current version has not been checked yet
+
+        Returns:
+            Pending or finished check per table
+        """
+        futures = {}
+        with self._lock:
+            for table_name in table_names:
+                info = self.catalog.get(table_name)
+                if info is None:
+                    continue
+                cached = self._results.get(table_name)
+                if cached is None or cached[0] != info.version or (cached[1].done() and cached[1].exception()):
+                    cached = (info.version, _get_executor().submit(self._run, info))
+                    self._results[table_name] = cached
+                futures[table_name] = cached[1]
+        return futures
+
+    def check(self, table_names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Check tables (all by default), reusing results of unchanged tables
+
+        Returns:
+            Issues per table and inconsistent spellings across them
+        """
+        futures = self.submit(list(self.catalog) if table_names is None else table_names)
+
+        results: List[TableQuality] = []
+        errors = {}
+        for table_name, future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"[red]✗ Data-quality check of {table_name} failed: {e}[/red]", extra={"markup": True})
+                errors[table_name] = str(e)
+
+        with self._lock:
+            for table_name in list(self._results):
+                if table_name not in self.catalog:
+                    del self._results[table_name]
+
+        return {
+            "tables": {result.table: result.summary() for result in results},
+            "inconsistent_spellings": inconsistent_spellings(results),
+            "errors": errors,
+        }
@@ -0,0 +1,437 @@
+"""
+DuckDB implementation of the query engine.
+
+DuckDB stores tables column-wise and executes queries vectorized and in
+parallel, which suits the agent's typical whole-table aggregations and
+UNIONs across files. DataFrames are written in bulk (DuckDB scans them
+directly, without per-row inserts). Every query runs on its own cursor so
+concurrent queries do not share connection state.
+
+Parameter values are bound by DuckDB (the query is prepared and executed
+with them), never spliced into the SQL text.
+
+Queries cannot reach the file system: external access is disabled once
+the connection is open (so ``read_csv``, ``read_text``, ``glob``, COPY
+and extension installs fail), except for the engine's own directories.
+"""
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_AVAILABLE = False
+
+from app.core.catalog import TableInfo
+from app.core.engine import QueryBudget, QueryEngine, QueryTimeoutError
+from app.core.excel_reader import infer_sqlite_type, to_sql_value, widen_sqlite_type
+from app.core.sql_utils import QueryParams, key_match, count_nulls, quote_identifier, quote_string
+from app.core.type_inference import is_text
+
+# DuckDB column type for each type the streaming loader infers
+SQLITE_TO_DUCKDB = {
+    "INTEGER": "BIGINT",
+    "REAL": "DOUBLE",
+    "TIMESTAMP": "TIMESTAMP",
+    "TEXT": "VARCHAR",
+}
+
+# Statement types a query may consist of
+READ_ONLY_STATEMENTS = ("SELECT", "EXPLAIN")
+
+
+def duckdb_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Prepare a parsed sheet for a DuckDB scan
+
+    Categoricals are stored as VARCHAR (DuckDB compresses repeated values
+    itself), dates as TIMESTAMP, and text columns holding other values too
+    are stored as text, as SQLite's TEXT affinity would.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object).where(series.notna(), None)
+        elif isinstance(series.dtype, np.dtype) and series.dtype.kind == "M":
+            # Microseconds map to TIMESTAMP (nanoseconds would be TIMESTAMP_NS)
+            series = series.astype("datetime64[us]")
+        elif series.dtype == object and not is_text(series):
+            series = series.map(lambda v: None if v is None or v != v else str(v))
+        columns[str(col)] = series
+
+    frame = pd.DataFrame(columns, index=df.index)
+    if frame.columns.empty:
+        frame = pd.DataFrame({"Unnamed: 0": pd.Series([], dtype=object)})
+    return frame
+
+
+def chunk_frame(chunk: List[Tuple[Any, ...]], column_types: List[str]) -> pd.DataFrame:
+    """Turn a chunk of raw rows into a positional DataFrame for ``INSERT ... SELECT``
+
+    Text columns may hold numbers too; everything there is bound as text.
+    """
+    rows = [
+        tuple(
+            str(value) if column_type == "TEXT" and value is not None else value
+            for value, column_type in zip(map(to_sql_value, row), column_types)
+        )
+        for row in chunk
+    ]
+    return pd.DataFrame(rows, columns=[f"c{idx}" for idx in range(len(column_types))], dtype=object)
+
+
+def chunk_types(column_types: List[str], chunk: List[Tuple[Any, ...]]) -> List[str]:
+    """Column types widened (see ``widen_sqlite_type``) to fit a chunk's values"""
+    return [
+        widen_sqlite_type(column_type, [row[idx] for row in chunk])
+        for idx, column_type in enumerate(column_types)
+    ]
+
+
+def column_definitions(columns: List[str], column_types: List[str]) -> List[str]:
+    """DuckDB column definitions for types inferred by ``infer_sqlite_type``"""
+    column_defs = [
+        f"{quote_identifier(column)} {SQLITE_TO_DUCKDB[column_type]}"
+        for column, column_type in zip(columns, column_types)
+    ]
+    # A sheet with neither header nor data still gets a (placeholder) table
+    if not column_defs:
+        column_defs.append('"Unnamed: 0" VARCHAR')
+    return column_defs
+
+
+class DuckDBEngine(QueryEngine):
+    """Columnar engine on embedded DuckDB"""
+
+    name = "duckdb"
+
+    def __init__(
+        self,
+        db_path: str = ":memory:",
+        threads: int = 0,
+        memory_limit_mb: int = 0,
+        allowed_directories: Sequence[Path] = ()
+    ):
+        """Open the database
+
+        Args:
+            db_path: Path to DuckDB database file (default: in-memory)
+            threads: Threads per query (0 = DuckDB default, one per core)
+            memory_limit_mb: Memory limit (0 = DuckDB default, 80% of RAM)
+            allowed_directories: Directories the engine reads and writes files
+                in; all other file access is denied
+        """
+        self.db_path = db_path
+        self.file_backed = db_path not in ("", ":memory:")
+        if self.file_backed:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        config = {"autoload_known_extensions": False, "autoinstall_known_extensions": False}
+        if threads:
+            config["threads"] = threads
+        if memory_limit_mb:
+            config["memory_limit"] = f"{memory_limit_mb}MB"
+        self.conn = duckdb.connect(db_path, config=config)
+        self._restrict_file_access(allowed_directories)
+        self._write_lock = threading.Lock()
+
+    def _restrict_file_access(self, allowed_directories: Sequence[Path]):
+        """Deny queries access to files outside the given directories (cannot be undone)
+
+        Both settings only take effect on an open database, and the allowed
+        directories must be set before external access is disabled.
+        """
+        if allowed_directories:
+            directories = ", ".join(quote_string(f"{Path(directory).resolve()}/") for directory in allowed_directories)
+            self.conn.execute(f"SET allowed_directories = [{directories}]")
+        self.conn.execute("SET enable_external_access = false")
+
+    @contextmanager
+    def loading(self) -> Iterator[None]:
+        """Hold the writer; checkpoint a persistent database afterwards"""
+        with self._write_lock:
+            yield
+            if self.file_backed:
+                self.conn.execute("CHECKPOINT")
+
+    def write_dataframe(self, table_name: str, df: pd.DataFrame, typed: bool = True):
+        """Replace a table with the contents of a DataFrame"""
+        with self.conn.cursor() as cursor:
+            cursor.register("sheet_frame", duckdb_frame(df))
+            try:
+                cursor.execute(f"CREATE OR REPLACE TABLE {quote_identifier(table_name)} AS SELECT * FROM sheet_frame")
+            finally:
+                cursor.unregister("sheet_frame")
+
+    def write_chunks(
+        self,
+        table_name: str,
+        columns: List[str],
+        chunks: Iterable[List[Tuple[Any, ...]]]
+    ) -> List[str]:
+        """Replace a table with rows streamed in chunks, in one transaction"""
+        quoted_table = quote_identifier(table_name)
+        column_types: Optional[List[str]] = None
+
+        with self.conn.cursor() as cursor:
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                for chunk in chunks:
+                    if column_types is None:
+                        column_types = self._create_table(cursor, quoted_table, columns, chunk)
+                    else:
+                        column_types = self._widen_columns(cursor, quoted_table, columns, column_types, chunk)
+
+                    cursor.register("chunk_frame", chunk_frame(chunk, column_types))
+                    cursor.execute(f"INSERT INTO {quoted_table} SELECT * FROM chunk_frame")
+                    cursor.unregister("chunk_frame")
+
+                if column_types is None:
+                    column_types = self._create_table(cursor, quoted_table, columns, [])
+
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+        return column_types
+
+    def _create_table(self, cursor, quoted_table: str, columns: List[str], sample: List[tuple]) -> List[str]:
+        """Create a table whose column types are inferred from sample rows
+
+        Returns:
+            Column types used (as named by ``infer_sqlite_type``)
+        """
+        column_types = [infer_sqlite_type([row[idx] for row in sample]) for idx in range(len(columns))]
+        cursor.execute(f"CREATE OR REPLACE TABLE {quoted_table} ({', '.join(column_definitions(columns, column_types))})")
+        return column_types
+
+    def _widen_columns(
+        self,
+        cursor,
+        quoted_table: str,
+        columns: List[str],
+        column_types: List[str],
+        chunk: List[tuple]
+    ) -> List[str]:
+        """Widen the columns a chunk's values do not fit (to DOUBLE or VARCHAR)
+
+        Returns:
+            Column types after widening
+        """
+        widened = chunk_types(column_types, chunk)
+        for column, column_type, new_type in zip(columns, column_types, widened):
+            if new_type != column_type:
+                cursor.execute(
+                    f"ALTER TABLE {quoted_table} ALTER COLUMN {quote_identifier(column)} "
+                    f"SET DATA TYPE {SQLITE_TO_DUCKDB[new_type]}"
+                )
+        return widened
+
+    def append_table(
+        self,
+        source: str,
+        target: str,
+        columns: Sequence[str],
+        key_columns: Sequence[str] = (),
+        widen: Sequence[str] = ()
+    ) -> Tuple[Tuple[int, Dict[str, int]], Tuple[int, Dict[str, int]]]:
+        """Insert the rows of ``source`` into ``target`` in one transaction
+
+        Upserts find the rows they replace with a hash join against the new rows.
+        """
+        quoted_source = quote_identifier(source)
+        quoted_target = quote_identifier(target)
+        column_list = ", ".join(quote_identifier(column) for column in columns)
+        rows = f"SELECT {column_list} FROM {quoted_source}"
+        replaced = superseded = (0, {})
+
+        with self.conn.cursor() as cursor:
+            try:
+                cursor.execute("BEGIN TRANSACTION")
+                try:
+                    for column in widen:
+                        cursor.execute(f"ALTER TABLE {quoted_target} ALTER COLUMN {quote_identifier(column)} TYPE DOUBLE")
+
+                    if key_columns:
+                        matches = f"EXISTS (SELECT 1 FROM {quoted_source} WHERE {key_match(key_columns, quoted_source, quoted_target)})"
+                        target_columns = [name for name, _ in self.table_columns(target)]
+                        replaced = count_nulls(cursor, target_columns, f"(SELECT * FROM {quoted_target} WHERE {matches})")
+                        cursor.execute(f"DELETE FROM {quoted_target} WHERE {matches}")
+
+                        # Of new rows sharing a key, the last one wins
+                        keys = ", ".join(quote_identifier(column) for column in key_columns)
+                        latest = f"row_number() OVER (PARTITION BY {keys} ORDER BY rowid DESC)"
+                        superseded = count_nulls(cursor, columns, f"(SELECT * FROM {quoted_source} QUALIFY {latest} > 1)")
+                        rows += f" QUALIFY {latest} = 1"
+
+                    cursor.execute(f"INSERT INTO {quoted_target} ({column_list}) {rows}")
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+            finally:
+                cursor.execute(f"DROP TABLE IF EXISTS {quoted_source}")
+
+        return replaced, superseded
+
+    def discard_table(self, table_name: str):
+        """Drop a table with the writer already held"""
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+
+    def table_names(self) -> List[str]:
+        """Names of all tables in the database"""
+        with self.conn.cursor() as cursor:
+            rows = cursor.execute(
+                "SELECT table_name FROM information_schema.tables "
+                "WHERE table_schema = current_schema() AND table_type = 'BASE TABLE' ORDER BY table_name"
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def table_columns(self, table_name: str) -> List[Tuple[str, str]]:
+        """Column names and types of a table"""
+        with self.conn.cursor() as cursor:
+            rows = cursor.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = ? ORDER BY ordinal_position",
+                [table_name]
+            ).fetchall()
+        return [(name, column_type) for name, column_type in rows]
+
+    def describe_table(self, table_name: str) -> TableInfo:
+        """Catalog entry of an existing table"""
+        column_types = self.table_columns(table_name)
+        with self.conn.cursor() as cursor:
+            return TableInfo.from_database(cursor, table_name, column_types)
+
+    @contextmanager
+    def _reading(self) -> Iterator[None]:
+        """Held while a query runs (tables are not files here, so nothing to do)"""
+        yield
+
+    @staticmethod
+    def _check_read_only(cursor, sql: str) -> int:
+        """Reject statements that would modify the database
+
+        Returns:
+            Number of statements
+
+        Raises:
+            PermissionError: If any statement is not a read-only one
+        """
+        statements = cursor.extract_statements(sql)
+        for statement in statements:
+            if statement.type.name not in READ_ONLY_STATEMENTS:
+                raise PermissionError(f"Only read-only queries are allowed (got {statement.type.name})")
+        return len(statements)
+
+    @staticmethod
+    @contextmanager
+    def _deadline(cursor, budget: QueryBudget) -> Iterator[None]:
+        """Interrupt the cursor if this block uses up the query's remaining time"""
+        if not budget.timeout:
+            yield
+            return
+
+        timer = threading.Timer(max(budget.remaining(), 0.0), cursor.interrupt)
+        timer.daemon = True
+        timer.start()
+        try:
+            with budget.running():
+                yield
+        finally:
+            timer.cancel()
+
+    def query(self, sql: str, timeout: Optional[float] = None, params: Optional[QueryParams] = None) -> pd.DataFrame:
+        """Run a read-only query on its own cursor
+
+        A deadline is enforced by interrupting the cursor from a timer
+        thread; other cursors are unaffected. Parameter values are bound by
+        DuckDB.
+
+        Raises:
+            PermissionError: If the query would modify the database
+            ValueError: If a parameterized query is not exactly one statement
+            QueryTimeoutError: If the query runs past ``timeout``
+        """
+        budget = QueryBudget(timeout)
+        with self._reading(), self.conn.cursor() as cursor:
+            if self._check_read_only(cursor, sql) != 1 and params:
+                raise ValueError("A parameterized query must be a single statement")
+            try:
+                with self._deadline(cursor, budget):
+                    return cursor.execute(sql, params or None).df()
+            except duckdb.InterruptException as e:
+                raise QueryTimeoutError(timeout) from e
+
+    def query_batches(
+        self,
+        sql: str,
+        batch_size: int = 10_000,
+        timeout: Optional[float] = None,
+        params: Optional[QueryParams] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Run a read-only query on its own cursor, streaming Arrow record batches"""
+        budget = QueryBudget(timeout)
+        with self._reading(), self.conn.cursor() as cursor:
+            self._check_read_only(cursor, sql)
+            try:
+                with self._deadline(cursor, budget):
+                    reader = cursor.execute(sql, params or None).to_arrow_reader(batch_size)
+                empty = True
+                while True:
+                    with self._deadline(cursor, budget):
+                        try:
+                            batch = reader.read_next_batch()
+                        except StopIteration:
+                            break
+                    empty = False
+                    yield batch.to_pandas()
+                if empty:
+                    yield reader.schema.empty_table().to_pandas()
+            except (duckdb.InterruptException, OSError) as e:
+                # Interrupts while fetching surface as Arrow I/O errors
+                if isinstance(e, duckdb.InterruptException) or budget.expired():
+                    raise QueryTimeoutError(timeout) from e
+                raise
+
+    def explain(self, sql: str, params: Optional[QueryParams] = None) -> List[str]:
+        """Physical plan as rendered by ``EXPLAIN``"""
+        with self._reading(), self.conn.cursor() as cursor:
+            if self._check_read_only(cursor, sql) != 1:
+                return []
+            rows = cursor.execute(f"EXPLAIN {sql.strip().rstrip(';')}", params or None).fetchall()
+        return [line for _, plan in rows for line in plan.splitlines()]
+
+    def drop_tables(self, table_names: Sequence[str]):
+        """Drop tables if they exist"""
+        with self._write_lock, self.conn.cursor() as cursor:
+            for table_name in table_names:
+                cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        self._delete_column_stats(table_names)
+
+    def database_size(self) -> int:
+        """Bytes used by the database (blocks on disk, or memory in use)"""
+        with self.conn.cursor() as cursor:
+            if self.file_backed:
+                return int(cursor.execute("SELECT used_blocks * block_size FROM pragma_database_size()").fetchone()[0] or 0)
+            return int(cursor.execute("SELECT SUM(memory_usage_bytes) FROM duckdb_memory()").fetchone()[0] or 0)
+
+    def close(self):
+        """Close the database"""
+        self.conn.close()
+
+    def delete_files(self):
+        """Delete the database file and its write-ahead log"""
+        if self.file_backed:
+            for suffix in ("", ".wal"):
+                Path(self.db_path + suffix).unlink(missing_ok=True)
+        self._delete_stats_dir()
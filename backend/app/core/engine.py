@@ -0,0 +1,292 @@
+"""
+Storage/query engine interface for ExcelProcessor.
+
+ExcelProcessor owns parsing, table naming and the catalog; everything that
+touches the database goes through a ``QueryEngine``. Three engines exist:
+SQLite (row store, the default), DuckDB (columnar and vectorized, much
+faster for whole-table aggregations) and a Parquet store queried by DuckDB
+(compressed files, only referenced columns are read), selected with
+``create_engine``.
+"""
+import json
+import shutil
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.catalog import TableInfo
+from app.core.sql_utils import QueryParams
+
+# Engines accepted by create_engine
+ENGINES = ("sqlite", "duckdb", "parquet")
+
+
+class QueryTimeoutError(Exception):
+    """A query ran past its deadline and was cancelled"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        super().__init__(
+            f"Query cancelled after exceeding the {timeout:g}s time limit. Rewrite it to do less work: "
+            "join on key columns (no cartesian products), filter early, aggregate, or add a LIMIT."
+        )
+
+
+class QueryBudget:
+    """Time a query spends in the engine, measured against its timeout
+
+    Streamed results are fetched batch by batch; time the consumer spends
+    between batches does not count.
+    """
+
+    def __init__(self, timeout: Optional[float]):
+        self.timeout = timeout
+        self.used = 0.0
+        self._started: Optional[float] = None
+
+    @contextmanager
+    def running(self) -> Iterator[None]:
+        """Count the time spent inside this block"""
+        self._started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.used += time.monotonic() - self._started
+            self._started = None
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline"""
+        elapsed = self.used + (time.monotonic() - self._started if self._started is not None else 0.0)
+        return self.timeout - elapsed
+
+    def expired(self) -> bool:
+        """Whether the query has used up its time"""
+        return bool(self.timeout) and self.remaining() <= 0
+
+
+class QueryEngine(ABC):
+    """Database backend used by ExcelProcessor"""
+
+    name: str = ""
+    db_path: str = ":memory:"
+    file_backed: bool = False
+
+    @contextmanager
+    def loading(self) -> Iterator[None]:
+        """Hold the database for a load (exclusive among writers)
+
+        Engines use this to relax durability and run housekeeping afterwards.
+        """
+        yield
+
+    @abstractmethod
+    def write_dataframe(self, table_name: str, df: pd.DataFrame, typed: bool = True):
+        """Replace a table with the contents of a DataFrame
+
+        Args:
+            table_name: Table to create or replace
+            df: Parsed sheet
+            typed: Declare column types from the (inferred) dtypes
+        """
+
+    @abstractmethod
+    def write_chunks(
+        self,
+        table_name: str,
+        columns: List[str],
+        chunks: Iterable[List[Tuple[Any, ...]]]
+    ) -> List[str]:
+        """Replace a table with rows streamed in chunks, in one transaction
+
+        Column types are inferred from the first chunk.
+
+        Args:
+            table_name: Table to create or replace
+            columns: Column names
+            chunks: Chunks of raw cell-value tuples
+
+        Returns:
+            Column types as returned by ``infer_sqlite_type``
+        """
+
+    @abstractmethod
+    def append_table(
+        self,
+        source: str,
+        target: str,
+        columns: Sequence[str],
+        key_columns: Sequence[str] = (),
+        widen: Sequence[str] = ()
+    ) -> Tuple[Tuple[int, Dict[str, int]], Tuple[int, Dict[str, int]]]:
+        """Move the rows of a freshly written table into an existing one, then drop it
+
+        Called while loading. Work is proportional to the new rows wherever
+        the engine allows it.
+
+        Args:
+            source: Table holding the new rows
+            target: Table to append to (a superset of ``source``'s columns;
+                columns missing from ``source`` are filled with NULLs)
+            columns: Columns of ``source``
+            key_columns: Upsert key: target rows with the key of a new row are
+                replaced, and of new rows sharing a key only the last is kept
+            widen: Integer columns of ``target`` to turn floating-point first
+
+        Returns:
+            Row count and per-column NULL counts of the replaced target rows,
+            and of the new rows superseded by a later one with the same key
+        """
+
+    @abstractmethod
+    def discard_table(self, table_name: str):
+        """Drop a table while loading (``drop_tables`` would wait for the writer)"""
+
+    def index_tables(self, table_names: List[str], catalog: Dict[str, TableInfo], min_rows: int = 0) -> List[str]:
+        """Create indexes for newly loaded tables (no-op unless the engine benefits)
+
+        Returns:
+            Tables whose indexes changed
+        """
+        return []
+
+    def stats_path(self, table_name: str) -> Optional[Path]:
+        """Sidecar file holding a table's column statistics (None: not persisted)"""
+        if not self.file_backed:
+            return None
+        return Path(f"{self.db_path}.stats") / f"{table_name}.json"
+
+    def save_column_stats(self, table_name: str, stats: Optional[Dict[str, Any]]):
+        """Persist a table's column statistics next to it (None removes them)"""
+        path = self.stats_path(table_name)
+        if path is None:
+            return
+        if stats is None:
+            path.unlink(missing_ok=True)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(stats))
+        temp_path.replace(path)
+
+    def load_column_stats(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """Column statistics persisted by ``save_column_stats`` (None if absent or unreadable)"""
+        path = self.stats_path(table_name)
+        if path is None or not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _delete_column_stats(self, table_names: Sequence[str]):
+        """Remove the statistics of dropped tables"""
+        for table_name in table_names:
+            self.save_column_stats(table_name, None)
+
+    def _delete_stats_dir(self):
+        """Remove the statistics of all tables (with the database files)"""
+        if self.file_backed:
+            shutil.rmtree(f"{self.db_path}.stats", ignore_errors=True)
+
+    @abstractmethod
+    def table_names(self) -> List[str]:
+        """Names of all tables in the database"""
+
+    @abstractmethod
+    def table_columns(self, table_name: str) -> List[Tuple[str, str]]:
+        """Column names and declared types of a table"""
+
+    @abstractmethod
+    def describe_table(self, table_name: str) -> TableInfo:
+        """Catalog entry of an existing table (used after a restart)"""
+
+    @abstractmethod
+    def query(self, sql: str, timeout: Optional[float] = None, params: Optional[QueryParams] = None) -> pd.DataFrame:
+        """Run a read-only query
+
+        Args:
+            sql: Query to run
+            timeout: Seconds after which the query is cancelled (None = no limit)
+            params: Values bound to the query's ``?`` (sequence) or ``$name`` (mapping) placeholders
+
+        Raises:
+            QueryTimeoutError: If the query runs past ``timeout``
+            Exception: If the query fails or tries to modify the database
+        """
+
+    @abstractmethod
+    def query_batches(
+        self,
+        sql: str,
+        batch_size: int = 10_000,
+        timeout: Optional[float] = None,
+        params: Optional[QueryParams] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Run a read-only query, fetching its rows in batches
+
+        At least one (possibly empty) batch is produced, so the columns are
+        always known. The connection stays in use until the batches are
+        consumed or the generator is closed.
+
+        Args:
+            sql: Query to run
+            batch_size: Rows per batch
+            timeout: Seconds the query may spend executing and fetching (None = no limit)
+            params: Values bound to the query's placeholders
+
+        Raises:
+            QueryTimeoutError: If the query uses up ``timeout``
+        """
+
+    @abstractmethod
+    def explain(self, sql: str, params: Optional[QueryParams] = None) -> List[str]:
+        """Plan of a query, one line per step (the query is not run)"""
+
+    @abstractmethod
+    def drop_tables(self, table_names: Sequence[str]):
+        """Drop tables if they exist"""
+
+    @abstractmethod
+    def database_size(self) -> int:
+        """Bytes used by the database (in memory or on disk), also while ``loading``"""
+
+    @abstractmethod
+    def close(self):
+        """Close all connections"""
+
+    def delete_files(self):
+        """Delete the database files of a closed, file-backed engine"""
+
+
+def create_engine(engine: str, db_path: str = ":memory:", **options) -> QueryEngine:
+    """Create a query engine by name
+
+    Args:
+        engine: "sqlite", "duckdb" or "parquet"
+        db_path: Database file (store directory for "parquet"), or ":memory:"
+        **options: Engine-specific options
+
+    Returns:
+        The engine
+
+    Raises:
+        ValueError: If the engine is unknown or its package is not installed
+    """
+    if engine == "sqlite":
+        from app.core.sqlite_engine import SQLiteEngine
+        return SQLiteEngine(db_path, **options)
+
+    if engine in ("duckdb", "parquet"):
+        from app.core.duckdb_engine import DUCKDB_AVAILABLE, DuckDBEngine
+        if not DUCKDB_AVAILABLE:
+            raise ValueError(f"duckdb is not installed (required by the {engine} engine)")
+        if engine == "parquet":
+            from app.core.parquet_engine import ParquetEngine
+            return ParquetEngine(db_path, **options)
+        return DuckDBEngine(db_path, **options)
+
+    raise ValueError(f"Unknown query engine: {engine} (expected one of {', '.join(ENGINES)})")
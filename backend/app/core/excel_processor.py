@@ -1,132 +1,943 @@
 import pandas as pd
-import sqlite3
+import re
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any
+from itertools import chain, count
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from openpyxl import load_workbook
 from rich.progress import Progress, SpinnerColumn, TextColumn
+from app.core.catalog import SQLITE_TO_DTYPE, SchemaMismatchError, TableInfo
+from app.core.column_stats import ColumnStats, dataframe_stats
+from app.core.data_quality import DataQualityChecker
+from app.core.engine import QueryTimeoutError, create_engine
+from app.core.excel_reader import iter_sheet_chunks
+from app.core.fingerprint import FileFingerprints
+from app.core.ingestion import IngestionError, IngestionScheduler, SheetJob
 from app.core.logger import logger, console
+from app.core.query_cache import QueryCache, is_cacheable, normalize_sql, query_shape, referenced_tables, sql_fingerprint
+from app.core.query_guard import QueryRejectedError, check_query, limit_rows
+from app.core.schema_cache import SchemaCache, matches_filter
+from app.core.slow_queries import SlowQuery, SlowQueryLog, analyze_plan
+from app.core.sql_utils import QueryParams
+from app.core.sqlite_config import SQLiteOptions
+from app.core.text_reader import TEXT_EXTENSIONS, is_text_file, iter_text_chunks
+from app.core.workbook_cache import WorkbookCache, file_sha256
+
+
+# Sheets that only carry workbook metadata and are never loaded
+SKIPPED_SHEETS = ['metadata', 'info']
+
+# Files accepted by load_excel_files (text files are always streamed)
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls') + TEXT_EXTENSIONS
+
+class DatabaseSizeError(Exception):
+    """Raised when adding rows would grow a database past its size limit"""
+
+
+# How loaded sheets are written to their tables
+WRITE_MODES = ('replace', 'append', 'upsert')
+
+
+def clean_name(name: str) -> str:
+    """Sanitize a file or sheet name for use in a table name"""
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def make_table_name(file_path: Path, sheet_name: str, base_name: Optional[str] = None) -> str:
+    """Create table name: filename_sheetname (``base_name`` replaces the file name)"""
+    return f"{clean_name(base_name or file_path.stem)}_{clean_name(sheet_name)}".lower()
+
+
+def make_file_table_name(file_path: Path, base_name: Optional[str] = None) -> str:
+    """Create table name for a single-table (text) file: filename (or ``base_name``)"""
+    return clean_name(base_name or file_path.stem).lower()
+
+
+@dataclass
+class LoadOptions:
+    """How a load writes its sheets"""
+    mode: str = "replace"  # "replace" the table, "append" rows, or "upsert" rows by key
+    key_columns: List[str] = field(default_factory=list)  # Upsert key (required for "upsert")
+    base_name: Optional[str] = None  # Used instead of the file name in table names (e.g. "orders" for daily exports)
+    
+    def validate(self):
+        """Raise ValueError for inconsistent options"""
+        if self.mode not in WRITE_MODES:
+            raise ValueError(f"Unknown write mode: {self.mode} (expected one of {', '.join(WRITE_MODES)})")
+        if self.mode == "upsert" and not self.key_columns:
+            raise ValueError("Upsert mode needs at least one key column")
+
+
+@dataclass
+class _LoadRun:
+    """State of one ``load_excel_files`` call"""
+    options: LoadOptions
+    fingerprints: Dict[Path, FileFingerprints]
+    kept: List[str] = field(default_factory=list)  # Unchanged tables left as they were
+    appended: List[str] = field(default_factory=list)  # Existing tables that received rows
+    
+    def fingerprint(self, file_path: Path, sheet_name: Optional[str] = None) -> Optional[str]:
+        """Fingerprint of a sheet (None when incremental loading is off)"""
+        fingerprints = self.fingerprints.get(file_path)
+        return fingerprints.sheet(sheet_name) if fingerprints else None
 
 
 class ExcelProcessor:
-    """Processes Excel files and loads them into SQLite database"""
+    """Processes Excel files and loads them into a SQLite or DuckDB database"""
     
-    def __init__(self, db_path: str = ":memory:"):
-        """Initialize with SQLite database
+    def __init__(
+        self,
+        db_path: str = ":memory:",
+        streaming: bool = False,
+        chunk_size: int = 5000,
+        workers: int = 0,
+        cache: Optional[WorkbookCache] = None,
+        query_cache: Optional[QueryCache] = None,
+        slow_query_log: Optional[SlowQueryLog] = None,
+        infer_types: bool = True,
+        strict_tables: bool = False,
+        incremental: bool = True,
+        column_stats: bool = True,
+        quality_checks: bool = True,
+        quality_max_rows: int = 200_000,
+        auto_index: bool = True,
+        index_min_rows: int = 1000,
+        query_timeout: float = 0,
+        max_join_rows: int = 0,
+        statement_cache_size: int = 128,
+        sqlite_options: Optional[SQLiteOptions] = None,
+        read_connections: int = 4,
+        scheduler: Optional[IngestionScheduler] = None,
+        engine: str = "sqlite",
+        engine_options: Optional[Dict[str, Any]] = None,
+        max_database_mb: int = 0
+    ):
+        """Initialize with a SQLite (default) or DuckDB database
+        
+        A file-backed database persists across restarts: its tables are
+        re-registered in the catalog on startup.
         
         Args:
-            db_path: Path to SQLite database (default: in-memory)
+            db_path: Path to database file (default: in-memory)
+            streaming: Default ingestion mode (True = chunked, memory-bounded)
+            chunk_size: Rows per chunk in streaming mode
+            workers: Worker processes for parsing sheets (0 = one per CPU core)
+            cache: Parsed-workbook cache consulted before parsing (optional)
+            query_cache: Query result cache, possibly shared with other processors (optional)
+            slow_query_log: Log recording queries over its threshold, possibly shared (optional)
+            infer_types: Optimize column dtypes and create explicitly typed tables
+            strict_tables: Create DataFrame-mode tables as SQLite STRICT tables (SQLite only)
+            incremental: Skip sheets whose content fingerprint matches the loaded table
+            column_stats: Gather per-column statistics (ranges, distinct counts, top values) while loading
+            quality_checks: Start data-quality checks of loaded tables in the background
+            quality_max_rows: Larger tables are quality-checked on their first rows only
+            auto_index: Index likely key/join/filter columns and ANALYZE after loads
+            index_min_rows: Tables with fewer rows are not indexed
+            query_timeout: Default seconds after which a query is cancelled (0 = no limit)
+            max_join_rows: Queries combining tables without a join condition into more
+                rows than this (estimated from row counts) are rejected (0 = no check)
+            statement_cache_size: Compiled statements kept per database connection (SQLite only)
+            sqlite_options: Connection pragmas (WAL, cache, mmap, ...) (SQLite only)
+            read_connections: Size of the read-only connection pool used by queries (SQLite only)
+            scheduler: Worker pool shared with other processors (``workers`` is
+                ignored and the pool is left running on ``close``)
+            engine: Query engine, "sqlite", "duckdb" or "parquet"
+            engine_options: Extra options for a DuckDB or Parquet engine (threads, memory_limit_mb, compression_level)
+            max_database_mb: Rows are not added to existing tables once the
+                database, staged rows included, is larger than this (0 = no limit)
         """
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.tables: Dict[str, pd.DataFrame] = {}
-        logger.info(f"[bold green]✓[/bold green] Initialized SQLite database: {db_path}", extra={"markup": True})
+        if engine == "sqlite":
+            engine_options = {
+                "sqlite_options": sqlite_options,
+                "read_connections": read_connections,
+                "strict_tables": strict_tables,
+                "statement_cache_size": statement_cache_size,
+                **(engine_options or {})
+            }
+        self.engine = create_engine(engine, db_path, **(engine_options or {}))
+        self.file_backed = self.engine.file_backed
+        
+        self.catalog: Dict[str, TableInfo] = {}
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self._owns_scheduler = scheduler is None
+        self.scheduler = scheduler or IngestionScheduler(max_workers=workers)
+        self.cache = cache
+        self.query_cache = query_cache
+        self.slow_query_log = slow_query_log
+        self._cache_namespace = uuid.uuid4().hex
+        self.infer_types = infer_types
+        self.incremental = incremental
+        self.column_stats = column_stats
+        self.quality_checks = quality_checks
+        self.query_timeout = query_timeout
+        self.max_join_rows = max_join_rows
+        self.max_database_bytes = max_database_mb * 1024 * 1024
+        self.quality = DataQualityChecker(self.engine, self.catalog, max_rows=quality_max_rows)
+        self.schema_cache = SchemaCache(self.engine, self.catalog)
+        self._versions = count(1)
+        self.data_version = 0  # Advances whenever a table is written, appended to, indexed or dropped
+        self.auto_index = auto_index
+        self.index_min_rows = index_min_rows
+        logger.info(f"[bold green]✓[/bold green] Initialized {self.engine.name} database: {db_path}", extra={"markup": True})
+        
+        if self.file_backed:
+            self._restore_catalog()
+    
+    def _new_version(self) -> int:
+        """Advance the data version; the new value versions a changed table"""
+        self.data_version = next(self._versions)
+        return self.data_version
     
-    def load_excel_file(self, file_path: Path) -> List[str]:
-        """Load all sheets from an Excel file into SQLite
+    def _restore_catalog(self):
+        """Register tables already present in a persistent database"""
+        rows = self.engine.table_names()
+        for table_name in rows:
+            info = self.engine.describe_table(table_name)
+            stats = self.engine.load_column_stats(table_name)
+            if stats is not None and set(stats) == set(info.columns):
+                info.column_stats = {column: ColumnStats.from_dict(data) for column, data in stats.items()}
+            info.version = self._new_version()
+            self.catalog[table_name] = info
+        
+        if rows:
+            logger.info(f"[bold green]✓[/bold green] Restored {len(rows)} table(s) from {self.db_path}", extra={"markup": True})
+    
+    def load_excel_file(
+        self,
+        file_path: Path,
+        streaming: Optional[bool] = None,
+        reused: Optional[List[str]] = None,
+        options: Optional[LoadOptions] = None,
+        appended: Optional[List[str]] = None
+    ) -> List[str]:
+        """Load all sheets from an Excel file into the database
         
         Args:
             file_path: Path to Excel file
+            streaming: Read sheets in chunks instead of whole DataFrames
+                (default: the processor's ``streaming`` setting)
+            reused: If given, receives the tables kept unchanged
+            options: Write mode, upsert key and table base name (default: replace)
+            appended: If given, receives the existing tables rows were added to
             
         Returns:
-            List of table names created
+            List of table names created, reused or appended to
         """
-        logger.info(f"[bold blue]📂 Loading Excel file:[/bold blue] {file_path.name}", extra={"markup": True})
+        return self.load_excel_files(
+            [file_path], streaming=streaming, reused=reused, options=options, appended=appended
+        )[file_path]
+    
+    def load_excel_files(
+        self,
+        file_paths: List[Path],
+        streaming: Optional[bool] = None,
+        reused: Optional[List[str]] = None,
+        options: Optional[LoadOptions] = None,
+        appended: Optional[List[str]] = None
+    ) -> Dict[Path, List[str]]:
+        """Load all sheets from several Excel files into the database
         
-        table_names = []
+        CSV/TSV and NDJSON files are accepted too; each becomes one table
+        named after the file and is always streamed.
+        
+        With ``incremental`` on, every sheet is fingerprinted first and
+        sheets whose table was loaded from identical content (with the same
+        settings) are neither parsed nor written again. Fingerprints live in
+        the catalog, so after a restart the first re-upload rebuilds everything.
+        
+        In append and upsert mode, rows of a sheet whose table exists are
+        written to a staging table, checked against the table's schema and
+        moved into it; the catalog entry is updated from the new rows alone.
+        Upserts replace existing rows with the same key. Together with
+        ``base_name`` this lets recurring exports accumulate in one table.
+        
+        In DataFrame mode the sheets of all files are parsed in parallel by
+        the ingestion scheduler and written by this (single) writer, and
+        previously seen workbooks come from the parse cache. Streaming mode
+        loads files one at a time to keep memory bounded and bypasses the cache.
+        
+        Args:
+            file_paths: Paths to Excel files
+            streaming: Read sheets in chunks instead of whole DataFrames
+                (default: the processor's ``streaming`` setting)
+            reused: If given, receives the tables kept unchanged
+            options: Write mode, upsert key and table base name (default: replace)
+            appended: If given, receives the existing tables rows were added to
+            
+        Returns:
+            Dictionary mapping each file path to the table names created, reused or appended to
+            
+        Raises:
+            ValueError: If the options are inconsistent
+            IngestionError: If a file cannot be loaded (``error`` is a
+                ``SchemaMismatchError`` when new rows do not fit their table,
+                a ``DatabaseSizeError`` when they would exceed ``max_database_mb``)
+        """
+        if streaming is None:
+            streaming = self.streaming
+        options = options or LoadOptions()
+        options.validate()
+        
+        streamed_files = []
+        parsed_files = []
+        for file_path in file_paths:
+            if is_text_file(file_path):
+                streamed_files.append(file_path)
+            # openpyxl cannot read legacy .xls workbooks
+            elif streaming and file_path.suffix.lower() == '.xls':
+                logger.info(f"  [dim]⊘ Streaming not supported for {file_path.name}, using DataFrame mode[/dim]", extra={"markup": True})
+                parsed_files.append(file_path)
+            elif streaming:
+                streamed_files.append(file_path)
+            else:
+                parsed_files.append(file_path)
+        
+        results: Dict[Path, List[str]] = {}
         
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             console=console
         ) as progress:
-            task = progress.add_task(f"Processing {file_path.name}...", total=None)
+            task = progress.add_task(f"Processing {len(file_paths)} file(s)...", total=None)
+            
+            # Hashing happens before taking the writer, so it overlaps running queries
+            fingerprints = self._fingerprint_files(file_paths, streaming) if self.incremental else {}
+            
+            run = _LoadRun(options, fingerprints)
+            
+            with self.engine.loading():
+                self._load_files(streamed_files, parsed_files, results, run)
+            
+            if self.quality_checks:
+                changed = [table for tables in results.values() for table in tables if table not in run.kept]
+                self.quality.submit(list(dict.fromkeys(changed)))
+            
+            if reused is not None:
+                reused.extend(run.kept)
+            if appended is not None:
+                appended.extend(dict.fromkeys(run.appended))
+            
+            progress.update(task, completed=True)
+        
+        return {file_path: results[file_path] for file_path in file_paths}
+    
+    def _fingerprint_files(self, file_paths: List[Path], streaming: bool) -> Dict[Path, FileFingerprints]:
+        """Fingerprint the sheets of every file
+        
+        The ingestion settings that shape a table are mixed in, so content
+        loaded with other settings does not count as unchanged.
+        """
+        salt = f"{'streaming' if streaming else 'dataframe'}-{'typed' if self.infer_types else 'untyped'}"
+        fingerprints = {}
+        for file_path in file_paths:
+            try:
+                fingerprints[file_path] = FileFingerprints(file_path, salt)
+            except Exception as e:
+                raise IngestionError(file_path, e) from e
+        return fingerprints
+    
+    def _keep_unchanged(self, table_name: str, sheet_name: str, fingerprint: Optional[str], run: _LoadRun) -> bool:
+        """Keep a table as it is if it was loaded from content with this fingerprint
+        
+        Returns:
+            Whether the sheet can be skipped
+        """
+        info = self.catalog.get(table_name)
+        if fingerprint is None or info is None or info.fingerprint != fingerprint:
+            return False
+        
+        run.kept.append(table_name)
+        logger.info(f"  [cyan]♻️  Unchanged sheet '{sheet_name}', keeping table '{table_name}'[/cyan]", extra={"markup": True})
+        return True
+    
+    def _write_target(self, table_name: str, run: _LoadRun) -> str:
+        """Table to write a sheet to: the table itself, or a staging table when adding rows to it"""
+        if run.options.mode != "replace" and table_name in self.catalog:
+            return f"{table_name}__staging_{uuid.uuid4().hex[:8]}"
+        return table_name
+    
+    def _register_table(
+        self,
+        table_name: str,
+        written: str,
+        info: TableInfo,
+        fingerprint: Optional[str],
+        run: _LoadRun
+    ) -> TableInfo:
+        """Record a written table in the catalog, moving staged rows into their table first
+        
+        Returns:
+            Catalog entry of the table
+        """
+        if written != table_name:
+            target = self.catalog[table_name]
+            try:
+                widen = target.check_appendable(info, run.options.key_columns)
+            except SchemaMismatchError:
+                self.engine.discard_table(written)
+                raise
             
+            # Staged rows are already in the database, so its size is what the table grows to
+            size = self.engine.database_size() if self.max_database_bytes else 0
+            if size > self.max_database_bytes:
+                self.engine.discard_table(written)
+                raise DatabaseSizeError(
+                    f"Adding {info.row_count} rows to '{table_name}' would grow the database to "
+                    f"{size / 1024 / 1024:.1f} MB (limit {self.max_database_bytes / 1024 / 1024:.0f} MB)"
+                )
+            
+            key_columns = run.options.key_columns if run.options.mode == "upsert" else []
+            replaced, superseded = self.engine.append_table(written, table_name, info.columns, key_columns, widen)
+            logger.info(
+                f"  [green]➕ Appended {info.row_count - superseded[0]} rows to table '{table_name}'"
+                + (f" (replacing {replaced[0]})" if replaced[0] else "") + "[/green]",
+                extra={"markup": True}
+            )
+            info = target.appended(info, replaced, superseded, widen)
+            run.appended.append(table_name)
+        elif run.options.mode == "upsert":
+            missing = [key for key in run.options.key_columns if key not in info.columns]
+            if missing:
+                self.engine.discard_table(written)
+                raise SchemaMismatchError(f"Key column(s) {', '.join(missing)} missing from the rows of '{table_name}'")
+        
+        info.name = table_name
+        info.fingerprint = fingerprint
+        info.version = self._new_version()
+        self.catalog[table_name] = info
+        if self.query_cache is not None:
+            self.query_cache.invalidate(self._cache_namespace, [table_name])
+        self.engine.save_column_stats(
+            table_name,
+            {column: stats.to_dict() for column, stats in info.column_stats.items()} if info.column_stats else None
+        )
+        return info
+    
+    def _load_files(
+        self,
+        streamed_files: List[Path],
+        parsed_files: List[Path],
+        results: Dict[Path, List[str]],
+        run: _LoadRun
+    ):
+        """Load files in their respective modes, then index the new tables
+        
+        Tables that were kept or appended to are not re-indexed: their
+        indexes are maintained by the inserts.
+        """
+        for file_path in streamed_files:
+            logger.info(f"[bold blue]📂 Loading file:[/bold blue] {file_path.name} (streaming mode)", extra={"markup": True})
             try:
-                # Read all sheets
-                excel_file = pd.ExcelFile(file_path)
-                
-                for sheet_name in excel_file.sheet_names:
-                    # Skip metadata sheets
-                    if sheet_name.lower() in ['metadata', 'info']:
-                        logger.info(f"  [dim]⊘ Skipping sheet: {sheet_name}[/dim]", extra={"markup": True})
+                if is_text_file(file_path):
+                    results[file_path] = self._load_text_file(file_path, run)
+                else:
+                    results[file_path] = self._load_streaming(file_path, run)
+            except Exception as e:
+                logger.error(f"[bold red]✗ Error loading {file_path.name}:[/bold red] {e}", extra={"markup": True})
+                raise IngestionError(file_path, e) from e
+            logger.info(f"[bold green]✓ Completed loading {file_path.name}[/bold green]", extra={"markup": True})
+        
+        if parsed_files:
+            results.update(self._load_dataframes(parsed_files, run))
+        
+        if self.auto_index:
+            loaded = [
+                table for table in dict.fromkeys(chain.from_iterable(results.values()))
+                if table not in run.kept and table not in run.appended
+            ]
+            reindexed = self.engine.index_tables(loaded, self.catalog, self.index_min_rows)
+            # Indexes are part of the schema, also of existing tables that gained one
+            for table in dict.fromkeys(loaded + reindexed):
+                self.catalog[table].version = self._new_version()
+    
+    def _load_dataframes(self, file_paths: List[Path], run: _LoadRun) -> Dict[Path, List[str]]:
+        """Parse every sheet as a full DataFrame and write it with ``to_sql``
+        
+        Workbooks found in the parse cache are loaded from their columnar
+        copy. The rest are fanned out to the ingestion scheduler; inserts
+        happen here, one sheet at a time, as parsed sheets come back.
+        Unchanged sheets are skipped before parsing.
+        """
+        cached_sheets: List[Tuple[SheetJob, pd.DataFrame]] = []
+        jobs: List[SheetJob] = []
+        file_tables: Dict[Path, List[str]] = {}
+        digests: Dict[Path, str] = {}
+        base_name = run.options.base_name
+        
+        for file_path in file_paths:
+            logger.info(f"[bold blue]📂 Loading Excel file:[/bold blue] {file_path.name} (DataFrame mode)", extra={"markup": True})
+            
+            try:
+                if self.cache is not None:
+                    # Typed and untyped parses are cached separately
+                    digest = file_sha256(file_path) + ("-typed" if self.infer_types else "")
+                    sheets = self.cache.get(digest)
+                    if sheets is not None:
+                        logger.info(f"  [cyan]⚡ Parse cache hit for {file_path.name}[/cyan]", extra={"markup": True})
+                        file_tables[file_path] = []
+                        for sheet_name, df in sheets.items():
+                            job = SheetJob(file_path, sheet_name, make_table_name(file_path, sheet_name, base_name))
+                            file_tables[file_path].append(job.table_name)
+                            if not self._keep_unchanged(job.table_name, sheet_name, run.fingerprint(file_path, sheet_name), run):
+                                cached_sheets.append((job, df))
                         continue
-                    
-                    # Read sheet
-                    df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    
-                    # Create table name: filename_sheetname
-                    # Sanitize names to remove dots and special characters
-                    import re
-                    def clean_name(n):
-                        return re.sub(r'[^a-zA-Z0-9_]', '_', n)
-                    
-                    base_name = clean_name(file_path.stem)
-                    clean_sheet = clean_name(sheet_name)
-                    table_name = f"{base_name}_{clean_sheet}".lower()
-                    
-                    # Save to SQLite
-                    df.to_sql(table_name, self.conn, if_exists='replace', index=False)
-                    
-                    # Store metadata
-                    self.tables[table_name] = df
-                    table_names.append(table_name)
-                    
-                    logger.info(
-                        f"  [green]✓[/green] Loaded sheet '{sheet_name}' → table '{table_name}' "
-                        f"({len(df)} rows, {len(df.columns)} columns)",
-                        extra={"markup": True}
-                    )
-                
-                progress.update(task, completed=True)
-                logger.info(f"[bold green]✓ Completed loading {file_path.name}[/bold green]", extra={"markup": True})
+                    digests[file_path] = digest
                 
+                with pd.ExcelFile(file_path) as excel_file:
+                    sheet_names = excel_file.sheet_names
             except Exception as e:
                 logger.error(f"[bold red]✗ Error loading {file_path.name}:[/bold red] {e}", extra={"markup": True})
-                raise
+                raise IngestionError(file_path, e) from e
+            
+            file_tables[file_path] = []
+            for sheet_name in sheet_names:
+                # Skip metadata sheets
+                if sheet_name.lower() in SKIPPED_SHEETS:
+                    logger.info(f"  [dim]⊘ Skipping sheet: {sheet_name}[/dim]", extra={"markup": True})
+                    continue
+                job = SheetJob(file_path, sheet_name, make_table_name(file_path, sheet_name, base_name))
+                file_tables[file_path].append(job.table_name)
+                if self._keep_unchanged(job.table_name, sheet_name, run.fingerprint(file_path, sheet_name), run):
+                    # Only complete workbooks go to the parse cache
+                    digests.pop(file_path, None)
+                else:
+                    jobs.append(job)
+        
+        # Parsed sheets per workbook, written to the cache once a workbook is complete
+        pending = {file_path: {} for file_path in digests}
+        
+        def drain_cached():
+            # Hand cached sheets over one by one so each can be freed once written
+            while cached_sheets:
+                yield cached_sheets.pop(0)
+        
+        try:
+            for job, df in chain(drain_cached(), self.scheduler.parse(jobs, self.infer_types)):
+                self._store_dataframe(job, df, run)
+                
+                if job.file_path in pending:
+                    sheets = pending[job.file_path]
+                    sheets[job.sheet_name] = df
+                    if len(sheets) == len(file_tables[job.file_path]):
+                        # Keep the workbook's sheet order
+                        ordered = {
+                            other.sheet_name: sheets[other.sheet_name]
+                            for other in jobs if other.file_path == job.file_path
+                        }
+                        self.cache.put(digests[job.file_path], ordered)
+                        del pending[job.file_path]
+        except IngestionError as e:
+            logger.error(f"[bold red]✗ Error loading {e.file_path.name}:[/bold red] {e}", extra={"markup": True})
+            raise
+        
+        # Workbooks without any loadable sheet are cached too
+        for file_path, sheets in pending.items():
+            if not sheets:
+                self.cache.put(digests[file_path], {})
+        
+        for file_path in file_paths:
+            logger.info(f"[bold green]✓ Completed loading {file_path.name}[/bold green]", extra={"markup": True})
+        
+        return file_tables
+    
+    def _store_dataframe(self, job: SheetJob, df: pd.DataFrame, run: _LoadRun):
+        """Write a parsed sheet to the database and record its metadata"""
+        written = self._write_target(job.table_name, run)
+        try:
+            self.engine.write_dataframe(written, df, typed=self.infer_types)
+            # Store metadata; the DataFrame itself is released by the caller
+            info = TableInfo.from_dataframe(job.table_name, df)
+            if self.column_stats:
+                info.column_stats = dataframe_stats(df)
+            self._register_table(job.table_name, written, info, run.fingerprint(job.file_path, job.sheet_name), run)
+        except Exception as e:
+            raise IngestionError(job.file_path, e) from e
+        
+        logger.info(
+            f"  [green]✓[/green] Loaded sheet '{job.sheet_name}' → table '{job.table_name}' "
+            f"({len(df)} rows, {len(df.columns)} columns)",
+            extra={"markup": True}
+        )
+    
+    def _load_streaming(self, file_path: Path, run: _LoadRun) -> List[str]:
+        """Stream every sheet into the database in chunks of ``chunk_size`` rows
+        
+        Peak memory is bounded by the chunk size rather than the sheet size.
+        Sheets matching their fingerprint are skipped.
+        """
+        table_names = []
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        
+        try:
+            for sheet_name in workbook.sheetnames:
+                if sheet_name.lower() in SKIPPED_SHEETS:
+                    logger.info(f"  [dim]⊘ Skipping sheet: {sheet_name}[/dim]", extra={"markup": True})
+                    continue
+                
+                table_name = make_table_name(file_path, sheet_name, run.options.base_name)
+                fingerprint = run.fingerprint(file_path, sheet_name)
+                table_names.append(table_name)
+                if self._keep_unchanged(table_name, sheet_name, fingerprint, run):
+                    continue
+                
+                written = self._write_target(table_name, run)
+                columns, chunks = iter_sheet_chunks(workbook[sheet_name], self.chunk_size)
+                info = self._write_chunks(written, columns, chunks)
+                self._register_table(table_name, written, info, fingerprint, run)
+                
+                logger.info(
+                    f"  [green]✓[/green] Streamed sheet '{sheet_name}' → table '{table_name}' "
+                    f"({info.row_count} rows, {len(columns)} columns)",
+                    extra={"markup": True}
+                )
+        finally:
+            workbook.close()
         
         return table_names
     
-    def get_schema(self) -> Dict[str, Any]:
-        """Get schema information for all loaded tables
+    def _load_text_file(self, file_path: Path, run: _LoadRun) -> List[str]:
+        """Stream a CSV/TSV or NDJSON file into one table in chunks of ``chunk_size`` rows
+        
+        Column types are sniffed from the first chunk. An unchanged file is skipped.
+        """
+        table_name = make_file_table_name(file_path, run.options.base_name)
+        fingerprint = run.fingerprint(file_path)
+        if self._keep_unchanged(table_name, file_path.name, fingerprint, run):
+            return [table_name]
+        
+        written = self._write_target(table_name, run)
+        columns, chunks = iter_text_chunks(file_path, self.chunk_size)
+        info = self._write_chunks(written, columns, chunks)
+        info = self._register_table(table_name, written, info, fingerprint, run)
+        
+        logger.info(
+            f"  [green]✓[/green] Streamed file '{file_path.name}' → table '{table_name}' "
+            f"({info.row_count} rows, {len(columns)} columns)",
+            extra={"markup": True}
+        )
+        return [table_name]
+    
+    def _write_chunks(self, table_name: str, columns: List[str], chunks) -> TableInfo:
+        """Replace ``table_name`` with the given row chunks in one transaction
+        
+        Column types are inferred from the first chunk and widened when a
+        later chunk does not fit them. Catalog metadata (row and NULL
+        counts, approximate size) is gathered along the way.
         
         Returns:
-            Dictionary with table schemas
+            Catalog entry of the new table
         """
-        schema = {}
-        cursor = self.conn.cursor()
+        null_counts = [0] * len(columns)
+        column_stats = [ColumnStats() for _ in columns]
+        stats = {"rows": 0, "bytes": 0}
+        
+        def counted(chunks):
+            for chunk in chunks:
+                # Column-wise pass: NULL counts and an estimate of the DataFrame footprint
+                stats["rows"] += len(chunk)
+                stats["bytes"] += 8 * len(chunk) * len(columns)
+                for idx, values in enumerate(zip(*chunk)):
+                    null_counts[idx] += values.count(None)
+                    stats["bytes"] += sum(sys.getsizeof(v) for v in values if isinstance(v, str))
+                    if self.column_stats:
+                        column_stats[idx] = column_stats[idx].merge(ColumnStats.from_series(pd.Series(values)))
+                yield chunk
+        
+        column_types = self.engine.write_chunks(table_name, columns, counted(chunks))
         
-        for table_name in self.tables.keys():
-            # Get column info
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
+        info = TableInfo(
+            name=table_name,
+            row_count=stats["rows"],
+            columns=columns,
+            dtypes=[SQLITE_TO_DTYPE[column_type] for column_type in column_types[:len(columns)]],
+            null_counts=dict(zip(columns, null_counts)),
+            byte_size=stats["bytes"]
+        )
+        if self.column_stats:
+            info.column_stats = dict(zip(columns, column_stats))
+        return info
+    
+    def get_schema(
+        self,
+        include_stats: bool = False,
+        name_filter: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get schema information for loaded tables
+        
+        Entries are cached and only rebuilt for tables that changed.
+        
+        Args:
+            include_stats: Add the column statistics gathered at load time
+            name_filter: Glob pattern or substring of table names (default: all tables)
+            offset: Matching tables to skip
+            limit: Maximum tables to return (default: all)
             
-            schema[table_name] = {
-                'columns': [col[1] for col in columns],
-                'types': [col[2] for col in columns],
-                'row_count': len(self.tables[table_name])
-            }
+        Returns:
+            Dictionary with table schemas
+        """
+        entries, _, _ = self.schema_cache.page(self.data_version, name_filter, offset, limit)
+        
+        # Callers get their own copies of the cached entries
+        schema = {table_name: dict(entry) for table_name, entry in entries.items()}
+        if include_stats:
+            for table_name, entry in schema.items():
+                entry['stats'] = self.get_column_stats(table_name)
         
         return schema
     
-    def execute_query(self, query: str) -> pd.DataFrame:
+    def get_schema_text(
+        self,
+        name_filter: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[str, int]:
+        """Get the schema rendered for the agent
+        
+        Args:
+            name_filter: Glob pattern or substring of table names (default: all tables)
+            offset: Matching tables to skip
+            limit: Maximum tables to describe (default: all)
+            
+        Returns:
+            Description of the page's tables and the number of matching tables
+        """
+        _, text, total = self.schema_cache.page(self.data_version, name_filter, offset, limit)
+        return text, total
+    
+    def count_tables(self, name_filter: Optional[str] = None) -> int:
+        """Number of loaded tables matching a filter"""
+        return sum(1 for table_name in list(self.catalog) if matches_filter(table_name, name_filter))
+    
+    def get_column_stats(self, table_name: str) -> Dict[str, Dict[str, Any]]:
+        """Get the column statistics of a table
+        
+        Args:
+            table_name: Name of table
+            
+        Returns:
+            Statistics per column (empty if none were gathered)
+            
+        Raises:
+            KeyError: If the table does not exist
+        """
+        info = self.catalog[table_name]
+        return {column: stats.summary() for column, stats in info.column_stats.items()}
+    
+    def check_data_quality(self, table_names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Check tables for missing values, type mismatches, duplicate keys,
+        outliers and inconsistent spellings
+        
+        Results of tables unchanged since their last check are reused.
+        
+        Args:
+            table_names: Tables to check (default: all)
+            
+        Returns:
+            Issues per table, inconsistent spellings across tables, and
+            tables whose check failed
+        """
+        return self.quality.check(table_names)
+    
+    def _cache_key(self, query: str, params: Optional[QueryParams] = None) -> Optional[tuple]:
+        """Result-cache key of a query (None if its result must not be cached)"""
+        normalized = normalize_sql(query)
+        tables = referenced_tables(normalized, list(self.catalog))
+        if not tables or not is_cacheable(normalized):
+            self.query_cache.note_uncacheable()
+            return None
+        versions = {table: self.catalog[table].version for table in tables if table in self.catalog}
+        return QueryCache.make_key(self._cache_namespace, normalized, versions, params)
+    
+    def execute_query(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        params: Optional[QueryParams] = None,
+        row_limit: Optional[int] = None
+    ) -> pd.DataFrame:
         """Execute SQL query and return results
         
+        Results are served from the query cache while the tables they were
+        computed from are unchanged. Queries that would write or combine
+        tables into a runaway cartesian product are rejected before running.
+        
         Args:
             query: SQL query string
+            timeout: Seconds after which the query is cancelled (default:
+                the processor's ``query_timeout``; 0 = no limit)
+            params: Values bound to the query's ``?`` (list) or ``$name``
+                (dict) placeholders; repeated queries reuse the prepared statement
+            row_limit: Fetch at most this many rows of a query without a
+                top-level LIMIT (``attrs["truncated"]`` is set on the result
+                if it had more)
             
         Returns:
             Query results as DataFrame
+            
+        Raises:
+            QueryRejectedError: If the query is rejected by the pre-execution checks
+            QueryTimeoutError: If the query runs past its deadline
         """
+        if row_limit:
+            # One row more than the limit tells whether the result was cut off
+            limited = limit_rows(query, row_limit + 1)
+            if limited is not None:
+                result = self.execute_query(limited, timeout, params)
+                if len(result) > row_limit:
+                    result = result.iloc[:row_limit]
+                    result.attrs = {**result.attrs, "truncated": True}
+                    logger.info(f"[yellow]✂ Result cut off at {row_limit} rows[/yellow]", extra={"markup": True})
+                return result
+        
         logger.info(f"[bold cyan]🔍 Executing SQL query:[/bold cyan]", extra={"markup": True})
         logger.info(f"[dim]{query}[/dim]", extra={"markup": True})
         
         try:
-            result = pd.read_sql_query(query, self.conn)
+            check_query(query, self.catalog, self.max_join_rows)
+        except QueryRejectedError as e:
+            logger.warning(f"[yellow]⛔ {e}[/yellow]", extra={"markup": True})
+            raise
+        
+        cache_key = self._cache_key(query, params) if self.query_cache is not None else None
+        if cache_key is not None:
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"[cyan]⚡ Result cache hit ({len(cached)} rows)[/cyan]", extra={"markup": True})
+                return cached
+        
+        if timeout is None:
+            timeout = self.query_timeout
+        
+        started = time.perf_counter()
+        try:
+            result = self.engine.query(query, timeout=timeout or None, params=params)
             logger.info(f"[green]✓ Query returned {len(result)} rows[/green]", extra={"markup": True})
+            self._log_if_slow(query, params, time.perf_counter() - started, len(result))
+            if cache_key is not None:
+                self.query_cache.put(cache_key, result)
             return result
+        except QueryTimeoutError:
+            logger.warning(f"[yellow]⏱ Query cancelled after {timeout:g}s[/yellow]", extra={"markup": True})
+            self._log_if_slow(query, params, time.perf_counter() - started, None)
+            raise
         except Exception as e:
             logger.error(f"[bold red]✗ Query error:[/bold red] {e}", extra={"markup": True})
             raise
     
+    def _log_if_slow(self, query: str, params: Optional[QueryParams], duration: float, rows: Optional[int]):
+        """Record a query in the slow-query log if it took long enough (or timed out)
+        
+        Args:
+            query: SQL query string
+            params: Its bound parameter values
+            duration: Seconds the engine took
+            rows: Rows returned (None if the query timed out)
+        """
+        log = self.slow_query_log
+        if log is None or (rows is not None and duration < log.threshold_s):
+            return
+        
+        try:
+            plan = self.engine.explain(query, params)
+        except Exception as e:
+            plan = [f"(plan unavailable: {e})"]
+        full_scans, suggested_indexes = analyze_plan(self.engine.name, plan, query, self.catalog)
+        log.record(SlowQuery(
+            fingerprint=sql_fingerprint(query_shape(normalize_sql(query)))[:16],
+            sql=query,
+            duration_s=round(duration, 4),
+            rows=rows,
+            engine=self.engine.name,
+            plan=plan,
+            full_scans=full_scans,
+            suggested_indexes=suggested_indexes,
+            timed_out=rows is None
+        ))
+        
+        logger.warning(f"[yellow]🐢 Slow query ({duration:.2f}s)[/yellow]", extra={"markup": True})
+        for suggestion in suggested_indexes:
+            logger.info(f"[dim]  Suggested index: {suggestion}[/dim]", extra={"markup": True})
+    
+    def stream_query(
+        self,
+        query: str,
+        batch_size: int = 10_000,
+        timeout: Optional[float] = None,
+        params: Optional[QueryParams] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Execute SQL query and fetch its results in batches
+        
+        Nothing is cached and the full result is never held in memory; the
+        first batch (possibly empty, with the columns) is fetched right away,
+        so errors surface before any rows are sent.
+        
+        Args:
+            query: SQL query string
+            batch_size: Rows per batch
+            timeout: Seconds the query may spend executing and fetching
+                (default: the processor's ``query_timeout``; 0 = no limit)
+            params: Values bound to the query's placeholders
+            
+        Returns:
+            Iterator of result batches
+            
+        Raises:
+            QueryRejectedError: If the query is rejected by the pre-execution checks
+            QueryTimeoutError: If the first batch is not ready in time
+        """
+        logger.info(f"[bold cyan]🔍 Streaming SQL query:[/bold cyan]", extra={"markup": True})
+        logger.info(f"[dim]{query}[/dim]", extra={"markup": True})
+        
+        try:
+            check_query(query, self.catalog, self.max_join_rows)
+        except QueryRejectedError as e:
+            logger.warning(f"[yellow]⛔ {e}[/yellow]", extra={"markup": True})
+            raise
+        
+        if timeout is None:
+            timeout = self.query_timeout
+        batches = self.engine.query_batches(query, batch_size, timeout or None, params)
+        try:
+            first = next(batches)
+        except Exception as e:
+            logger.error(f"[bold red]✗ Query error:[/bold red] {e}", extra={"markup": True})
+            raise
+        
+        def resume() -> Iterator[pd.DataFrame]:
+            # Closing this generator closes the engine's and releases its connection
+            try:
+                yield first
+                yield from batches
+            finally:
+                batches.close()
+        
+        return resume()
+    
+    def database_size(self) -> int:
+        """Bytes used by the database (in memory or on disk)"""
+        return self.engine.database_size()
+    
+    def drop_tables(self, table_names: List[str]):
+        """Drop tables and remove them from the catalog
+        
+        Args:
+            table_names: Tables to drop
+        """
+        self.engine.drop_tables(table_names)
+        for table_name in table_names:
+            self.catalog.pop(table_name, None)
+        self._new_version()
+        if self.query_cache is not None:
+            self.query_cache.invalidate(self._cache_namespace, table_names)
+    
     def get_table_preview(self, table_name: str, n: int = 5) -> pd.DataFrame:
         """Get preview of table
         
@@ -140,6 +951,10 @@ class ExcelProcessor:
         return self.execute_query(f"SELECT * FROM {table_name} LIMIT {n}")
     
     def close(self):
-        """Close database connection"""
-        self.conn.close()
+        """Close database connection and stop ingestion workers"""
+        if self._owns_scheduler:
+            self.scheduler.shutdown()
+        if self.query_cache is not None:
+            self.query_cache.clear_namespace(self._cache_namespace)
+        self.engine.close()
         logger.info("[bold yellow]⊗ Closed database connection[/bold yellow]", extra={"markup": True})
@@ -0,0 +1,142 @@
+"""
+Chunked Excel sheet reader used by the streaming ingestion mode.
+
+Rows are pulled from openpyxl in read-only mode so that only one chunk of
+a sheet is ever materialized in memory at a time.
+"""
+from datetime import date, datetime, time
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+
+
+def normalize_header(raw_header: Sequence[Any]) -> List[str]:
+    """Build column names the same way pandas.read_excel does
+
+    Empty header cells become ``Unnamed: <i>`` and duplicated names get a
+    ``.<n>`` suffix, so both ingestion modes produce identical tables.
+
+    Args:
+        raw_header: Values of the first sheet row
+
+    Returns:
+        List of column names
+    """
+    columns = []
+    seen = {}
+    for idx, value in enumerate(raw_header):
+        name = f"Unnamed: {idx}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def to_sql_value(value: Any) -> Any:
+    """Convert an openpyxl cell value to a value sqlite3 can bind
+
+    Date/time values are rendered like pandas' ``to_sql`` renders them.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, float) and value != value:  # NaN
+        return None
+    return value
+
+
+def iter_sheet_chunks(
+    worksheet: ReadOnlyWorksheet,
+    chunk_size: int
+) -> Tuple[List[str], Iterator[List[Tuple[Any, ...]]]]:
+    """Stream a worksheet as fixed-size chunks of row tuples
+
+    The first row is used as header. Fully empty rows are skipped, matching
+    pandas' ``skip_blank_lines`` behaviour. Cell values are returned as-is;
+    use ``to_sql_value`` before binding them.
+
+    Args:
+        worksheet: Read-only openpyxl worksheet
+        chunk_size: Maximum number of rows per chunk
+
+    Returns:
+        Tuple of (column names, iterator over chunks of row tuples)
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    raw_header: Optional[Tuple[Any, ...]] = next(rows, None)
+
+    if raw_header is None:
+        return [], iter(())
+
+    # Drop trailing empty header cells (openpyxl pads rows to the sheet dimension)
+    width = len(raw_header)
+    while width > 0 and raw_header[width - 1] is None:
+        width -= 1
+    columns = normalize_header(raw_header[:width])
+
+    def chunks() -> Iterator[List[Tuple[Any, ...]]]:
+        chunk = []
+        for row in rows:
+            values = tuple(row[:width])
+            if all(v is None for v in values):
+                continue
+            if len(values) < width:
+                values += (None,) * (width - len(values))
+            chunk.append(values)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    return columns, chunks()
+
+
+def infer_sqlite_type(values: Sequence[Any]) -> str:
+    """Pick a column type for CREATE TABLE from a sample of values
+
+    Mirrors the types pandas' ``to_sql`` would emit for the same data.
+    """
+    kinds = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, (datetime, date)):
+            kinds.add("TIMESTAMP")
+        elif isinstance(value, int):
+            kinds.add("INTEGER")
+        elif isinstance(value, float):
+            kinds.add("REAL")
+        else:
+            kinds.add("TEXT")
+
+    if not kinds or "TEXT" in kinds:
+        return "TEXT"
+    if kinds == {"TIMESTAMP"}:
+        return "TIMESTAMP"
+    if "TIMESTAMP" in kinds:
+        return "TEXT"
+    if "REAL" in kinds:
+        return "REAL"
+    return "INTEGER"
+
+
+def widen_sqlite_type(column_type: str, values: Sequence[Any]) -> str:
+    """Narrowest column type holding both a column of ``column_type`` and ``values``
+
+    Streamed loads infer types from the first chunk; a later chunk that
+    does not fit (a fraction in an integer column, text anywhere) widens
+    the column to REAL or TEXT instead of being cast.
+    """
+    if column_type == "TEXT" or all(value is None for value in values):
+        return column_type
+    values_type = infer_sqlite_type(values)
+    if values_type == column_type:
+        return column_type
+    if {column_type, values_type} == {"INTEGER", "REAL"}:
+        return "REAL"
+    return "TEXT"
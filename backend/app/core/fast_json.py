@@ -0,0 +1,141 @@
+"""
+Fast JSON encoding of API responses.
+
+Responses are encoded with orjson, which serializes dicts, lists,
+datetimes and NumPy scalars and arrays natively, several times faster
+than the standard library encoder. DataFrames are written by pandas'
+vectorized encoder as arrays of row arrays and spliced into the document
+unchanged; only float columns, which pandas would round to 15 digits,
+become Python floats.
+
+Routers return ``FastJSONResponse`` with data the server produced itself,
+which skips FastAPI's re-validation and ``jsonable_encoder`` pass (their
+response models still describe the API docs). Without orjson the standard
+library encoder is used, with the same conversions.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _loads(text: str) -> Any:
+    return orjson.loads(text) if ORJSON_AVAILABLE else json.loads(text)
+
+
+def _float_cells(column: pd.Series) -> List[Optional[float]]:
+    """Values of a float column as Python floats (NaN/inf as None)
+
+    Narrower floats go through their shortest text form, so a float32 0.1
+    is written as 0.1 rather than as the float64 nearest to it.
+    """
+    values = column.to_numpy(dtype=getattr(column.dtype, "numpy_dtype", column.dtype), na_value=np.nan)
+    if values.dtype != np.float64:
+        values = values.astype(str).astype(np.float64)
+    cells = values.tolist()
+    for idx in np.flatnonzero(~np.isfinite(values)):
+        cells[idx] = None
+    return cells
+
+
+def _float_columns(frame: pd.DataFrame) -> List[int]:
+    """Positions of a DataFrame's float columns"""
+    return [idx for idx, dtype in enumerate(frame.dtypes) if pd.api.types.is_float_dtype(dtype)]
+
+
+def _rows(frame: pd.DataFrame, floats: List[int]) -> List[list]:
+    """Rows of a DataFrame as lists, float columns as Python floats and the rest as pandas encodes them"""
+    others = [idx for idx in range(frame.shape[1]) if idx not in floats]
+    if others:
+        rows = _loads(frame.iloc[:, others].to_json(orient="values", date_format="iso", force_ascii=False, default_handler=str))
+    else:
+        rows = [[] for _ in range(len(frame))]
+    for idx in floats:
+        for row, cell in zip(rows, _float_cells(frame.iloc[:, idx])):
+            row.insert(idx, cell)
+    return rows
+
+
+def dataframe_rows_json(frame: pd.DataFrame) -> str:
+    """Rows of a DataFrame as a JSON array of arrays (NaN/NaT as null, timestamps in ISO 8601)
+
+    pandas writes floats with at most 15 significant digits, so float
+    columns are encoded from Python floats instead (the shortest text that
+    reads back as the same float64); all other columns keep pandas'
+    vectorized encoding.
+    """
+    floats = _float_columns(frame)
+    if not floats:
+        return frame.to_json(orient="values", date_format="iso", force_ascii=False, default_handler=str)
+    return dumps(_rows(frame, floats)).decode("utf-8")
+
+
+def dataframe_ndjson(frame: pd.DataFrame) -> str:
+    """Rows of a DataFrame as newline-delimited JSON objects, each line ending in a newline
+
+    Float columns are encoded at full precision, as in ``dataframe_rows_json``.
+    """
+    floats = _float_columns(frame)
+    if not floats:
+        text = frame.to_json(orient="records", lines=True, date_format="iso")
+        return text if text.endswith("\n") else text + "\n"
+    names = [str(column) for column in frame.columns]
+    return "".join(dumps(dict(zip(names, row))).decode("utf-8") + "\n" for row in _rows(frame, floats))
+
+
+def _default(value: Any) -> Any:
+    """Encoding of values the JSON encoder does not handle itself"""
+    if isinstance(value, pd.DataFrame):
+        rows = dataframe_rows_json(value)
+        return orjson.Fragment(rows) if ORJSON_AVAILABLE else json.loads(rows)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (np.ndarray, pd.Series, pd.Index)):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode a response body as UTF-8 JSON
+
+    Args:
+        content: Dicts, lists, scalars, NumPy values, pydantic models and
+            DataFrames (encoded as their rows) in any nesting
+
+    Returns:
+        The encoded document
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with ``dumps``"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,145 @@
+"""
+Per-sheet content fingerprints for incremental re-ingestion.
+
+An .xlsx workbook is a zip of one XML part per sheet. A sheet's fingerprint
+hashes its XML together with everything outside it that determines its
+values: the shared strings it references and the number formats of the
+styles it uses (which decide whether a number is read as a date). Editing
+one sheet therefore leaves the fingerprints of the others unchanged, and
+nothing has to be parsed to find out which sheets changed.
+
+Files whose sheets cannot be hashed separately (.xls, text files, or an
+.xlsx that does not look as expected) fall back to the digest of the
+whole file for every sheet.
+"""
+import hashlib
+import posixpath
+import re
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional
+from xml.etree import ElementTree
+
+from app.core.workbook_cache import file_sha256
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Cells (self-closing or with content), shared-string items, attributes
+_CELL_PATTERN = re.compile(rb"<(?:\w+:)?c\b([^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>)", re.DOTALL)
+_VALUE_PATTERN = re.compile(rb"<(?:\w+:)?v>(\d+)</(?:\w+:)?v>")
+_SHARED_STRING_PATTERN = re.compile(rb"<(?:\w+:)?si\b[^>]*?(?:/>|>(.*?)</(?:\w+:)?si>)", re.DOTALL)
+_STYLE_ATTRIBUTE = re.compile(rb'\bs="(\d+)"')
+_SHARED_STRING_TYPE = re.compile(rb'\bt="s"')
+
+
+def _part_path(target: str) -> str:
+    """Zip member name of a relationship target (relative to xl/ or absolute)"""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def _style_formats(archive: zipfile.ZipFile, styles_part: Optional[str]) -> List[str]:
+    """Number format (id and code) of every cell style, by style index"""
+    if styles_part is None or styles_part not in archive.namelist():
+        return []
+    root = ElementTree.fromstring(archive.read(styles_part))
+    codes = {
+        fmt.get("numFmtId"): fmt.get("formatCode", "")
+        for fmt in root.iter(f"{_MAIN_NS}numFmt")
+    }
+    cell_xfs = root.find(f"{_MAIN_NS}cellXfs")
+    if cell_xfs is None:
+        return []
+    formats = []
+    for xf in cell_xfs.findall(f"{_MAIN_NS}xf"):
+        fmt_id = xf.get("numFmtId", "0")
+        formats.append(f"{fmt_id}:{codes.get(fmt_id, '')}")
+    return formats
+
+
+def xlsx_sheet_fingerprints(file_path: Path) -> Dict[str, str]:
+    """Fingerprint every sheet of an .xlsx workbook without parsing cells
+
+    Args:
+        file_path: Path to the workbook
+
+    Returns:
+        Dictionary mapping sheet names to hex digests (empty if the
+        workbook's structure is not recognized)
+    """
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+            rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+
+            targets = {}
+            shared_strings_part = styles_part = None
+            for rel in rels.iter(f"{_PKG_REL_NS}Relationship"):
+                target = _part_path(rel.get("Target", ""))
+                targets[rel.get("Id")] = target
+                rel_type = rel.get("Type", "")
+                if rel_type.endswith("/sharedStrings"):
+                    shared_strings_part = target
+                elif rel_type.endswith("/styles"):
+                    styles_part = target
+
+            shared_strings: List[bytes] = []
+            if shared_strings_part is not None and shared_strings_part in archive.namelist():
+                shared_strings = [
+                    match.group(1) or b""
+                    for match in _SHARED_STRING_PATTERN.finditer(archive.read(shared_strings_part))
+                ]
+            style_formats = _style_formats(archive, styles_part)
+
+            fingerprints = {}
+            for sheet in workbook.iter(f"{_MAIN_NS}sheet"):
+                sheet_xml = archive.read(targets[sheet.get(f"{_REL_NS}id")])
+
+                strings = set()
+                styles = set()
+                for cell in _CELL_PATTERN.finditer(sheet_xml):
+                    attributes, content = cell.group(1), cell.group(2) or b""
+                    style = _STYLE_ATTRIBUTE.search(attributes)
+                    if style:
+                        styles.add(int(style.group(1)))
+                    if _SHARED_STRING_TYPE.search(attributes):
+                        value = _VALUE_PATTERN.search(content)
+                        if value:
+                            strings.add(int(value.group(1)))
+
+                digest = hashlib.sha256(sheet_xml)
+                for idx in sorted(strings):
+                    digest.update(b"\0s%d:" % idx + shared_strings[idx])
+                for idx in sorted(styles):
+                    fmt = style_formats[idx] if idx < len(style_formats) else ""
+                    digest.update(b"\0f%d:" % idx + fmt.encode())
+                fingerprints[sheet.get("name")] = digest.hexdigest()
+            return fingerprints
+    except (KeyError, IndexError, ValueError, zipfile.BadZipFile, ElementTree.ParseError):
+        return {}
+
+
+class FileFingerprints:
+    """Fingerprints of the sheets (or the single table) of one file
+
+    ``salt`` is mixed into every fingerprint, so loading the same content
+    with different ingestion settings does not count as unchanged.
+    """
+
+    def __init__(self, file_path: Path, salt: str = ""):
+        self.file_path = file_path
+        self.salt = salt
+        self._sheets = xlsx_sheet_fingerprints(file_path) if file_path.suffix.lower() == ".xlsx" else {}
+        self._file_digest: Optional[str] = None
+
+    def sheet(self, sheet_name: Optional[str] = None) -> str:
+        """Fingerprint of a sheet (``None``: the file's only table)"""
+        digest = self._sheets.get(sheet_name)
+        if digest is None:
+            if self._file_digest is None:
+                self._file_digest = file_sha256(self.file_path)
+            digest = self._file_digest
+        return f"{digest}-{self.salt}" if self.salt else digest
@@ -0,0 +1,152 @@
+"""
+Automatic indexing of loaded tables.
+
+After a load, columns that the agent is likely to filter, join or group on
+are indexed and ``ANALYZE`` is run so the SQLite planner has statistics.
+Candidates are picked from column names (ids, dates, countries, ...),
+columns shared with other tables (join keys) and their cardinality.
+"""
+import re
+import sqlite3
+from typing import Dict, List
+
+from app.core.catalog import TableInfo
+from app.core.logger import logger
+from app.core.sql_utils import quote_identifier
+
+# Column names that usually identify keys or common filters
+KEY_NAME_PATTERN = re.compile(
+    r"(^id$|_id$|^id_|_key$|_code$|sku|date|time|country|region|state|city|"
+    r"customer|product|category|channel|store|warehouse|status|type$)",
+    re.IGNORECASE
+)
+
+# Upper bound on automatically created indexes per table
+MAX_INDEXES_PER_TABLE = 5
+
+
+def index_name(table_name: str, column: str) -> str:
+    """Name of the automatic index on ``table_name.column``"""
+    return "idx_" + re.sub(r"[^a-zA-Z0-9_]", "_", f"{table_name}__{column}").lower()
+
+
+def candidate_columns(info: TableInfo, catalog: Dict[str, TableInfo]) -> List[str]:
+    """Columns worth indexing, most promising first
+
+    Args:
+        info: Catalog entry of the table
+        catalog: All loaded tables (to find shared join columns)
+
+    Returns:
+        Candidate column names
+    """
+    shared = set()
+    for other in catalog.values():
+        if other.name != info.name:
+            shared.update(other.columns)
+
+    candidates = []
+    for column, dtype in zip(info.columns, info.dtypes):
+        by_name = bool(KEY_NAME_PATTERN.search(column))
+        # Shared measures (e.g. "revenue" in every yearly sheet) are not join keys
+        by_join = column in shared and not dtype.lower().startswith("float")
+        if not (by_name or by_join):
+            continue
+        # Mostly-empty columns make poor indexes
+        if info.null_counts.get(column, 0) > info.row_count // 2:
+            continue
+        # Named keys that also join other tables first, then named keys, then other join columns
+        priority = 0 if by_name and by_join else 1 if by_name else 2
+        candidates.append((priority, column))
+
+    return [column for _, column in sorted(candidates, key=lambda c: c[0])]
+
+
+def create_indexes(
+    conn: sqlite3.Connection,
+    info: TableInfo,
+    catalog: Dict[str, TableInfo],
+    min_rows: int = 0
+) -> List[str]:
+    """Create automatic indexes on a table
+
+    Columns with a single distinct value are skipped since they cannot
+    narrow down a search.
+
+    Args:
+        conn: Database connection
+        info: Catalog entry of the table
+        catalog: All loaded tables
+        min_rows: Tables with fewer rows are not indexed
+
+    Returns:
+        Indexed column names
+    """
+    if info.row_count < min_rows:
+        return []
+
+    indexed = []
+    for column in candidate_columns(info, catalog):
+        if len(indexed) >= MAX_INDEXES_PER_TABLE:
+            break
+
+        distinct = conn.execute(
+            f"SELECT COUNT(DISTINCT {quote_identifier(column)}) FROM {quote_identifier(info.name)}"
+        ).fetchone()[0]
+        if distinct <= 1:
+            continue
+
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote_identifier(index_name(info.name, column))} "
+            f"ON {quote_identifier(info.name)} ({quote_identifier(column)})"
+        )
+        indexed.append(column)
+
+    return indexed
+
+
+def index_tables(
+    conn: sqlite3.Connection,
+    table_names: List[str],
+    catalog: Dict[str, TableInfo],
+    min_rows: int = 0
+) -> List[str]:
+    """Index newly loaded tables and refresh planner statistics
+
+    Tables that share columns with the new ones are revisited too, since a
+    new table can turn an existing column into a join key. The resulting
+    indexes are recorded in each table's catalog entry. ``ANALYZE`` runs
+    only on tables with new data or a new index; the statistics of the
+    others are still current.
+
+    Args:
+        conn: Database connection
+        table_names: Tables that were just loaded
+        catalog: All loaded tables
+        min_rows: Tables with fewer rows are not indexed
+
+    Returns:
+        Tables whose indexes changed (their catalog entries need a new version)
+    """
+    new_columns = set()
+    for table_name in table_names:
+        new_columns.update(catalog[table_name].columns)
+
+    affected = [
+        name for name, info in catalog.items()
+        if name in table_names or new_columns.intersection(info.columns)
+    ]
+
+    changed = []
+    for table_name in affected:
+        info = catalog[table_name]
+        added = [column for column in create_indexes(conn, info, catalog, min_rows) if column not in info.indexes]
+        if added:
+            info.indexes = info.indexes + added
+            changed.append(table_name)
+            logger.info(f"  [dim]⚡ Indexed {table_name}: {', '.join(added)}[/dim]", extra={"markup": True})
+        if added or table_name in table_names:
+            conn.execute(f"ANALYZE {quote_identifier(table_name)}")
+
+    conn.commit()
+    return changed
@@ -0,0 +1,134 @@
+"""
+Parallel workbook parsing for ExcelProcessor.
+
+Sheets are parsed in a pool of worker processes (openpyxl parsing is
+CPU-bound and holds the GIL), while the caller stays the single writer
+that serializes all inserts into the database.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from app.core.logger import logger
+from app.core.type_inference import optimize_dtypes
+
+
+class SheetJob(NamedTuple):
+    """A single sheet to parse"""
+    file_path: Path
+    sheet_name: str
+    table_name: str
+
+
+class IngestionError(Exception):
+    """Raised when a file cannot be parsed or loaded"""
+
+    def __init__(self, file_path: Path, error: Exception):
+        super().__init__(str(error))
+        self.file_path = file_path
+        self.error = error
+
+
+def parse_sheet(file_path: str, sheet_name: str, infer_types: bool = False) -> pd.DataFrame:
+    """Parse one sheet into a DataFrame (runs inside a worker process)
+
+    Type inference runs here too, so it is parallelized along with parsing.
+    The DataFrame is sent back pickled, i.e. as one contiguous block per
+    dtype rather than one object per cell.
+    """
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    if infer_types:
+        df = optimize_dtypes(df)
+    return df
+
+
+class IngestionScheduler:
+    """Schedules sheet parsing across a process pool"""
+
+    def __init__(self, max_workers: int = 0):
+        """Initialize the scheduler
+
+        Args:
+            max_workers: Number of worker processes (0 = one per CPU core,
+                1 = parse in the calling process)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the worker pool on first use and reuse it afterwards"""
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a threaded server process is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"[dim]⚙ Started ingestion pool with {self.max_workers} workers[/dim]", extra={"markup": True})
+            return self._executor
+
+    def parse(self, jobs: List[SheetJob], infer_types: bool = False) -> Iterator[Tuple[SheetJob, pd.DataFrame]]:
+        """Parse sheets, yielding each one as soon as it is ready
+
+        Results arrive in completion order, not submission order.
+
+        Args:
+            jobs: Sheets to parse
+            infer_types: Optimize column dtypes after parsing
+
+        Yields:
+            Tuples of (job, parsed DataFrame)
+
+        Raises:
+            IngestionError: If a sheet fails to parse
+        """
+        if self.max_workers == 1 or len(jobs) <= 1:
+            for job in jobs:
+                try:
+                    df = parse_sheet(str(job.file_path), job.sheet_name, infer_types)
+                except Exception as e:
+                    raise IngestionError(job.file_path, e) from e
+                yield job, df
+            return
+
+        executor = self._get_executor()
+        futures = {
+            executor.submit(parse_sheet, str(job.file_path), job.sheet_name, infer_types): job
+            for job in jobs
+        }
+
+        try:
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    df = future.result()
+                except BrokenProcessPool as e:
+                    self._reset_executor()
+                    raise IngestionError(job.file_path, e) from e
+                except Exception as e:
+                    raise IngestionError(job.file_path, e) from e
+                yield job, df
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _reset_executor(self):
+        """Drop a broken pool so the next call starts a fresh one"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
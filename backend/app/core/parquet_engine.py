@@ -0,0 +1,375 @@
+"""
+Parquet table store, queried through DuckDB.
+
+Every loaded sheet is written once as zstd-compressed Parquet
+(``<store>/<table>/v<version>/part-*.parquet``) and registered as a DuckDB
+view over the files of its latest version. Views are only bound when a
+query references them, and DuckDB then reads just the referenced columns
+(and row groups), so wide sheets cost little disk and memory when the
+agent touches a few of their columns.
+
+Queries never see a partially written table. A replacement is written to
+a hidden staging directory, renamed to the next version and the view
+re-pointed at it; the previous version is deleted once no query that may
+have bound to it is still running. Appended parts are written under a
+name the view does not match and renamed into place once complete.
+"""
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.duckdb_engine import (
+    SQLITE_TO_DUCKDB, DuckDBEngine, chunk_frame, chunk_types, column_definitions, duckdb_frame
+)
+from app.core.excel_reader import infer_sqlite_type
+from app.core.logger import logger
+from app.core.sql_utils import count_nulls, key_match, quote_identifier, quote_string
+
+
+class ParquetEngine(DuckDBEngine):
+    """Engine that keeps tables as Parquet files and queries them with DuckDB"""
+
+    name = "parquet"
+
+    def __init__(
+        self,
+        db_path: str = ":memory:",
+        threads: int = 0,
+        memory_limit_mb: int = 0,
+        compression_level: int = 3
+    ):
+        """Open (or create) the store
+
+        Args:
+            db_path: Store directory (":memory:" = temporary directory removed on close)
+            threads: Threads per query (0 = DuckDB default, one per core)
+            memory_limit_mb: Memory limit (0 = DuckDB default, 80% of RAM)
+            compression_level: zstd level (1 = fastest, 22 = smallest)
+        """
+        file_backed = db_path not in ("", ":memory:")
+        if file_backed:
+            store_dir = Path(db_path).resolve()
+            store_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            store_dir = Path(tempfile.mkdtemp(prefix="askmydoc-parquet-")).resolve()
+
+        # DuckDB itself only holds views, so it always runs in memory; its
+        # queries can reach no files but the store's
+        super().__init__(
+            ":memory:",
+            threads=threads,
+            memory_limit_mb=memory_limit_mb,
+            allowed_directories=[store_dir]
+        )
+        self.db_path = db_path
+        self.file_backed = file_backed
+        self.compression_level = compression_level
+        self.store_dir = store_dir
+        self._active_queries = 0
+        self._retired: List[Path] = []  # Replaced versions, deleted once no query is running
+        self._retire_lock = threading.Lock()
+
+        # Staging directories of the layout before versions
+        for path in self.store_dir.glob(".*"):
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+        for table_name in self.table_names():
+            if self._recover(table_name):
+                self._register(table_name)
+
+    def _table_dir(self, table_name: str) -> Path:
+        """Directory holding a table's versions (and statistics)"""
+        return self.store_dir / table_name
+
+    def _data_dir(self, table_name: str) -> Optional[Path]:
+        """Directory of a table's latest version (None if it has none)"""
+        versions = sorted(
+            path for path in self._table_dir(table_name).glob("v*")
+            if path.is_dir() and path.name[1:].isdigit()
+        )
+        return versions[-1] if versions else None
+
+    def _files(self, table_name: str) -> str:
+        """Quoted glob pattern of a table's current Parquet files"""
+        return quote_string(str(self._data_dir(table_name) / "*.parquet"))
+
+    def _recover(self, table_name: str) -> bool:
+        """Remove what an interrupted load left of a table
+
+        Staging directories, older versions and partial parts are deleted;
+        parts in the table directory itself (the layout before versions)
+        become its first version.
+
+        Returns:
+            Whether the table has data
+        """
+        table_dir = self._table_dir(table_name)
+        flat_parts = list(table_dir.glob("*.parquet"))
+        if flat_parts and self._data_dir(table_name) is None:
+            first = table_dir / "v000001"
+            first.mkdir()
+            for part in flat_parts:
+                part.rename(first / part.name)
+
+        current = self._data_dir(table_name)
+        if current is None:
+            shutil.rmtree(table_dir, ignore_errors=True)
+            return False
+        for path in table_dir.iterdir():
+            if path.is_dir() and path != current:
+                shutil.rmtree(path, ignore_errors=True)
+        for partial in current.glob("*.tmp"):
+            partial.unlink(missing_ok=True)
+        return True
+
+    @contextmanager
+    def _reading(self) -> Iterator[None]:
+        """Keep replaced versions on disk while the query runs"""
+        with self._retire_lock:
+            self._active_queries += 1
+        try:
+            yield
+        finally:
+            retired = []
+            with self._retire_lock:
+                self._active_queries -= 1
+                if not self._active_queries:
+                    retired, self._retired = self._retired, []
+            for path in retired:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _retire(self, path: Path):
+        """Delete a replaced version once no running query can be reading it"""
+        with self._retire_lock:
+            if self._active_queries:
+                self._retired.append(path)
+                return
+        shutil.rmtree(path, ignore_errors=True)
+
+    def stats_path(self, table_name: str) -> Optional[Path]:
+        """Statistics live in the table's directory (and go with it)"""
+        return self._table_dir(table_name) / "stats.json" if self.file_backed else None
+
+    def _register(self, table_name: str):
+        """(Re)create the view over the files of a table's latest version"""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE OR REPLACE VIEW {quote_identifier(table_name)} AS "
+                f"SELECT * FROM read_parquet({self._files(table_name)})"
+            )
+
+    @contextmanager
+    def _staging(self, table_name: str) -> Iterator[Path]:
+        """Write into a staging directory, then make it the table's next version"""
+        table_dir = self._table_dir(table_name)
+        table_dir.mkdir(exist_ok=True)
+        current = self._data_dir(table_name)
+        version = f"v{int(current.name[1:]) + 1 if current else 1:06d}"
+        staging = table_dir / f".{version}.{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            yield staging
+        except Exception:
+            shutil.rmtree(staging if current else table_dir, ignore_errors=True)
+            raise
+
+        staging.rename(table_dir / version)
+        self._register(table_name)
+        if current is not None:
+            self._retire(current)
+
+    def _copy_to(self, cursor, select: str, path: Path):
+        """Write a query result as one zstd-compressed Parquet file"""
+        cursor.execute(
+            f"COPY ({select}) TO {quote_string(str(path))} "
+            f"(FORMAT PARQUET, COMPRESSION ZSTD, COMPRESSION_LEVEL {int(self.compression_level)})"
+        )
+
+    @contextmanager
+    def loading(self) -> Iterator[None]:
+        """Hold the writer (files are complete once written)"""
+        with self._write_lock:
+            yield
+
+    def write_dataframe(self, table_name: str, df: pd.DataFrame, typed: bool = True):
+        """Replace a table with one Parquet file holding the DataFrame"""
+        with self._staging(table_name) as staging, self.conn.cursor() as cursor:
+            cursor.register("sheet_frame", duckdb_frame(df))
+            try:
+                self._copy_to(cursor, "SELECT * FROM sheet_frame", staging / "part-00000.parquet")
+            finally:
+                cursor.unregister("sheet_frame")
+
+    def write_chunks(
+        self,
+        table_name: str,
+        columns: List[str],
+        chunks: Iterable[List[Tuple[Any, ...]]]
+    ) -> List[str]:
+        """Replace a table with one Parquet file per chunk
+
+        Column types are inferred from the first chunk and widened (to DOUBLE
+        or VARCHAR) when a later chunk does not fit them. Parts written before
+        a column was widened are rewritten at the end, so all parts share one
+        schema.
+        """
+        column_types: Optional[List[str]] = None
+        part_types: List[List[str]] = []
+
+        with self._staging(table_name) as staging, self.conn.cursor() as cursor:
+            for chunk in chunks:
+                if column_types is None:
+                    column_types = [infer_sqlite_type([row[idx] for row in chunk]) for idx in range(len(columns))]
+                else:
+                    column_types = chunk_types(column_types, chunk)
+
+                cursor.register("chunk_frame", chunk_frame(chunk, column_types))
+                try:
+                    self._copy_to(
+                        cursor, self._cast_select(columns, column_types, "chunk_frame", positional=True),
+                        staging / f"part-{len(part_types):05d}.parquet"
+                    )
+                finally:
+                    cursor.unregister("chunk_frame")
+                part_types.append(column_types)
+
+            for part, types in enumerate(part_types):
+                if types != column_types:
+                    path = staging / f"part-{part:05d}.parquet"
+                    widened = staging / f"widened-{part:05d}.parquet"
+                    self._copy_to(
+                        cursor, self._cast_select(columns, column_types, f"read_parquet({quote_string(str(path))})"),
+                        widened
+                    )
+                    widened.replace(path)
+
+            if column_types is None:
+                # No rows: an empty file still records the columns
+                column_types = ["TEXT"] * len(columns)
+                cursor.execute(f"CREATE TEMP TABLE empty_sheet ({', '.join(column_definitions(columns, column_types))})")
+                try:
+                    self._copy_to(cursor, "SELECT * FROM empty_sheet", staging / "part-00000.parquet")
+                finally:
+                    cursor.execute("DROP TABLE empty_sheet")
+
+        return column_types
+
+    @staticmethod
+    def _cast_select(columns: List[str], column_types: List[str], source: str, positional: bool = False) -> str:
+        """SELECT casting ``source``'s columns (``c0``, ``c1``... if positional) to the given types"""
+        return "SELECT " + ", ".join(
+            f"CAST({f'c{idx}' if positional else quote_identifier(column)} AS {SQLITE_TO_DUCKDB[column_type]}) "
+            f"AS {quote_identifier(column)}"
+            for idx, (column, column_type) in enumerate(zip(columns, column_types))
+        ) + f" FROM {source}"
+
+    def append_table(
+        self,
+        source: str,
+        target: str,
+        columns: Sequence[str],
+        key_columns: Sequence[str] = (),
+        widen: Sequence[str] = ()
+    ) -> Tuple[Tuple[int, Dict[str, int]], Tuple[int, Dict[str, int]]]:
+        """Add the new rows to ``target`` as another Parquet file
+
+        A plain append writes only the new rows, cast to the table's column
+        types. Parquet files are immutable, so upserts and widened columns
+        rewrite the table instead (cost grows with the table).
+        """
+        target_types = self.table_columns(target)
+        select_list = ", ".join(
+            f"CAST({quote_identifier(column) if column in columns else 'NULL'} "
+            f"AS {'DOUBLE' if column in widen else column_type}) AS {quote_identifier(column)}"
+            for column, column_type in target_types
+        )
+        source_files = self._files(source)
+        source_rows = f"read_parquet({source_files}, filename = true, file_row_number = true)"
+        new_rows = f"SELECT {select_list} FROM {source_rows}"
+        replaced = superseded = (0, {})
+
+        try:
+            with self.conn.cursor() as cursor:
+                if not key_columns and not widen:
+                    data_dir = self._data_dir(target)
+                    parts = sorted(data_dir.glob("part-*.parquet"))
+                    number = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+                    part = data_dir / f"part-{number:05d}.parquet"
+                    # Written outside the view's *.parquet pattern, then renamed in
+                    partial = part.with_name(part.name + ".tmp")
+                    try:
+                        self._copy_to(cursor, new_rows, partial)
+                        partial.rename(part)
+                    finally:
+                        partial.unlink(missing_ok=True)
+                    return replaced, superseded
+
+                kept_rows = f"SELECT {select_list} FROM {quote_identifier(target)}"
+                if key_columns:
+                    keys = ", ".join(quote_identifier(column) for column in key_columns)
+                    matches = (
+                        f"EXISTS (SELECT 1 FROM read_parquet({source_files}) AS new_rows "
+                        f"WHERE {key_match(key_columns, 'new_rows', quote_identifier(target))})"
+                    )
+                    target_columns = [column for column, _ in target_types]
+                    replaced = count_nulls(cursor, target_columns, f"(SELECT * FROM {quote_identifier(target)} WHERE {matches})")
+                    kept_rows += f" WHERE NOT {matches}"
+
+                    # Of new rows sharing a key, the last one wins
+                    latest = f"row_number() OVER (PARTITION BY {keys} ORDER BY filename DESC, file_row_number DESC)"
+                    superseded = count_nulls(cursor, columns, f"(SELECT * FROM {source_rows} QUALIFY {latest} > 1)")
+                    new_rows += f" QUALIFY {latest} = 1"
+
+                with self._staging(target) as staging:
+                    self._copy_to(cursor, f"{kept_rows} UNION ALL {new_rows}", staging / "part-00000.parquet")
+        finally:
+            self.discard_table(source)
+
+        return replaced, superseded
+
+    def discard_table(self, table_name: str):
+        """Drop a view and its files with the writer already held"""
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"DROP VIEW IF EXISTS {quote_identifier(table_name)}")
+        shutil.rmtree(self._table_dir(table_name), ignore_errors=True)
+
+    def table_names(self) -> List[str]:
+        """Tables present in the store"""
+        return sorted(
+            path.name for path in self.store_dir.iterdir()
+            if path.is_dir() and not path.name.startswith(".")
+        )
+
+    def drop_tables(self, table_names: Sequence[str]):
+        """Drop views and delete their files"""
+        with self._write_lock:
+            for table_name in table_names:
+                self.discard_table(table_name)
+
+    def database_size(self) -> int:
+        """Bytes of Parquet files in the store"""
+        return sum(path.stat().st_size for path in self.store_dir.rglob("*.parquet"))
+
+    def close(self):
+        """Close DuckDB and remove a temporary store"""
+        super().close()
+        for path in self._retired:
+            shutil.rmtree(path, ignore_errors=True)
+        if not self.file_backed:
+            shutil.rmtree(self.store_dir, ignore_errors=True)
+            logger.info("[dim]🗑️  Removed temporary Parquet store[/dim]", extra={"markup": True})
+
+    def save_column_stats(self, table_name: str, stats: Optional[Dict[str, Any]]):
+        """Persist statistics unless the table is gone"""
+        if self._table_dir(table_name).exists():
+            super().save_column_stats(table_name, stats)
+
+    def delete_files(self):
+        """Delete the store directory"""
+        shutil.rmtree(self.store_dir, ignore_errors=True)
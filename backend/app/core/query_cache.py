@@ -0,0 +1,270 @@
+"""
+In-memory cache of SQL query results.
+
+The agent re-runs identical queries within an answer and across repeated
+questions, and API clients poll the same ``/query/sql`` statements.
+Results are cached under a fingerprint of the normalized SQL (comments,
+whitespace and keyword case removed; literals, identifiers and the outer
+select list kept as written, since they name the result columns) together with the
+version of every table the query references. Reloading a table changes
+its version, so only the queries that read it miss afterwards, and their
+stale entries are dropped right away to free memory. Memory is bounded
+by a byte budget with least-recently-used eviction.
+
+One cache can serve several processors (sessions); each uses its own
+namespace.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from app.core.sql_utils import QueryParams
+
+# String literals, quoted identifiers, comments, words
+_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*'"  # string literal
+    r'|"(?:[^"]|"")*"'  # quoted identifier
+    r"|`[^`]*`|\[[^\]]*\]"  # MySQL/SQL Server style identifiers (SQLite accepts both)
+    r"|--[^\n]*|/\*.*?\*/"  # comments
+    r"|\s+"
+    r"|[^\s'\"`\[]+",
+    re.DOTALL
+)
+_WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+
+# SQL keywords (SQLite's, plus DuckDB's common additions); only these are case-folded
+_KEYWORDS = frozenset("""
+    abort action add after all alter always analyze and anti as asc asof attach autoincrement before begin
+    between by cascade case cast check collate column commit conflict constraint create cross current
+    current_date current_time current_timestamp database default deferrable deferred delete desc detach
+    distinct do drop each else end escape except exclude exclusive exists explain fail filter first
+    following for foreign from full generated glob group groups having if ignore ilike immediate in index
+    indexed initially inner insert instead intersect into is isnull join key last lateral left like limit
+    match materialized natural no not nothing notnull null nulls of offset on or order others outer over
+    partition pivot plan positional pragma preceding primary qualify query raise range recursive
+    references regexp reindex release rename replace restrict returning right rollback row rows savepoint
+    select semi set similar table temp temporary then ties to transaction trigger unbounded union unique
+    unpivot update using vacuum values view virtual when where window with without
+""".split())
+
+# Keywords closing a select list
+_SELECT_LIST_END = frozenset({
+    "from", "where", "group", "having", "window", "qualify", "order", "limit", "offset", "union", "except", "intersect"
+})
+_NUMBER_PATTERN = re.compile(r"(?<![\w$.])\d+(?:\.\d+)?(?:e[+-]?\d+)?(?![\w$])")
+
+# Results of queries using these change without any table changing
+# (or depend on the catalog rather than the tables' rows)
+_VOLATILE_PATTERN = re.compile(
+    r"\b(random|randomblob|uuid|gen_random_uuid|now|current_timestamp|current_date|current_time|"
+    r"localtime|localtimestamp|today|get_current_time|setseed|read_csv|read_csv_auto|read_parquet|"
+    r"read_json|read_json_auto|glob|pragma|sqlite_master|sqlite_schema|information_schema|duckdb_\w+)\b"
+    r"|'now'|\busing\s+sample\b|\btablesample\b",
+    re.IGNORECASE
+)
+
+# Larger results are not cached (a share of the budget)
+MAX_ENTRY_SHARE = 0.25
+
+
+def _lower_keyword(match: "re.Match[str]") -> str:
+    word = match.group()
+    return word.lower() if word.lower() in _KEYWORDS else word
+
+
+def _nesting(token: str) -> int:
+    """Change in parenthesis depth over a token (none inside literals and comments)"""
+    if token.startswith(("'", '"', "`", "[", "--", "/*")):
+        return 0
+    return token.count("(") - token.count(")")
+
+
+def normalize_sql(sql: str) -> str:
+    """Canonical form of a query: no comments, single spaces, lowercase keywords
+
+    Identifiers keep their case, and top-level select lists are kept
+    exactly as written: they name the result columns (an alias's case, and
+    in SQLite the text of an expression without alias), so queries that
+    differ there must not share a cached result.
+    """
+    parts: List[str] = []
+    depth = 0
+    in_select_list = False
+    for token in _TOKEN_PATTERN.findall(sql.strip()):
+        if in_select_list and not (depth == 0 and token.lower() in _SELECT_LIST_END):
+            parts.append(token)
+            depth += _nesting(token)
+            continue
+        in_select_list = False
+
+        if token.startswith(("--", "/*")) or token.isspace():
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        elif token.startswith(("'", '"', "`", "[")):
+            parts.append(token)
+        else:
+            parts.append(_WORD_PATTERN.sub(_lower_keyword, token))
+            depth += _nesting(token)
+            in_select_list = depth == 0 and token.lower() == "select"
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def query_shape(normalized_sql: str) -> str:
+    """Normalized query with string and number literals replaced by ``?``"""
+    parts: List[str] = []
+    for token in _TOKEN_PATTERN.findall(normalized_sql):
+        if token.startswith("'"):
+            parts.append("?")
+        elif token.startswith(('"', "`", "[")):
+            parts.append(token)
+        else:
+            parts.append(_NUMBER_PATTERN.sub("?", token))
+    return "".join(parts)
+
+
+def sql_fingerprint(normalized_sql: str, params: Optional[QueryParams] = None) -> str:
+    """Digest of a normalized query and its bound parameter values"""
+    text = normalized_sql
+    if params:
+        text += "\0" + repr(sorted(params.items()) if isinstance(params, dict) else list(params))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def referenced_tables(normalized_sql: str, table_names: Iterable[str]) -> List[str]:
+    """Known tables a normalized query may read
+
+    Every bare word and quoted identifier counts, so a column that happens
+    to share a table's name only costs an extra invalidation.
+    """
+    identifiers: Set[str] = set()
+    for token in _TOKEN_PATTERN.findall(normalized_sql):
+        if token.startswith('"'):
+            identifiers.add(token[1:-1].replace('""', '"').lower())
+        elif token.startswith(("`", "[")):
+            identifiers.add(token[1:-1].lower())
+        elif not token.startswith("'"):
+            identifiers.update(word.lower() for word in _WORD_PATTERN.findall(token))
+    return sorted(name for name in table_names if name.lower() in identifiers)
+
+
+def is_cacheable(normalized_sql: str) -> bool:
+    """Whether a query's result depends only on the tables it reads"""
+    return not _VOLATILE_PATTERN.search(normalized_sql)
+
+
+class QueryCache:
+    """Byte-budgeted LRU cache of query results"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """Create a cache
+
+        Args:
+            max_bytes: Memory budget for cached results
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[tuple, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._by_table: Dict[Tuple[str, str], Set[tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+
+    @staticmethod
+    def make_key(
+        namespace: str,
+        normalized_sql: str,
+        table_versions: Dict[str, int],
+        params: Optional[QueryParams] = None
+    ) -> tuple:
+        """Cache key of a query (with its parameter values) against specific table versions"""
+        return (namespace, sql_fingerprint(normalized_sql, params), tuple(sorted(table_versions.items())))
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        """Cached result (a copy the caller may modify), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[0].copy()
+
+    def put(self, key: tuple, result: pd.DataFrame):
+        """Cache a result unless it is too large"""
+        size = int(result.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes * MAX_ENTRY_SHARE:
+            return
+        namespace, _, table_versions = key
+
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (result.copy(), size)
+            self.total_bytes += size
+            for table_name, _ in table_versions:
+                self._by_table.setdefault((namespace, table_name), set()).add(key)
+
+            while self.total_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def note_uncacheable(self):
+        """Count a query that bypassed the cache"""
+        with self._lock:
+            self.uncacheable += 1
+
+    def _remove(self, key: tuple):
+        """Drop an entry (lock held)"""
+        _, size = self._entries.pop(key)
+        self.total_bytes -= size
+        namespace, _, table_versions = key
+        for table_name, _ in table_versions:
+            keys = self._by_table.get((namespace, table_name))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[(namespace, table_name)]
+
+    def invalidate(self, namespace: str, table_names: Iterable[str]):
+        """Drop the results of every query that read any of these tables"""
+        with self._lock:
+            for table_name in table_names:
+                for key in list(self._by_table.get((namespace, table_name), ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear_namespace(self, namespace: str):
+        """Drop all results of one processor"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == namespace]:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters
+
+        Returns:
+            Dictionary with hits, misses, hit rate, evictions, invalidations and size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "uncacheable": self.uncacheable,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "size_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes
+            }
@@ -0,0 +1,383 @@
+"""
+Checks applied to queries before they run.
+
+A query the agent writes can cost far more than its answer is worth: a
+forgotten join condition multiplies two tables into billions of rows, and
+a bare ``SELECT *`` pulls a whole table into a DataFrame only for a few
+rows of it to be shown. Before a query runs:
+
+- statements that would modify the database are rejected (SQLite readers
+  also deny them through an authorizer, see ``connections``; DuckDB checks
+  statement types itself)
+- each ``FROM`` clause is parsed into its tables and the conditions that
+  link them; tables combined without a condition form separate groups,
+  and the rows of the cartesian product are estimated from the row counts
+  in the catalog. Above a threshold the query is rejected with a message
+  saying how to fix it
+- row-returning queries can be given a ``LIMIT`` when they have none at
+  top level (the agent's queries, whose results are shown in part anyway)
+
+The parser is a tokenizer plus heuristics, not a SQL grammar. Tables and
+conditions it cannot resolve are left out of the estimate, so an
+unusual query is let through rather than wrongly rejected.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from app.core.catalog import TableInfo
+
+# Identifiers, literals, comments, numbers and operators
+_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*'"  # string literal
+    r'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]'  # quoted identifiers
+    r"|--[^\n]*|/\*.*?\*/"  # comments
+    r"|[A-Za-z_][\w$]*"
+    r"|\d+(?:\.\d*)?(?:e[+-]?\d+)?"
+    r"|<=|>=|<>|!=|==|\|\||::"
+    r"|\S",
+    re.DOTALL | re.IGNORECASE
+)
+_WORD_PATTERN = re.compile(r"[A-Za-z_][\w$]*$")
+
+# First words of statements that modify the database or the connection
+_WRITE_STATEMENTS = {
+    "insert", "update", "delete", "replace", "upsert", "merge", "create", "drop", "alter", "truncate", "attach",
+    "detach", "vacuum", "reindex", "analyze", "begin", "commit", "end", "rollback", "savepoint", "release",
+    "copy", "export", "import", "install", "load", "set", "reset", "checkpoint", "use",
+}
+
+# First words of statements that return rows
+_ROW_STATEMENTS = {"select", "with", "values", "from"}
+
+# Keywords ending a FROM clause or a WHERE clause
+_FROM_END = {
+    "where", "group", "having", "order", "limit", "offset", "fetch", "union", "except", "intersect", "window",
+    "qualify", "returning", "select",
+}
+_WHERE_END = _FROM_END - {"where"}
+
+# Keywords between tables of a FROM clause
+_JOIN_WORDS = {"join", "inner", "left", "right", "full", "outer", "cross", "natural", "lateral", "semi", "anti", "asof"}
+
+# Words that can follow a table name but are not aliases
+_NOT_ALIASES = _FROM_END | _JOIN_WORDS | {"on", "using", "as", "and", "or", "tablesample"}
+
+# Words in conditions that are not column references
+_CONDITION_WORDS = {
+    "and", "or", "not", "in", "is", "null", "true", "false", "like", "glob", "between", "escape", "collate",
+    "case", "when", "then", "else", "end", "exists", "distinct", "from", "as", "any", "all", "some", "interval",
+}
+
+
+class QueryRejectedError(Exception):
+    """A query was refused before running; the message says how to fix it"""
+
+
+class _Token(NamedTuple):
+    text: str
+    word: str  # Lowercased text of keywords and identifiers, unquoted text of quoted identifiers
+    depth: int  # Parenthesis nesting (parentheses themselves are at the outer depth)
+    start: int
+    end: int
+
+
+@dataclass
+class _Source:
+    """A table (or subquery) in a FROM clause"""
+    table: Optional[str]  # Catalog name (None if not a loaded table)
+    names: Set[str]  # Lowercased names the query uses for it (table name, alias)
+    rows: Optional[int]
+
+
+def _tokens(sql: str) -> List[_Token]:
+    """Tokens of a query, without comments"""
+    tokens, depth = [], 0
+    for match in _TOKEN_PATTERN.finditer(sql):
+        text = match.group()
+        if text.startswith(("--", "/*")):
+            continue
+        if text == ")":
+            depth = max(depth - 1, 0)
+        if text[0] in "\"`[" and len(text) > 1:
+            word = text[1:-1].replace('""', '"') if text[0] == '"' else text[1:-1]
+        else:
+            word = text.lower()
+        tokens.append(_Token(text, word, depth, match.start(), match.end()))
+        if text == "(":
+            depth += 1
+    return tokens
+
+
+def _is_name(token: _Token) -> bool:
+    """Whether a token can be a table, alias or column name"""
+    return token.text[0] in "\"`[" or bool(_WORD_PATTERN.match(token.text))
+
+
+def _skip_group(tokens: List[_Token], idx: int) -> int:
+    """Index after the parenthesized group opening at ``idx``"""
+    depth = tokens[idx].depth
+    idx += 1
+    while idx < len(tokens) and not (tokens[idx].text == ")" and tokens[idx].depth == depth):
+        idx += 1
+    return idx + 1
+
+
+def _clause_end(tokens: List[_Token], idx: int, depth: int, end_words: Set[str]) -> int:
+    """Index of the first token ending a clause that starts at ``idx``"""
+    while idx < len(tokens):
+        token = tokens[idx]
+        if token.depth < depth or token.text == ";" or (token.depth == depth and token.word in end_words):
+            break
+        idx += 1
+    return idx
+
+
+def _predicates(tokens: List[_Token], start: int, end: int) -> Iterator[Tuple[int, int]]:
+    """Token ranges of the predicates joined by AND/OR at the outer level of a condition"""
+    depth = tokens[start].depth if start < end else 0
+    first = start
+    for idx in range(start, end):
+        if tokens[idx].depth == depth and tokens[idx].word in ("and", "or"):
+            yield first, idx
+            first = idx + 1
+    yield first, end
+
+
+def _column_refs(tokens: List[_Token], start: int, end: int) -> Iterator[Tuple[Optional[str], str]]:
+    """(qualifier, column) of the column references in a range of tokens
+
+    Keywords, function names and type names (``CAST(x AS TEXT)``, ``x::TEXT``)
+    are skipped, so a column wrapped in an expression still counts.
+    """
+    idx = start
+    while idx < end:
+        token = tokens[idx]
+        quoted = token.text[0] in "\"`["
+        if (
+            not _is_name(token)
+            or (not quoted and token.word in _CONDITION_WORDS)
+            or (idx > start and tokens[idx - 1].word in ("as", "::"))
+            or (idx + 1 < end and tokens[idx + 1].text == "(")
+        ):
+            idx += 1
+        elif idx + 2 < end and tokens[idx + 1].text == "." and _is_name(tokens[idx + 2]):
+            yield token.word, tokens[idx + 2].word
+            idx += 3
+        else:
+            yield None, token.word
+            idx += 1
+
+
+class _FromClause:
+    """Tables of one FROM clause, grouped by the conditions that link them"""
+
+    def __init__(self, catalog: Dict[str, TableInfo]):
+        self.catalog = catalog
+        self.tables = {name.lower(): name for name in catalog}
+        self.sources: List[_Source] = []
+        self._parent: List[int] = []
+
+    def add(self, name: Optional[str], alias: Optional[str]) -> int:
+        """Add a table (None for a subquery or table function) and return its index"""
+        table = self.tables.get(name.lower()) if name else None
+        names = {alias.lower()} if alias else set()
+        if name and not alias:
+            names.add(name.lower())
+        rows = self.catalog[table].row_count if table else None
+        self.sources.append(_Source(table, names, rows))
+        self._parent.append(len(self._parent))
+        return len(self.sources) - 1
+
+    def _find(self, idx: int) -> int:
+        while self._parent[idx] != idx:
+            self._parent[idx] = self._parent[self._parent[idx]]
+            idx = self._parent[idx]
+        return idx
+
+    def link(self, first: int, second: int):
+        """Record a condition between two tables"""
+        self._parent[self._find(first)] = self._find(second)
+
+    def resolve(self, column: Tuple[Optional[str], str]) -> List[int]:
+        """Tables a column reference may belong to"""
+        qualifier, name = column
+        if qualifier is not None:
+            return [idx for idx, source in enumerate(self.sources) if qualifier.lower() in source.names]
+        matches = []
+        for idx, source in enumerate(self.sources):
+            if source.table and name.lower() in (existing.lower() for existing in self.catalog[source.table].columns):
+                matches.append(idx)
+        return matches
+
+    def link_conditions(self, tokens: List[_Token], start: int, end: int) -> Tuple[bool, bool]:
+        """Link the tables whose columns appear together in a predicate of a condition
+
+        ``LOWER(a.x) = LOWER(b.y)``, ``a.x + 0 = b.y`` or ``b.y IN (a.x)``
+        link ``a`` and ``b`` just like ``a.x = b.y``.
+
+        Returns:
+            Whether any two tables were linked, and whether every column
+            reference was resolved to a table
+        """
+        linked, resolved = False, True
+        for first, last in _predicates(tokens, start, end):
+            sources: Set[int] = set()
+            for column in _column_refs(tokens, first, last):
+                matches = self.resolve(column)
+                resolved = resolved and bool(matches)
+                sources.update(matches)
+            ordered = sorted(sources)
+            for other in ordered[1:]:
+                self.link(ordered[0], other)
+                linked = True
+        return linked, resolved
+
+    def groups(self) -> List[Tuple[str, int]]:
+        """Largest table and its row count for each group of linked tables with known sizes"""
+        largest: Dict[int, Tuple[str, int]] = {}
+        for idx, source in enumerate(self.sources):
+            if source.table is None or source.rows is None:
+                continue
+            root = self._find(idx)
+            if root not in largest or source.rows > largest[root][1]:
+                largest[root] = (source.table, source.rows)
+        return sorted(largest.values(), key=lambda group: -group[1])
+
+
+def _parse_from(tokens: List[_Token], start: int, end: int, catalog: Dict[str, TableInfo]) -> _FromClause:
+    """Tables of the FROM clause in ``tokens[start:end]``, linked by their ON/USING conditions"""
+    clause = _FromClause(catalog)
+    depth = tokens[start].depth if start < end else 0
+    idx = start
+    joined = False  # The next table comes after JOIN (rather than first or after a comma)
+    natural = False
+    while idx < end:
+        token = tokens[idx]
+        if token.text == ",":
+            joined = natural = False
+            idx += 1
+        elif token.word in _JOIN_WORDS:
+            joined = True
+            natural = natural or token.word == "natural"
+            idx += 1
+        elif token.word in ("on", "using"):
+            condition_end = idx + 1
+            while condition_end < end and not (
+                tokens[condition_end].depth == depth and (tokens[condition_end].text == "," or tokens[condition_end].word in _JOIN_WORDS)
+            ):
+                condition_end += 1
+            current = len(clause.sources) - 1
+            if token.word == "using" and current > 0:
+                clause.link(current, current - 1)
+            elif current > 0:
+                linked, resolved = clause.link_conditions(tokens, idx + 1, condition_end)
+                if linked or not resolved:
+                    # A condition not involving the joined table still makes the join explicit,
+                    # and one referring to columns the parser cannot place is not estimated
+                    clause.link(current, current - 1)
+            idx = condition_end
+        else:
+            # A table, schema.table, table function or subquery, with an optional alias
+            name = None
+            if token.text == "(":
+                idx = _skip_group(tokens, idx)
+            elif _is_name(token):
+                name = token.word
+                idx += 1
+                while idx + 1 < end and tokens[idx].text == "." and _is_name(tokens[idx + 1]):
+                    name = tokens[idx + 1].word
+                    idx += 2
+                if idx < end and tokens[idx].text == "(":
+                    name = None
+                    idx = _skip_group(tokens, idx)
+            else:
+                idx += 1
+                continue
+            alias = None
+            if idx < end and tokens[idx].word == "as":
+                idx += 1
+            if idx < end and _is_name(tokens[idx]) and tokens[idx].word not in _NOT_ALIASES:
+                alias = tokens[idx].word
+                idx += 1
+                if idx < end and tokens[idx].text == "(":
+                    idx = _skip_group(tokens, idx)  # column aliases
+            current = clause.add(name, alias)
+            if joined and natural and current > 0:
+                clause.link(current, current - 1)
+            joined = natural = False
+    return clause
+
+
+def _from_clauses(tokens: List[_Token], catalog: Dict[str, TableInfo]) -> Iterator[_FromClause]:
+    """Every FROM clause of a query (including subqueries), with its WHERE conditions applied"""
+    for idx, token in enumerate(tokens):
+        if token.word != "from" or (idx and tokens[idx - 1].word in ("distinct", "is")):
+            continue
+        depth = token.depth
+        end = _clause_end(tokens, idx + 1, depth, _FROM_END)
+        clause = _parse_from(tokens, idx + 1, end, catalog)
+        if end < len(tokens) and tokens[end].word == "where" and tokens[end].depth == depth:
+            clause.link_conditions(tokens, end + 1, _clause_end(tokens, end + 1, depth, _WHERE_END))
+        yield clause
+
+
+def check_query(sql: str, catalog: Dict[str, TableInfo], max_join_rows: int = 0):
+    """Reject a query that would modify the database or combine tables into too many rows
+
+    Args:
+        sql: The query
+        catalog: Loaded tables (row counts and columns)
+        max_join_rows: Largest estimated cartesian product allowed (0 = no check)
+
+    Raises:
+        QueryRejectedError: If the query is rejected (the message says how to fix it)
+    """
+    tokens = _tokens(sql)
+    if not tokens:
+        return
+    statements = [tokens[0]] + [tokens[idx + 1] for idx, token in enumerate(tokens[:-1]) if token.text == ";"]
+    for first in statements:
+        if first.word in _WRITE_STATEMENTS:
+            raise QueryRejectedError(f"Only read-only queries are allowed (got {first.word.upper()})")
+
+    if not max_join_rows:
+        return
+    for clause in _from_clauses(tokens, catalog):
+        groups = clause.groups()
+        if len(groups) < 2:
+            continue
+        estimate = 1
+        for _, rows in groups:
+            estimate *= max(rows, 1)
+        if estimate > max_join_rows:
+            (first, first_rows), (second, second_rows) = groups[:2]
+            raise QueryRejectedError(
+                f"Query rejected: {first} ({first_rows:,} rows) and {second} ({second_rows:,} rows) are combined "
+                f"without a join condition, which would produce about {estimate:,} rows (limit {max_join_rows:,}). "
+                f"Join them on matching key columns (JOIN {second} ON {first}.<key> = {second}.<key>, or a WHERE "
+                "condition comparing their columns), or aggregate each table separately and combine the results."
+            )
+
+
+def limit_rows(sql: str, limit: int) -> Optional[str]:
+    """The query with a ``LIMIT`` added, if it returns rows and has no limit at top level
+
+    Args:
+        sql: The query
+        limit: Maximum rows
+
+    Returns:
+        The rewritten query, or None if it is left as is
+    """
+    tokens = _tokens(sql)
+    while tokens and tokens[-1].text == ";":
+        tokens.pop()
+    if not tokens or tokens[0].word not in _ROW_STATEMENTS:
+        return None
+    if any(token.text == ";" for token in tokens):
+        return None  # several statements
+    if any(token.depth == 0 and token.word in ("limit", "fetch") for token in tokens):
+        return None
+    # A new line keeps the LIMIT out of a trailing line comment
+    return f"{sql[:tokens[-1].end]}\nLIMIT {int(limit)}"
@@ -0,0 +1,137 @@
+"""
+Server-side cursors over query results.
+
+A paginated ``/query/sql`` request runs its query once and keeps a
+snapshot of the result; each response carries a cursor token for the next
+page. Later pages are slices of the snapshot, so they cost O(page size),
+never re-run the query, and stay consistent even if tables are reloaded
+in between. (Keyset pagination would need a unique sort key, which
+arbitrary SQL does not guarantee.)
+
+Snapshots expire after a period without use and are bounded by a byte
+budget, least recently used evicted first.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import pandas as pd
+
+
+class CursorExpiredError(Exception):
+    """The cursor is unknown, expired or evicted"""
+
+
+@dataclass
+class _Snapshot:
+    """A result kept for paging"""
+    result: pd.DataFrame
+    size: int
+    owner: str  # Session the query ran in
+    query: str
+    last_used: float
+
+
+def _parse_token(token: str) -> Tuple[str, int]:
+    """Snapshot ID and row offset of a cursor token"""
+    snapshot_id, _, offset = token.rpartition(".")
+    if not snapshot_id or not offset.isdigit():
+        raise CursorExpiredError("Invalid cursor")
+    return snapshot_id, int(offset)
+
+
+class ResultCursors:
+    """Snapshots of query results, paged through with cursor tokens"""
+
+    def __init__(self, ttl_s: float = 300, max_bytes: int = 256 * 1024 * 1024):
+        """Create a store
+
+        Args:
+            ttl_s: Seconds a snapshot is kept after its last use
+            max_bytes: Memory budget for snapshots
+        """
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._snapshots: "OrderedDict[str, _Snapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float):
+        """Drop expired snapshots (lock held)"""
+        while self._snapshots:
+            snapshot_id, snapshot = next(iter(self._snapshots.items()))
+            if now - snapshot.last_used <= self.ttl_s:
+                break
+            self._drop(snapshot_id)
+
+    def _drop(self, snapshot_id: str):
+        """Forget a snapshot (lock held)"""
+        self.total_bytes -= self._snapshots.pop(snapshot_id).size
+
+    def open(self, result: pd.DataFrame, owner: str, query: str) -> str:
+        """Keep a result for paging
+
+        Args:
+            result: Complete query result
+            owner: Session the query ran in (only it can page through the result)
+            query: The query (with its parameter values), which continuation requests must repeat
+
+        Returns:
+            Cursor token of the first row
+
+        Raises:
+            ValueError: If the result does not fit the memory budget
+        """
+        size = int(result.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            raise ValueError(
+                f"Result too large to page through ({size / 1024 / 1024:.0f} MB, {len(result)} rows); "
+                "stream it instead or narrow the query"
+            )
+
+        now = time.monotonic()
+        snapshot_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._purge(now)
+            self._snapshots[snapshot_id] = _Snapshot(result, size, owner, query, now)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self._drop(next(iter(self._snapshots)))
+        return f"{snapshot_id}.0"
+
+    def page(self, token: str, page_size: int, owner: str, query: str) -> Tuple[pd.DataFrame, int, Optional[str]]:
+        """Rows at a cursor
+
+        Args:
+            token: Cursor token from ``open`` or a previous page
+            page_size: Maximum rows to return
+            owner: Session making the request
+            query: The query of the request (must match the snapshot's)
+
+        Returns:
+            The page's rows, total rows of the result, and the cursor of the
+            next page (None after the last page)
+
+        Raises:
+            CursorExpiredError: If the cursor is unknown, expired or belongs to another session
+            ValueError: If the query differs from the one the cursor was opened for
+        """
+        snapshot_id, offset = _parse_token(token)
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            snapshot = self._snapshots.get(snapshot_id)
+            if snapshot is None or snapshot.owner != owner:
+                raise CursorExpiredError("Cursor expired or unknown; run the query again")
+            if snapshot.query != query:
+                raise ValueError("The cursor belongs to a different query")
+            snapshot.last_used = now
+            self._snapshots.move_to_end(snapshot_id)
+
+        total = len(snapshot.result)
+        end = min(offset + page_size, total)
+        next_token = f"{snapshot_id}.{end}" if end < total else None
+        return snapshot.result.iloc[offset:end], total, next_token
@@ -0,0 +1,181 @@
+"""
+Streamed encodings of query results.
+
+Large results are not collected into one DataFrame and one JSON document.
+The engine fetches them in batches, and each batch is encoded and sent as
+soon as it arrives, so memory use does not grow with the result and the
+first rows reach the client right away. Encoding is vectorized per batch:
+
+- ``ndjson``: one JSON object per row
+- ``csv``: header row, then the rows
+- ``arrow``: an Arrow IPC stream (schema, then one record batch per batch)
+
+Encoded chunks are spooled: a background thread fetches and encodes at the
+speed of the query into a temporary file, which the response reads back as
+it grows. The query's connection is released when the last batch is
+fetched, however slowly the client reads.
+"""
+import io
+import tempfile
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from app.core.fast_json import dataframe_ndjson
+
+# Media type of each streaming format
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def _ndjson(batches: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Rows as newline-delimited JSON objects"""
+    for batch in batches:
+        if len(batch):
+            yield dataframe_ndjson(batch).encode("utf-8")
+
+
+def _csv(batches: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Rows as CSV, with a header row"""
+    header = True
+    for batch in batches:
+        if header or len(batch):
+            yield batch.to_csv(index=False, header=header).encode("utf-8")
+            header = False
+
+
+def _arrow_schema(batch: pd.DataFrame) -> Tuple[pa.Schema, List[int]]:
+    """Stream schema from the first batch, and the all-NULL columns that became text"""
+    schema = pa.Schema.from_pandas(batch, preserve_index=False).remove_metadata()
+    text_columns = []
+    for idx, arrow_field in enumerate(schema):
+        if pa.types.is_null(arrow_field.type):
+            schema = schema.set(idx, arrow_field.with_type(pa.string()))
+            text_columns.append(idx)
+    return schema, text_columns
+
+
+def _arrow(batches: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Rows as an Arrow IPC stream
+
+    The schema comes from the first batch; later batches are converted to
+    it (e.g. integers that came out as floats because of NULLs, or values
+    in a column that was all NULL at first, which are sent as text).
+    """
+    sink = io.BytesIO()
+    writer = None
+    for batch in batches:
+        if writer is None:
+            schema, text_columns = _arrow_schema(batch)
+            writer = pa.ipc.new_stream(sink, schema)
+        if len(batch):
+            for idx in text_columns:
+                values = batch.iloc[:, idx]
+                batch.isetitem(idx, values.astype(str).where(values.notna(), None))
+            writer.write_batch(pa.RecordBatch.from_pandas(batch, schema=schema, preserve_index=False))
+        if sink.tell():
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    if writer is not None:
+        writer.close()
+        yield sink.getvalue()
+
+
+def encode_batches(batches: Iterable[pd.DataFrame], stream_format: str) -> Iterator[bytes]:
+    """Encode result batches for a streaming response
+
+    Args:
+        batches: Result batches (the first one may be empty but has the columns)
+        stream_format: One of ``STREAM_FORMATS``
+
+    Returns:
+        Chunks of the encoded result
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    encoders = {"ndjson": _ndjson, "csv": _csv, "arrow": _arrow}
+    if stream_format not in encoders:
+        raise ValueError(f"Unknown stream format: {stream_format} (use one of {', '.join(STREAM_FORMATS)})")
+    return encoders[stream_format](batches)
+
+
+class SpooledStream:
+    """Chunks produced by a background thread into a temporary file, read back as they arrive"""
+
+    def __init__(self, chunks: Iterator[bytes], on_done: Optional[Callable[[], None]] = None, read_size: int = 1024 * 1024):
+        """Start producing
+
+        Args:
+            chunks: Source of the chunks (closed once exhausted, failed or cancelled)
+            on_done: Called in the producer thread after the source is closed
+                (e.g. to release the query's connection)
+            read_size: Maximum bytes returned per chunk read back
+        """
+        self.read_size = read_size
+        self._file = tempfile.TemporaryFile()
+        self._cond = threading.Condition()
+        self._size = 0
+        self._done = False
+        self._cancelled = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._produce, args=(chunks, on_done), daemon=True)
+        self._thread.start()
+
+    def _produce(self, chunks: Iterator[bytes], on_done: Optional[Callable[[], None]]):
+        try:
+            for chunk in chunks:
+                with self._cond:
+                    if self._cancelled:
+                        break
+                    self._file.seek(0, io.SEEK_END)
+                    self._file.write(chunk)
+                    self._size += len(chunk)
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._error = e
+        finally:
+            try:
+                getattr(chunks, "close", lambda: None)()
+                if on_done is not None:
+                    on_done()
+            finally:
+                with self._cond:
+                    self._done = True
+                    if self._cancelled:
+                        self._file.close()
+                    self._cond.notify_all()
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Chunks as they are produced (raises the producer's error after the last one)"""
+        offset = 0
+        while True:
+            with self._cond:
+                while offset == self._size and not self._done and not self._cancelled:
+                    self._cond.wait()
+                if self._cancelled:
+                    return
+                if offset == self._size:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                self._file.seek(offset)
+                data = self._file.read(min(self._size - offset, self.read_size))
+            offset += len(data)
+            yield data
+
+    def close(self):
+        """Stop producing and discard the spooled chunks (idempotent)"""
+        with self._cond:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            if self._done:
+                self._file.close()
+            self._cond.notify_all()
@@ -0,0 +1,121 @@
+"""
+Cached schema of the loaded tables.
+
+The agent asks for the schema at the start of nearly every question. Each
+table's entry (declared column types from the engine, row count, indexes)
+and its rendered text for the agent's schema tool are built once per
+table version. Assembled pages are cached per data version of the
+processor, so an unchanged database answers without touching the engine.
+Large schemas can be filtered by table name and read in pages.
+"""
+import fnmatch
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.catalog import TableInfo
+from app.core.engine import QueryEngine
+
+# Assembled pages kept per data version (different filters/offsets)
+MAX_CACHED_PAGES = 32
+
+
+def matches_filter(table_name: str, name_filter: Optional[str]) -> bool:
+    """Whether a table name matches a filter (glob pattern, or case-insensitive substring)"""
+    if not name_filter:
+        return True
+    pattern = name_filter.lower()
+    if not any(char in pattern for char in "*?["):
+        pattern = f"*{pattern}*"
+    return fnmatch.fnmatchcase(table_name.lower(), pattern)
+
+
+def render_table(table_name: str, entry: Dict[str, Any]) -> str:
+    """Text block describing one table to the agent"""
+    lines = [f"Table: {table_name}", f"  Rows: {entry['row_count']}", "  Columns:"]
+    lines.extend(f"    - {col} ({dtype})" for col, dtype in zip(entry['columns'], entry['types']))
+    if entry.get('indexes'):
+        lines.append(f"  Indexed columns: {', '.join(entry['indexes'])}")
+    return "\n".join(lines) + "\n"
+
+
+class SchemaCache:
+    """Schema entries and rendered text, rebuilt only for tables that changed"""
+
+    def __init__(self, engine: QueryEngine, catalog: Dict[str, TableInfo]):
+        """Create a cache
+
+        Args:
+            engine: Engine the declared column types are read from
+            catalog: The processor's catalog (read, never modified)
+        """
+        self.engine = engine
+        self.catalog = catalog
+        self._tables: Dict[str, Tuple[int, Dict[str, Any], str]] = {}
+        self._pages: "OrderedDict[tuple, Tuple[Dict[str, Dict[str, Any]], str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _table(self, info: TableInfo) -> Tuple[Dict[str, Any], str]:
+        """Entry and rendered text of a table (cached per table version)"""
+        cached = self._tables.get(info.name)
+        if cached is not None and cached[0] == info.version:
+            return cached[1], cached[2]
+
+        columns = self.engine.table_columns(info.name)
+        entry = {
+            'columns': [name for name, _ in columns],
+            'types': [column_type for _, column_type in columns],
+            'row_count': info.row_count,
+            'indexes': list(info.indexes)
+        }
+        text = render_table(info.name, entry)
+        self._tables[info.name] = (info.version, entry, text)
+        return entry, text
+
+    def page(
+        self,
+        data_version: int,
+        name_filter: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[Dict[str, Dict[str, Any]], str, int]:
+        """Schema of the tables matching a filter, one page at a time
+
+        Args:
+            data_version: Current data version of the processor (cache key)
+            name_filter: Glob pattern or substring of table names (default: all)
+            offset: Matching tables to skip
+            limit: Maximum tables to return (default: all)
+
+        Returns:
+            Entries of the page's tables, their rendered text, and the
+            number of matching tables
+        """
+        key = (data_version, name_filter or "", offset, limit)
+        with self._lock:
+            cached = self._pages.get(key)
+            if cached is not None:
+                self._pages.move_to_end(key)
+                return cached
+
+            # A new data version: forget tables that are gone and pages of older versions
+            for table_name in [name for name in self._tables if name not in self.catalog]:
+                del self._tables[table_name]
+            for page_key in [page_key for page_key in self._pages if page_key[0] != data_version]:
+                del self._pages[page_key]
+
+            matching = [info for name, info in list(self.catalog.items()) if matches_filter(name, name_filter)]
+            selected = matching[offset:offset + limit if limit is not None else None]
+
+            entries = {}
+            blocks: List[str] = []
+            for info in selected:
+                entry, text = self._table(info)
+                entries[info.name] = entry
+                blocks.append(text)
+
+            result = (entries, "\n".join(blocks), len(matching))
+            self._pages[key] = result
+            if len(self._pages) > MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+            return result
@@ -0,0 +1,279 @@
+"""
+Session-scoped data stores.
+
+Every API session (a conversation, identified by a header or request field)
+gets its own ExcelProcessor and therefore its own SQLite database, so the
+tables of different conversations never mix. Requests without a session ID
+use the shared default processor.
+
+Sessions are kept in least-recently-used order. When the number of open
+sessions or their combined database size exceeds the global budget, idle
+sessions are evicted (closed and their data discarded) oldest first. Each
+session is also subject to a size and table-count quota.
+
+Session sizes are measured when a request that changed the session's data
+ends, outside the manager's lock, so budget checks never wait for a
+database (an in-memory database is locked while it is being loaded). The
+measurement and any eviction it triggers run on the manager's own worker
+thread, never on the event loop of the request that ended.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app.core.excel_processor import ExcelProcessor
+from app.core.logger import logger
+
+
+class SessionQuotaError(Exception):
+    """Raised when a load would take a session over its quota"""
+
+
+class SessionBusyError(Exception):
+    """Raised when dropping a session that requests are still using"""
+
+
+@dataclass
+class Session:
+    """An open session and its data store"""
+    session_id: str
+    processor: ExcelProcessor
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    active: int = 0  # Requests currently using the session
+    size: int = 0  # Database bytes when last measured
+    size_version: int = 0  # Data version the size was measured at
+
+
+class SessionManager:
+    """Creates, hands out and evicts per-session processors"""
+
+    def __init__(
+        self,
+        default: ExcelProcessor,
+        factory: Callable[[str], ExcelProcessor],
+        max_sessions: int = 100,
+        max_total_mb: int = 2048,
+        session_quota_mb: int = 256,
+        session_max_tables: int = 200,
+        idle_timeout_s: int = 3600
+    ):
+        """Initialize the manager
+
+        Args:
+            default: Processor used by requests without a session ID
+            factory: Creates the processor of a new session from its database path
+            max_sessions: Open sessions beyond this are evicted (least recently used first)
+            max_total_mb: Combined size of all session databases before eviction
+            session_quota_mb: Maximum database size of a single session
+            session_max_tables: Maximum number of tables in a single session
+            idle_timeout_s: Sessions unused for this long are evicted (0 = never)
+        """
+        self.default = default
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.max_total_bytes = max_total_mb * 1024 * 1024
+        self.quota_bytes = session_quota_mb * 1024 * 1024
+        self.max_tables = session_max_tables
+        self.idle_timeout_s = idle_timeout_s
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.evictions = 0
+        self._lock = threading.RLock()
+        # One worker: releases (size measurement, eviction) run in request order
+        self._releaser = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sessions")
+        self._last_release: Optional[Future] = None
+
+    @contextmanager
+    def use(self, session_id: Optional[str]) -> Iterator[ExcelProcessor]:
+        """Get the processor of a session for the duration of a request
+
+        The session is created on first use and cannot be evicted while in
+        use. When the request ends, the session is released on the manager's
+        worker thread (see ``flush``).
+
+        Args:
+            session_id: Session ID (None = default processor)
+
+        Yields:
+            The session's processor
+        """
+        if not session_id:
+            yield self.default
+            return
+
+        session = self._acquire(session_id)
+        try:
+            yield session.processor
+        finally:
+            with self._lock:
+                self._last_release = self._releaser.submit(self._release, session)
+
+    def _acquire(self, session_id: str) -> Session:
+        """Mark a session in use, opening it first if needed
+
+        The processor of a new session is created outside the lock; if
+        another request opened the session meanwhile, it is closed again.
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                return self._claim(session)
+
+        processor = self.factory(session_id)
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, processor)
+                self.sessions[session_id] = session
+                processor = None
+                logger.info(f"[cyan]🗂 Opened session {session_id}[/cyan]", extra={"markup": True})
+            self._claim(session)
+        if processor is not None:
+            processor.close()
+        return session
+
+    def _claim(self, session: Session) -> Session:
+        """Mark a session in use (called with the lock held)"""
+        self.sessions.move_to_end(session.session_id)
+        session.active += 1
+        session.last_used = time.time()
+        return session
+
+    def _release(self, session: Session):
+        """End a request: measure the session if its data changed, then enforce the budget"""
+        try:
+            version = session.processor.data_version
+            if version != session.size_version:
+                size = session.processor.database_size()
+                with self._lock:
+                    session.size, session.size_version = size, version
+        except Exception as e:
+            logger.warning(f"[yellow]⚠️  Could not measure session {session.session_id}: {e}[/yellow]", extra={"markup": True})
+        finally:
+            with self._lock:
+                session.active -= 1
+                session.last_used = time.time()
+        self.enforce_budget()
+
+    def flush(self):
+        """Wait until every ended request has been released"""
+        with self._lock:
+            release = self._last_release
+        if release is not None:
+            release.result()
+
+    def check_quota(self, processor: ExcelProcessor, new_tables: List[str]):
+        """Enforce the per-session quota after a load
+
+        Tables from the offending load are dropped again.
+
+        Args:
+            processor: Processor the tables were loaded into
+            new_tables: Tables created by the load
+
+        Raises:
+            SessionQuotaError: If the session exceeds its quota
+        """
+        if processor is self.default:
+            return
+
+        size = processor.database_size()
+        table_count = len(processor.catalog)
+        if size <= self.quota_bytes and table_count <= self.max_tables:
+            return
+
+        processor.drop_tables(new_tables)
+        raise SessionQuotaError(
+            f"Session quota exceeded ({size / 1024 / 1024:.1f} MB of {self.quota_bytes / 1024 / 1024:.0f} MB, "
+            f"{table_count} of {self.max_tables} tables)"
+        )
+
+    def enforce_budget(self):
+        """Evict idle sessions until the global limits are met"""
+        with self._lock:
+            now = time.time()
+            if self.idle_timeout_s:
+                for session in list(self.sessions.values()):
+                    if not session.active and now - session.last_used > self.idle_timeout_s:
+                        self._evict(session, "idle")
+
+            total = sum(session.size for session in self.sessions.values())
+            for session in list(self.sessions.values()):
+                if len(self.sessions) <= self.max_sessions and total <= self.max_total_bytes:
+                    break
+                if session.active:
+                    continue
+                total -= session.size
+                self._evict(session, "over budget")
+
+    def drop(self, session_id: str) -> bool:
+        """Close a session and discard its data
+
+        Returns:
+            Whether the session existed
+
+        Raises:
+            SessionBusyError: If requests are using the session
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return False
+            if session.active:
+                raise SessionBusyError(f"Session {session_id} is in use by {session.active} request(s)")
+            self._evict(session, "dropped")
+            return True
+
+    def _evict(self, session: Session, reason: str):
+        """Close a session and delete its database file, if any"""
+        del self.sessions[session.session_id]
+        session.processor.close()
+        session.processor.engine.delete_files()
+        self.evictions += 1
+        logger.info(f"[dim]🗑️  Evicted session {session.session_id} ({reason})[/dim]", extra={"markup": True})
+
+    def stats(self) -> Dict[str, object]:
+        """Budget usage and per-session sizes"""
+        with self._lock:
+            sessions = {
+                session_id: {
+                    "tables": len(session.processor.catalog),
+                    "bytes": session.size,
+                    "idle_s": round(time.time() - session.last_used, 1),
+                    "active": session.active
+                }
+                for session_id, session in self.sessions.items()
+            }
+        return {
+            "sessions": sessions,
+            "open_sessions": len(sessions),
+            "max_sessions": self.max_sessions,
+            "total_bytes": sum(s["bytes"] for s in sessions.values()),
+            "max_total_bytes": self.max_total_bytes,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        """Close every session (database files are kept)"""
+        self._releaser.shutdown(wait=True)
+        with self._lock:
+            for session in self.sessions.values():
+                session.processor.close()
+            self.sessions.clear()
+
+
+def session_db_path(session_dir: str, session_id: str) -> str:
+    """Database path for a session (in-memory when ``session_dir`` is empty)
+
+    Session IDs come from clients, so the file name is derived from a hash.
+    """
+    if not session_dir:
+        return ":memory:"
+    digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+    return str(Path(session_dir) / f"{digest}.db")
@@ -0,0 +1,229 @@
+"""
+Log of slow queries.
+
+Queries that take longer than a threshold (or time out) are kept in a
+bounded ring buffer with their duration, row count and query plan
+(``EXPLAIN QUERY PLAN`` for SQLite, ``EXPLAIN`` for DuckDB). Entries share
+a fingerprint when queries differ only in their literal values, so the
+log can be aggregated per query shape.
+
+For SQLite, plans are checked for full scans of large tables; when the
+query filters or joins such a table on some of its columns, an index on
+them is suggested. DuckDB scans column-wise with zone maps and does not
+index loaded tables, so its plans are recorded without advice.
+"""
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.catalog import TableInfo
+from app.core.indexing import index_name
+from app.core.sql_utils import quote_identifier
+
+# Full scans of tables with fewer rows are not flagged
+LARGE_TABLE_ROWS = 10_000
+
+# Columns per suggested index
+MAX_INDEX_COLUMNS = 3
+
+_IDENTIFIER = r'"(?:[^"]|"")*"|[A-Za-z_][\w$]*'
+
+# Tables in FROM/JOIN clauses (and comma-separated FROM lists) with an optional alias
+_SOURCE_PATTERN = re.compile(rf'(?:\bfrom|\bjoin|,)\s*({_IDENTIFIER})(?:\s+(?:as\s+)?({_IDENTIFIER}))?', re.IGNORECASE)
+
+# Words that can follow a table name but are not aliases
+_NOT_ALIASES = {
+    "where", "join", "on", "using", "left", "right", "inner", "outer", "full", "cross", "natural", "group",
+    "order", "limit", "offset", "having", "union", "except", "intersect", "window", "as", "and", "or", "from",
+}
+
+# Column compared with something: equality first, then ranges and other predicates
+_PREDICATE_PATTERN = re.compile(
+    rf'(?:({_IDENTIFIER})\.)?({_IDENTIFIER})\s*(=|==|<>|!=|<=|>=|<|>|\bin\b|\bbetween\b|\blike\b|\bis\b)'
+    rf'|(=|==|<=|>=|<|>)\s*(?:({_IDENTIFIER})\.)?({_IDENTIFIER})',
+    re.IGNORECASE
+)
+
+# SQLite plan step reading a whole table (not through an index)
+_SCAN_PATTERN = re.compile(r'^\s*SCAN (.+?)(?: USING (?:COVERING )?INDEX .*)?$')
+
+
+def _unquote(identifier: str) -> str:
+    """Identifier without quotes"""
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier
+
+
+def _sources(sql: str, catalog: Dict[str, TableInfo]) -> Dict[str, str]:
+    """Tables a query reads, by the name its plan uses for them (alias or table name)"""
+    tables = {name.lower(): name for name in catalog}
+    sources = {}
+    for table, alias in _SOURCE_PATTERN.findall(sql):
+        table_name = tables.get(_unquote(table).lower())
+        if table_name is None:
+            continue
+        sources[table_name.lower()] = table_name
+        if alias and alias.lower() not in _NOT_ALIASES:
+            sources[_unquote(alias).lower()] = table_name
+    return sources
+
+
+def _predicate_columns(sql: str, info: TableInfo, names: Sequence[str]) -> List[str]:
+    """Columns of a table the query filters or joins on, equality comparisons first
+
+    Args:
+        sql: The query
+        info: Catalog entry of the table
+        names: Names the query uses for the table (alias, table name)
+    """
+    columns = {column.lower(): column for column in info.columns}
+    equality, other = [], []
+    for match in _PREDICATE_PATTERN.finditer(sql):
+        if match.group(2):
+            qualifier, column, operator = match.group(1), match.group(2), match.group(3)
+        else:
+            operator, qualifier, column = match.group(4), match.group(5), match.group(6)
+        if qualifier and _unquote(qualifier).lower() not in names:
+            continue
+        column_name = columns.get(_unquote(column).lower())
+        if column_name is None:
+            continue
+        target = equality if operator.lower() in ("=", "==", "in", "is") else other
+        if column_name not in equality and column_name not in other:
+            target.append(column_name)
+    return equality + other
+
+
+def analyze_plan(
+    engine_name: str,
+    plan: Sequence[str],
+    sql: str,
+    catalog: Dict[str, TableInfo]
+) -> Tuple[List[str], List[str]]:
+    """Full scans of large tables in a plan, and indexes that would avoid them
+
+    Args:
+        engine_name: Engine the plan comes from (only SQLite plans are analyzed)
+        plan: Plan lines from ``QueryEngine.explain``
+        sql: The query
+        catalog: Loaded tables
+
+    Returns:
+        Tables scanned in full, and suggested ``CREATE INDEX`` statements
+    """
+    if engine_name != "sqlite":
+        return [], []
+
+    sources = _sources(sql, catalog)
+    full_scans, suggestions = [], []
+    for line in plan:
+        match = _SCAN_PATTERN.match(line)
+        if not match:
+            continue
+        table_name = sources.get(match.group(1).lower())
+        info = catalog.get(table_name) if table_name else None
+        if info is None or info.row_count < LARGE_TABLE_ROWS or table_name in full_scans:
+            continue
+        full_scans.append(table_name)
+
+        names = [name for name, table in sources.items() if table == table_name]
+        columns = [column for column in _predicate_columns(sql, info, names) if column not in info.indexes]
+        if columns:
+            columns = columns[:MAX_INDEX_COLUMNS]
+            suggestions.append(
+                f"CREATE INDEX {index_name(table_name, '_'.join(columns))} ON {quote_identifier(table_name)} "
+                f"({', '.join(quote_identifier(column) for column in columns)})"
+            )
+    return full_scans, suggestions
+
+
+@dataclass
+class SlowQuery:
+    """One slow (or timed-out) query"""
+    fingerprint: str  # Same for queries differing only in literal values
+    sql: str
+    duration_s: float
+    rows: Optional[int]  # None if the query timed out
+    engine: str
+    plan: List[str] = field(default_factory=list)
+    full_scans: List[str] = field(default_factory=list)  # Large tables read in full
+    suggested_indexes: List[str] = field(default_factory=list)
+    timed_out: bool = False
+    timestamp: float = field(default_factory=time.time)
+
+
+class SlowQueryLog:
+    """Bounded log of slow queries, shared by all processors"""
+
+    def __init__(self, threshold_s: float = 1.0, capacity: int = 500):
+        """Create a log
+
+        Args:
+            threshold_s: Queries taking at least this long are recorded
+            capacity: Entries kept (oldest dropped first)
+        """
+        self.threshold_s = threshold_s
+        self._entries: "deque[SlowQuery]" = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+
+    def record(self, entry: SlowQuery):
+        """Add an entry (dropping the oldest if full)"""
+        with self._lock:
+            self._entries.append(entry)
+
+    def clear(self):
+        """Forget all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Latest entries, newest first"""
+        with self._lock:
+            entries = list(self._entries)[-limit:] if limit else []
+        return [{**asdict(entry), "timestamp": datetime.fromtimestamp(entry.timestamp).isoformat()} for entry in reversed(entries)]
+
+    def aggregate(self) -> List[Dict[str, Any]]:
+        """Entries grouped by fingerprint, most total time first
+
+        Returns:
+            Per fingerprint: count, timeouts, total/mean/max duration, last
+            seen, and the latest query, row count, plan and advice
+        """
+        with self._lock:
+            entries = list(self._entries)
+
+        groups: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            group = groups.setdefault(entry.fingerprint, {
+                "fingerprint": entry.fingerprint,
+                "count": 0,
+                "timeouts": 0,
+                "total_s": 0.0,
+                "max_s": 0.0,
+                "full_scans": [],
+                "suggested_indexes": [],
+            })
+            group["count"] += 1
+            group["timeouts"] += int(entry.timed_out)
+            group["total_s"] += entry.duration_s
+            group["max_s"] = max(group["max_s"], entry.duration_s)
+            group.update({
+                "last_seen": datetime.fromtimestamp(entry.timestamp).isoformat(),
+                "sql": entry.sql,
+                "rows": entry.rows,
+                "engine": entry.engine,
+                "plan": entry.plan,
+            })
+            for key in ("full_scans", "suggested_indexes"):
+                group[key].extend(value for value in getattr(entry, key) if value not in group[key])
+
+        for group in groups.values():
+            group["mean_s"] = round(group["total_s"] / group["count"], 4)
+            group["total_s"] = round(group["total_s"], 4)
+            group["max_s"] = round(group["max_s"], 4)
+        return sorted(groups.values(), key=lambda group: -group["total_s"])
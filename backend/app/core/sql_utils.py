@@ -0,0 +1,31 @@
+"""
+Small SQL helpers shared by the database-facing modules
+"""
+from typing import Any, Dict, Sequence, Tuple, Union
+
+# Bound query parameters: positional (``?``) or named (``$name``)
+QueryParams = Union[Sequence[Any], Dict[str, Any]]
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for SQLite"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_string(value: str) -> str:
+    """Quote a string literal (e.g. a file path)"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def key_match(key_columns: Sequence[str], left: str, right: str) -> str:
+    """Condition matching rows of two (quoted) relations on their key columns"""
+    return " AND ".join(
+        f"{left}.{quote_identifier(column)} = {right}.{quote_identifier(column)}" for column in key_columns
+    )
+
+
+def count_nulls(conn: Any, columns: Sequence[str], relation: str) -> Tuple[int, Dict[str, int]]:
+    """Row count and per-column NULL counts of a relation (table or parenthesized query)"""
+    aggregates = ["COUNT(*)"] + [f"COUNT(*) - COUNT({quote_identifier(column)})" for column in columns]
+    row = conn.execute(f"SELECT {', '.join(aggregates)} FROM {relation}").fetchone()
+    return row[0], {column: int(count or 0) for column, count in zip(columns, row[1:])}
@@ -0,0 +1,93 @@
+"""
+SQLite connection tuning for ExcelProcessor.
+
+File-backed databases run in WAL mode so readers keep working while a
+load is writing, with durability relaxed only for the duration of bulk
+loads. In-memory databases ignore the file-related pragmas.
+"""
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from app.core.logger import logger
+
+
+@dataclass
+class SQLiteOptions:
+    """Pragmas applied to every connection"""
+    page_size: int = 4096  # Only takes effect when the database file is created
+    cache_size_mb: int = 64
+    mmap_size_mb: int = 256
+    temp_store: str = "memory"  # "memory", "file" or "default"
+    synchronous: str = "normal"  # Durability outside bulk loads (WAL makes "normal" safe)
+    bulk_synchronous: str = "off"  # Durability while loading files ("off": power loss mid-load can corrupt the file)
+    vacuum_free_ratio: float = 0.25  # VACUUM once this share of pages is free after a load
+
+
+def is_memory_database(db_path: str) -> bool:
+    """Whether ``db_path`` names an in-memory database"""
+    return db_path == ":memory:" or db_path == "" or "mode=memory" in db_path
+
+
+def apply_pragmas(
+    conn: sqlite3.Connection,
+    options: SQLiteOptions,
+    file_backed: bool,
+    read_only: bool = False
+):
+    """Configure a freshly opened connection
+
+    Args:
+        conn: Connection to configure
+        options: Pragma values
+        file_backed: Whether the database lives in a file (enables WAL and mmap)
+        read_only: Reader connection; the writer has already set up the file
+    """
+    if file_backed:
+        if not read_only:
+            # page_size must be set before WAL is enabled on a new database
+            conn.execute(f"PRAGMA page_size = {int(options.page_size)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA mmap_size = {int(options.mmap_size_mb) * 1024 * 1024}")
+    conn.execute(f"PRAGMA cache_size = {-int(options.cache_size_mb) * 1024}")
+    conn.execute(f"PRAGMA temp_store = {options.temp_store.upper()}")
+    conn.execute(f"PRAGMA synchronous = {options.synchronous.upper()}")
+
+
+@contextmanager
+def bulk_load(conn: sqlite3.Connection, options: SQLiteOptions):
+    """Relax durability while bulk-loading, then restore it
+
+    If only the process crashes during a load, the load is lost and earlier
+    data is intact. With ``synchronous=OFF``, an operating-system crash or
+    power loss during a load can corrupt a file-backed database, earlier
+    tables included; use ``NORMAL`` where the file must survive that.
+    """
+    conn.execute(f"PRAGMA synchronous = {options.bulk_synchronous.upper()}")
+    try:
+        yield
+    finally:
+        conn.execute(f"PRAGMA synchronous = {options.synchronous.upper()}")
+
+
+def maintain(conn: sqlite3.Connection, options: SQLiteOptions, file_backed: bool):
+    """Housekeeping after a load
+
+    Replacing tables leaves free pages behind; once they make up more than
+    ``vacuum_free_ratio`` of the file it is compacted. ``PRAGMA optimize``
+    refreshes planner statistics where SQLite considers it worthwhile.
+    """
+    conn.execute("PRAGMA optimize")
+
+    if not file_backed:
+        return
+
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if page_count and free_pages / page_count > options.vacuum_free_ratio:
+        logger.info(
+            f"[dim]🧹 Vacuuming database ({free_pages}/{page_count} pages free)[/dim]",
+            extra={"markup": True}
+        )
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
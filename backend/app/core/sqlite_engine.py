@@ -0,0 +1,353 @@
+"""
+SQLite implementation of the query engine.
+
+Tables are written through the pooled writer connection (explicitly typed
+and optionally STRICT), indexed automatically, and queried through the
+read-only connections of the pool.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.catalog import TableInfo
+from app.core.connections import ConnectionPool
+from app.core.engine import QueryBudget, QueryEngine, QueryTimeoutError
+from app.core.excel_reader import infer_sqlite_type, to_sql_value
+from app.core.indexing import index_name, index_tables
+from app.core.logger import logger
+from app.core.sql_utils import QueryParams, count_nulls, quote_identifier
+from app.core.sqlite_config import SQLiteOptions, bulk_load, maintain
+from app.core.type_inference import sqlite_column_types
+
+# Virtual-machine instructions between deadline checks (a few hundred microseconds)
+PROGRESS_INTERVAL = 10_000
+
+
+def _used_bytes(conn: sqlite3.Connection) -> int:
+    """Bytes of the pages in use"""
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return (page_count - free_pages) * page_size
+
+
+class SQLiteEngine(QueryEngine):
+    """Row-store engine on the standard library's sqlite3"""
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        db_path: str = ":memory:",
+        sqlite_options: Optional[SQLiteOptions] = None,
+        read_connections: int = 4,
+        strict_tables: bool = False,
+        statement_cache_size: int = 128
+    ):
+        """Open the database
+
+        Args:
+            db_path: Path to SQLite database (default: in-memory)
+            sqlite_options: Connection pragmas (WAL, cache, mmap, ...)
+            read_connections: Size of the read-only connection pool used by queries
+            strict_tables: Create DataFrame tables as SQLite STRICT tables
+            statement_cache_size: Compiled statements kept per connection
+        """
+        self.db_path = db_path
+        self.options = sqlite_options or SQLiteOptions()
+        self.pool = ConnectionPool(
+            db_path, self.options, max_readers=read_connections, statement_cache_size=statement_cache_size
+        )
+        self.file_backed = self.pool.file_backed
+        self.conn = self.pool.writer
+        self._loading_thread: Optional[int] = None
+        self.strict_tables = strict_tables and sqlite3.sqlite_version_info >= (3, 37, 0)
+        if strict_tables and not self.strict_tables:
+            logger.warning(f"[yellow]⚠ SQLite {sqlite3.sqlite_version} does not support STRICT tables[/yellow]", extra={"markup": True})
+
+    @contextmanager
+    def loading(self) -> Iterator[None]:
+        """Hold the writer with relaxed durability, then tidy up"""
+        with self.pool.writing(), bulk_load(self.conn, self.options):
+            self._loading_thread = threading.get_ident()
+            try:
+                yield
+            finally:
+                self._loading_thread = None
+            maintain(self.conn, self.options, self.file_backed)
+
+    def write_dataframe(self, table_name: str, df: pd.DataFrame, typed: bool = True):
+        """Replace a table with the contents of a DataFrame"""
+        if typed:
+            self._write_typed_table(table_name, df)
+        else:
+            df.to_sql(table_name, self.conn, if_exists='replace', index=False)
+
+    def _write_typed_table(self, table_name: str, df: pd.DataFrame):
+        """Replace a table using explicit column types derived from the dtypes
+
+        Unlike ``to_sql(if_exists='replace')``, every column gets a consistent
+        declared type, so numbers are stored and compared as numbers.
+        """
+        quoted_table = quote_identifier(table_name)
+        column_defs = [
+            f"{quote_identifier(str(column))} {column_type}"
+            for column, column_type in zip(df.columns, sqlite_column_types(df, self.strict_tables))
+        ]
+        if not column_defs:
+            column_defs.append('"Unnamed: 0" TEXT')
+        strict = " STRICT" if self.strict_tables else ""
+
+        # to_sql commits (or rolls back) the whole transaction, DDL included
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute(f"DROP TABLE IF EXISTS {quoted_table}")
+            self.conn.execute(f"CREATE TABLE {quoted_table} ({', '.join(column_defs)}){strict}")
+        except Exception:
+            self.conn.rollback()
+            raise
+        df.to_sql(table_name, self.conn, if_exists='append', index=False)
+
+    def write_chunks(
+        self,
+        table_name: str,
+        columns: List[str],
+        chunks: Iterable[List[Tuple[Any, ...]]]
+    ) -> List[str]:
+        """Replace a table with rows streamed in chunks, in one transaction"""
+        quoted_table = quote_identifier(table_name)
+        column_types: Optional[List[str]] = None
+
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {quoted_table}")
+
+            for chunk in chunks:
+                if column_types is None:
+                    column_types = self._create_table(cursor, quoted_table, columns, chunk)
+
+                placeholders = ", ".join("?" * len(columns))
+                cursor.executemany(
+                    f"INSERT INTO {quoted_table} VALUES ({placeholders})",
+                    [tuple(to_sql_value(v) for v in row) for row in chunk]
+                )
+
+            if column_types is None:
+                column_types = self._create_table(cursor, quoted_table, columns, [])
+
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        return column_types
+
+    def _create_table(self, cursor: sqlite3.Cursor, quoted_table: str, columns: List[str], sample: List[tuple]) -> List[str]:
+        """Create a table whose column types are inferred from sample rows
+
+        Returns:
+            Column types used
+        """
+        column_types = [infer_sqlite_type([row[idx] for row in sample]) for idx in range(len(columns))]
+        column_defs = [
+            f"{quote_identifier(column)} {column_type}"
+            for column, column_type in zip(columns, column_types)
+        ]
+
+        # A sheet with neither header nor data still gets a (placeholder) table
+        if not column_defs:
+            column_defs.append('"Unnamed: 0" TEXT')
+
+        cursor.execute(f"CREATE TABLE {quoted_table} ({', '.join(column_defs)})")
+        return column_types
+
+    def append_table(
+        self,
+        source: str,
+        target: str,
+        columns: Sequence[str],
+        key_columns: Sequence[str] = (),
+        widen: Sequence[str] = ()
+    ) -> Tuple[Tuple[int, Dict[str, int]], Tuple[int, Dict[str, int]]]:
+        """Insert the rows of ``source`` into ``target`` in one transaction
+
+        Upserts delete the rows they replace through an index on the key
+        columns (created once), so their cost grows with the new rows only.
+        Existing indexes are maintained by the inserts, and planner
+        statistics are refreshed by ``PRAGMA optimize`` only once the table
+        has grown enough for them to matter. ``widen`` needs no work: an
+        INTEGER column keeps non-integral values as REAL.
+        """
+        quoted_source = quote_identifier(source)
+        quoted_target = quote_identifier(target)
+        column_list = ", ".join(quote_identifier(column) for column in columns)
+        rows = f"SELECT {column_list} FROM {quoted_source}"
+        replaced = superseded = (0, {})
+
+        try:
+            self.conn.execute("BEGIN")
+            try:
+                if key_columns:
+                    keys = ", ".join(quote_identifier(column) for column in key_columns)
+                    self.conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {quote_identifier(index_name(target, '__'.join(key_columns)))} "
+                        f"ON {quoted_target} ({keys})"
+                    )
+                    matches = f"({keys}) IN (SELECT {keys} FROM {quoted_source})"
+
+                    target_columns = [col[1] for col in self.conn.execute(f"PRAGMA table_info({quoted_target})").fetchall()]
+                    replaced = count_nulls(self.conn, target_columns, f"(SELECT * FROM {quoted_target} WHERE {matches})")
+                    self.conn.execute(f"DELETE FROM {quoted_target} WHERE {matches}")
+
+                    # Of new rows sharing a key, the last one wins
+                    latest = f"rowid IN (SELECT MAX(rowid) FROM {quoted_source} GROUP BY {keys})"
+                    superseded = count_nulls(self.conn, columns, f"(SELECT * FROM {quoted_source} WHERE NOT {latest})")
+                    rows += f" WHERE {latest}"
+
+                self.conn.execute(f"INSERT INTO {quoted_target} ({column_list}) {rows}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        finally:
+            self.discard_table(source)
+
+        self.conn.execute("PRAGMA optimize")
+        return replaced, superseded
+
+    def discard_table(self, table_name: str):
+        """Drop a table with the writer already held"""
+        self.conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        self.conn.commit()
+
+    def index_tables(self, table_names: List[str], catalog: Dict[str, TableInfo], min_rows: int = 0) -> List[str]:
+        """Index likely key/join/filter columns and ANALYZE"""
+        return index_tables(self.conn, table_names, catalog, min_rows)
+
+    def table_names(self) -> List[str]:
+        """Names of all tables in the database"""
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def table_columns(self, table_name: str) -> List[Tuple[str, str]]:
+        """Column names and declared types of a table"""
+        with self.pool.reader() as conn:
+            columns = conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})").fetchall()
+        return [(col[1], col[2]) for col in columns]
+
+    def describe_table(self, table_name: str) -> TableInfo:
+        """Catalog entry of an existing table, including its automatic indexes"""
+        column_types = self.table_columns(table_name)
+        with self.pool.reader() as conn:
+            info = TableInfo.from_database(conn, table_name, column_types)
+            for index in conn.execute(f"PRAGMA index_list({quote_identifier(table_name)})").fetchall():
+                if index[1].startswith("idx_"):
+                    index_columns = conn.execute(f"PRAGMA index_info({quote_identifier(index[1])})").fetchall()
+                    info.indexes.extend(col[2] for col in index_columns)
+        return info
+
+    def query(self, sql: str, timeout: Optional[float] = None, params: Optional[QueryParams] = None) -> pd.DataFrame:
+        """Run a query on a pooled read-only connection
+
+        A deadline is enforced by a progress handler that aborts the
+        statement once it passes, leaving the connection usable.
+        Parameterized queries reuse the connection's compiled statement.
+        """
+        params = params or None
+        with self.pool.reader() as conn:
+            if not timeout:
+                return pd.read_sql_query(sql, conn, params=params)
+
+            budget = QueryBudget(timeout)
+            conn.set_progress_handler(budget.expired, PROGRESS_INTERVAL)
+            try:
+                with budget.running():
+                    return pd.read_sql_query(sql, conn, params=params)
+            except Exception as e:
+                if budget.expired() and "interrupted" in str(e):
+                    raise QueryTimeoutError(timeout) from e
+                raise
+            finally:
+                conn.set_progress_handler(None, 0)
+
+    def query_batches(
+        self,
+        sql: str,
+        batch_size: int = 10_000,
+        timeout: Optional[float] = None,
+        params: Optional[QueryParams] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Run a query on a pooled read-only connection, fetching rows in batches"""
+        budget = QueryBudget(timeout)
+        with self.pool.reader() as conn:
+            if timeout:
+                conn.set_progress_handler(budget.expired, PROGRESS_INTERVAL)
+            cursor = conn.cursor()
+            try:
+                with budget.running():
+                    cursor.execute(sql, params or ())
+                columns = [column[0] for column in cursor.description or ()]
+                while True:
+                    with budget.running():
+                        rows = cursor.fetchmany(batch_size)
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+                    if len(rows) < batch_size:
+                        break
+            except sqlite3.OperationalError as e:
+                if budget.expired() and "interrupted" in str(e):
+                    raise QueryTimeoutError(timeout) from e
+                raise
+            finally:
+                cursor.close()
+                if timeout:
+                    conn.set_progress_handler(None, 0)
+
+    def explain(self, sql: str, params: Optional[QueryParams] = None) -> List[str]:
+        """``EXPLAIN QUERY PLAN`` steps, indented by nesting"""
+        with self.pool.reader() as conn:
+            steps = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        depth = {0: -1}
+        lines = []
+        for step_id, parent, _, detail in steps:
+            depth[step_id] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[step_id] + detail)
+        return lines
+
+    def drop_tables(self, table_names: Sequence[str]):
+        """Drop tables if they exist"""
+        with self.pool.writing() as conn:
+            for table_name in table_names:
+                conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+            conn.commit()
+            maintain(conn, self.options, self.file_backed)
+        self._delete_column_stats(table_names)
+
+    def database_size(self) -> int:
+        """Bytes used by the database (pages in use, in memory or on disk)
+
+        The loading thread measures through the writer, since readers are
+        locked out of an in-memory database until the load ends.
+        """
+        if self._loading_thread == threading.get_ident():
+            return _used_bytes(self.conn)
+        with self.pool.reader() as conn:
+            return _used_bytes(conn)
+
+    def close(self):
+        """Close all connections"""
+        self.pool.close()
+
+    def delete_files(self):
+        """Delete the database file and its WAL/shared-memory companions"""
+        if self.file_backed:
+            for suffix in ("", "-wal", "-shm"):
+                Path(self.db_path + suffix).unlink(missing_ok=True)
+        self._delete_stats_dir()
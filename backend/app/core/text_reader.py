@@ -0,0 +1,274 @@
+"""
+Chunked reader for delimited text (CSV/TSV) and NDJSON files.
+
+Text files are always streamed: rows are read and converted one chunk at a
+time, so a multi-GB export is loaded with memory bounded by the chunk size
+(and without Excel's row limit). Column types are sniffed from the first
+chunk, the way ``infer_sqlite_type`` types the first chunk of a sheet.
+"""
+import csv
+import json
+import re
+from datetime import datetime
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.excel_reader import normalize_header
+
+# Delimiter per extension (None = sniffed from the file)
+DELIMITERS = {".csv": ",", ".tsv": "\t", ".tab": "\t", ".txt": None}
+
+# One JSON object per line
+JSON_LINES_EXTENSIONS = (".ndjson", ".jsonl")
+
+TEXT_EXTENSIONS = tuple(DELIMITERS) + JSON_LINES_EXTENSIONS
+
+# Cells read as NULL (a subset of pandas' default na_values)
+NA_VALUES = frozenset({"", "NA", "N/A", "#N/A", "NULL", "null", "NaN", "nan", "None"})
+
+# Leading zeros mark codes (ZIPs, SKUs), which stay text
+_INT_PATTERN = re.compile(r"[-+]?(0|[1-9]\d*)")
+_FLOAT_PATTERN = re.compile(r"[-+]?((0|[1-9]\d*)(\.\d*)?|\.\d+)([eE][-+]?\d+)?")
+_DATETIME_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?")
+
+
+def is_text_file(file_path: Path) -> bool:
+    """Whether a file is loaded by this reader (by extension)"""
+    return file_path.suffix.lower() in TEXT_EXTENSIONS
+
+
+def _to_int(value: str) -> Any:
+    text = value.strip()
+    if _INT_PATTERN.fullmatch(text):
+        number = int(text)
+        if -2 ** 63 <= number < 2 ** 63:
+            return number
+    return value
+
+
+def _to_float(value: str) -> Any:
+    text = value.strip()
+    if _FLOAT_PATTERN.fullmatch(text):
+        return float(text)
+    return value
+
+
+def _to_datetime(value: str) -> Any:
+    text = value.strip()
+    if _DATETIME_PATTERN.fullmatch(text):
+        try:
+            return datetime.fromisoformat(text)
+        except ValueError:
+            pass
+    return value
+
+
+def _to_number(value: str) -> Any:
+    number = _to_int(value)
+    return _to_float(value) if isinstance(number, str) else number
+
+
+def _keep(value: Any) -> Any:
+    return value
+
+
+# Candidate conversions, narrowest first
+_CONVERTERS: Sequence[Callable[[str], Any]] = (_to_int, _to_float, _to_datetime)
+
+
+def sniff_converter(sample: Sequence[str], converters: Sequence[Callable[[str], Any]] = _CONVERTERS) -> Callable[[str], Any]:
+    """Pick the narrowest conversion that accepts every sampled value
+
+    Values a conversion does not accept are returned unchanged, so a
+    mistyped cell after the sample is kept as text instead of failing the load.
+    Integer columns also accept floats, so a fraction after the sample stays
+    a number (the engines widen the column to REAL).
+
+    Args:
+        sample: Non-NULL text values of one column
+        converters: Candidate conversions, narrowest first
+
+    Returns:
+        Conversion function (identity if no candidate fits)
+    """
+    if not sample:
+        return _keep
+    for converter in converters:
+        if all(not isinstance(converter(value), str) for value in sample):
+            return _to_number if converter is _to_int else converter
+    return _keep
+
+
+def _chunked(rows: Iterator[Tuple[Any, ...]], chunk_size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    """Group rows into lists of ``chunk_size``"""
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _detect_delimiter(file_path: Path) -> str:
+    """Delimiter of a text file: from its extension, or sniffed from its start"""
+    delimiter = DELIMITERS.get(file_path.suffix.lower())
+    if delimiter is not None:
+        return delimiter
+    with open(file_path, encoding="utf-8-sig", errors="replace", newline="") as f:
+        head = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(head, delimiters=",\t;|").delimiter
+    except csv.Error:
+        return ","
+
+
+def iter_delimited_chunks(
+    file_path: Path,
+    chunk_size: int,
+    delimiter: Optional[str] = None
+) -> Tuple[List[str], Iterator[List[Tuple[Any, ...]]]]:
+    """Stream a CSV/TSV file as fixed-size chunks of typed row tuples
+
+    The first row is used as header (named like ``pandas.read_csv`` names
+    columns). Blank lines are skipped, short rows are padded with NULLs and
+    extra cells are dropped. Each column is converted to int, float or
+    datetime when every value of the first chunk allows it.
+
+    Args:
+        file_path: Path to the file
+        chunk_size: Maximum number of rows per chunk
+        delimiter: Field delimiter (default: by extension, or sniffed)
+
+    Returns:
+        Tuple of (column names, iterator over chunks of row tuples)
+    """
+    f = open(file_path, encoding="utf-8-sig", errors="replace", newline="")
+    reader = csv.reader(f, delimiter=delimiter or _detect_delimiter(file_path))
+    raw_header = next(reader, None)
+
+    if raw_header is None:
+        f.close()
+        return [], iter(())
+
+    columns = normalize_header([value or None for value in raw_header])
+    width = len(columns)
+
+    def rows() -> Iterator[Tuple[str, ...]]:
+        for row in reader:
+            if not any(row):
+                continue
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            yield tuple(row[:width])
+
+    def chunks() -> Iterator[List[Tuple[Any, ...]]]:
+        try:
+            raw_chunks = _chunked(rows(), chunk_size)
+            first = next(raw_chunks, None)
+            if first is None:
+                return
+
+            converters = [
+                sniff_converter([row[idx] for row in first if row[idx] not in NA_VALUES])
+                for idx in range(width)
+            ]
+            for chunk in chain([first], raw_chunks):
+                yield [
+                    tuple(
+                        None if value in NA_VALUES else convert(value)
+                        for value, convert in zip(row, converters)
+                    )
+                    for row in chunk
+                ]
+        finally:
+            f.close()
+
+    return columns, chunks()
+
+
+def iter_json_lines_chunks(
+    file_path: Path,
+    chunk_size: int
+) -> Tuple[List[str], Iterator[List[Tuple[Any, ...]]]]:
+    """Stream an NDJSON file (one object per line) as fixed-size chunks of row tuples
+
+    Columns are the keys of the objects in the first chunk, in order of
+    appearance; keys first seen later are ignored. Nested values are
+    stored as JSON text, and string columns holding only ISO dates in the
+    first chunk are converted to datetimes.
+
+    Args:
+        file_path: Path to the file
+        chunk_size: Maximum number of rows per chunk
+
+    Returns:
+        Tuple of (column names, iterator over chunks of row tuples)
+
+    Raises:
+        ValueError: If a line is not a JSON object
+    """
+    f = open(file_path, encoding="utf-8-sig", errors="replace")
+
+    def objects() -> Iterator[dict]:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if not isinstance(obj, dict):
+                raise ValueError(f"Line {line_number} is not a JSON object")
+            yield obj
+
+    def cell(value: Any) -> Any:
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    try:
+        raw_chunks = _chunked(objects(), chunk_size)
+        first = next(raw_chunks, None)
+    except Exception:
+        f.close()
+        raise
+
+    if first is None:
+        f.close()
+        return [], iter(())
+
+    keys = list(dict.fromkeys(key for obj in first for key in obj))
+    converters = []
+    for key in keys:
+        sample = [obj.get(key) for obj in first if obj.get(key) is not None]
+        if sample and all(isinstance(value, str) for value in sample):
+            converters.append(sniff_converter(sample, (_to_datetime,)))
+        else:
+            converters.append(_keep)
+
+    def chunks() -> Iterator[List[Tuple[Any, ...]]]:
+        try:
+            for chunk in chain([first], raw_chunks):
+                yield [
+                    tuple(
+                        convert(value) if isinstance(value, str) else cell(value)
+                        for value, convert in zip((obj.get(key) for key in keys), converters)
+                    )
+                    for obj in chunk
+                ]
+        finally:
+            f.close()
+
+    return [str(key) for key in keys], chunks()
+
+
+def iter_text_chunks(file_path: Path, chunk_size: int) -> Tuple[List[str], Iterator[List[Tuple[Any, ...]]]]:
+    """Stream a delimited text or NDJSON file, chosen by extension
+
+    Args:
+        file_path: Path to the file
+        chunk_size: Maximum number of rows per chunk
+
+    Returns:
+        Tuple of (column names, iterator over chunks of row tuples)
+    """
+    if file_path.suffix.lower() in JSON_LINES_EXTENSIONS:
+        return iter_json_lines_chunks(file_path, chunk_size)
+    return iter_delimited_chunks(file_path, chunk_size)
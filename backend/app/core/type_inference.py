@@ -0,0 +1,141 @@
+"""
+Dtype inference for parsed sheets.
+
+Turns what pandas guessed from Excel into compact, query-friendly dtypes
+(downcast numbers, numeric/date strings parsed, low-cardinality text as
+categoricals) and maps the result to explicit SQLite column types.
+"""
+import re
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+# Only strings shaped like dates are handed to the (slow) date parser
+DATE_PATTERN = re.compile(r"^\s*\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?\s*$")
+
+# Numbers written as text. Leading zeros (ZIPs, SKUs), exponents and
+# surrounding whitespace mark codes, which stay text (as in text_reader)
+NUMERIC_STRING_PATTERN = re.compile(r"[-+]?((0|[1-9]\d*)(\.\d+)?|\.\d+)")
+
+
+def is_text(series: pd.Series) -> bool:
+    """Whether every non-null value of an object column is a string"""
+    return bool(series.map(lambda v: v is None or v != v or isinstance(v, str)).all())
+
+
+def _is_number(value) -> bool:
+    """Whether a cell is a number, or text that reads back as the same number"""
+    if isinstance(value, str):
+        return bool(NUMERIC_STRING_PATTERN.fullmatch(value))
+    return isinstance(value, (int, float))
+
+
+def _parse_numeric_strings(series: pd.Series) -> pd.Series:
+    """Convert a text column to numbers if every non-null value is a plain number"""
+    values = series.dropna()
+    if values.empty or not values.map(_is_number).all():
+        return series
+    return pd.to_numeric(series.astype("string"), errors="coerce")
+
+
+def _parse_date_strings(series: pd.Series) -> pd.Series:
+    """Convert a text column to datetimes if every non-null value is a date"""
+    values = series.dropna()
+    if values.empty or not values.map(lambda v: isinstance(v, str) and bool(DATE_PATTERN.match(v))).all():
+        return series
+
+    parsed = pd.to_datetime(values, errors="coerce", format="mixed")
+    if parsed.isna().any():
+        return series
+    return pd.to_datetime(series, errors="coerce", format="mixed")
+
+
+def _downcast_float(series: pd.Series) -> pd.Series:
+    """Shrink a float column without changing any value
+
+    Whole-number floats (integers with gaps, as Excel gives them) become
+    nullable integers; others become float32 only if that is lossless.
+    """
+    values = series.dropna()
+    if values.empty:
+        return series
+
+    if np.isfinite(values).all() and (values.abs() < 2 ** 53).all() and (values == np.floor(values)).all():
+        as_int = pd.to_numeric(values.astype("int64"), downcast="integer")
+        return series.astype(pd.Int64Dtype()).astype(str(as_int.dtype).capitalize())
+
+    as_float32 = values.astype("float32")
+    if (as_float32.astype("float64") == values).all():
+        return series.astype("float32")
+    return series
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Infer compact dtypes for every column of a parsed sheet
+
+    Args:
+        df: DataFrame as returned by ``pd.read_excel``
+
+    Returns:
+        DataFrame with optimized dtypes (values are unchanged)
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+
+        if series.dtype == object:
+            series = _parse_numeric_strings(series)
+        if series.dtype == object:
+            series = _parse_date_strings(series)
+
+        if pd.api.types.is_bool_dtype(series):
+            pass
+        elif pd.api.types.is_integer_dtype(series):
+            series = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            series = _downcast_float(series)
+        elif series.dtype == object:
+            non_null = series.count()
+            if non_null and is_text(series) and series.nunique() <= non_null * CATEGORY_MAX_RATIO:
+                series = series.astype("category")
+
+        columns[col] = series
+
+    return pd.DataFrame(columns, index=df.index)
+
+
+def sqlite_column_types(df: pd.DataFrame, strict: bool = False) -> List[str]:
+    """Get the SQLite column type for every column of a DataFrame
+
+    STRICT tables only accept INTEGER, REAL, TEXT, BLOB and ANY, so dates
+    are declared as TEXT there (they are stored as ISO strings either way).
+
+    Args:
+        df: DataFrame to be written
+        strict: Whether the table will be created as STRICT
+
+    Returns:
+        List of column types
+    """
+    types = []
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtype = dtype.categories.dtype
+
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+            types.append("INTEGER")
+        elif pd.api.types.is_float_dtype(dtype):
+            types.append("REAL")
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            types.append("TEXT" if strict else "TIMESTAMP")
+        elif strict and df[col].dtype == object and not is_text(df[col]):
+            # Mixed-type text columns still hold numbers, which TEXT would reject
+            types.append("ANY")
+        else:
+            types.append("TEXT")
+    return types
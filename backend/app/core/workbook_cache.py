@@ -0,0 +1,195 @@
+"""
+Persistent cache of parsed workbooks.
+
+Entries are keyed by the SHA-256 of the workbook bytes and hold every
+parsed sheet as an Arrow IPC (Feather) file, so re-uploading a known file
+skips Excel parsing and only pays for a columnar load. The cache lives on
+disk, survives restarts and is trimmed least-recently-used first once it
+grows past its size budget.
+"""
+import hashlib
+import json
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from app.core.logger import logger
+
+try:
+    import pyarrow  # noqa: F401 - required by DataFrame.to_feather / read_feather
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+MANIFEST_NAME = "manifest.json"
+
+
+def file_sha256(file_path: Path, block_size: int = 1 << 20) -> str:
+    """Hash a file's bytes without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class WorkbookCache:
+    """On-disk, content-addressed cache of parsed workbook sheets"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        """Initialize the cache and index existing entries
+
+        Args:
+            cache_dir: Directory holding one sub-directory per workbook
+            max_bytes: Total size budget; oldest entries are evicted beyond it
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._load_index()
+        self._evict()
+        logger.info(
+            f"[bold green]✓[/bold green] Workbook cache: {self.cache_dir} "
+            f"({len(self._entries)} entries, {self.total_bytes // (1 << 20)} MB)",
+            extra={"markup": True}
+        )
+
+    @property
+    def total_bytes(self) -> int:
+        """Total size of all cached entries"""
+        return sum(self._entries.values())
+
+    def _load_index(self):
+        """Rebuild the LRU order from manifest access times"""
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            manifest = entry_dir / MANIFEST_NAME
+            if not manifest.is_file():
+                # Leftover of an interrupted write
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            size = sum(f.stat().st_size for f in entry_dir.iterdir())
+            entries.append((manifest.stat().st_mtime, entry_dir.name, size))
+
+        for _, digest, size in sorted(entries):
+            self._entries[digest] = size
+
+    def get(self, digest: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """Load the parsed sheets of a workbook
+
+        Args:
+            digest: SHA-256 of the workbook bytes
+
+        Returns:
+            Dictionary of sheet name → DataFrame in sheet order, or None on a miss
+        """
+        entry_dir = self.cache_dir / digest
+
+        with self._lock:
+            if digest not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+
+        try:
+            manifest = json.loads((entry_dir / MANIFEST_NAME).read_text())
+            sheets = {
+                sheet["name"]: pd.read_feather(entry_dir / sheet["file"])
+                for sheet in manifest["sheets"]
+            }
+            # Record the access for LRU order after a restart
+            (entry_dir / MANIFEST_NAME).touch()
+        except Exception as e:
+            logger.warning(f"[yellow]⚠ Dropping unreadable cache entry {digest[:12]}: {e}[/yellow]", extra={"markup": True})
+            self._remove(digest)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return sheets
+
+    def put(self, digest: str, sheets: Dict[str, pd.DataFrame]):
+        """Store the parsed sheets of a workbook
+
+        Sheets that Arrow cannot represent (e.g. mixed-type object columns)
+        make the whole workbook uncacheable; this is logged, not raised.
+
+        Args:
+            digest: SHA-256 of the workbook bytes
+            sheets: Dictionary of sheet name → DataFrame in sheet order
+        """
+        entry_dir = self.cache_dir / digest
+        tmp_dir = self.cache_dir / f".{digest}.{time.time_ns()}.tmp"
+
+        try:
+            tmp_dir.mkdir()
+            manifest = {"sheets": []}
+            for idx, (sheet_name, df) in enumerate(sheets.items()):
+                file_name = f"sheet_{idx}.arrow"
+                if not all(isinstance(col, str) for col in df.columns):
+                    # Arrow needs string column names; to_sql stringifies them anyway
+                    df = df.rename(columns=str)
+                df.to_feather(tmp_dir / file_name)
+                manifest["sheets"].append({"name": sheet_name, "file": file_name})
+            (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest))
+            size = sum(f.stat().st_size for f in tmp_dir.iterdir())
+
+            with self._lock:
+                if digest in self._entries:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                    return
+                tmp_dir.rename(entry_dir)
+                self._entries[digest] = size
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.warning(f"[yellow]⚠ Workbook not cached: {e}[/yellow]", extra={"markup": True})
+            return
+
+        self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the size budget is met"""
+        while True:
+            with self._lock:
+                if not self._entries or self.total_bytes <= self.max_bytes:
+                    return
+                digest = next(iter(self._entries))
+                self.evictions += 1
+            logger.info(f"[dim]🗑️  Evicting cached workbook {digest[:12]}[/dim]", extra={"markup": True})
+            self._remove(digest)
+
+    def _remove(self, digest: str):
+        """Delete an entry from disk and from the index"""
+        with self._lock:
+            self._entries.pop(digest, None)
+        shutil.rmtree(self.cache_dir / digest, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters
+
+        Returns:
+            Dictionary with hits, misses, hit rate, evictions and size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes
+            }
@@ -1,11 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.core.excel_processor import ExcelProcessor
+from app.core.ingestion import IngestionScheduler
+from app.core.query_cache import QueryCache
+from app.core.result_cursors import ResultCursors
+from app.core.sessions import SessionManager, session_db_path
+from app.core.slow_queries import SlowQueryLog
+from app.core.sqlite_config import SQLiteOptions
+from app.core.workbook_cache import WorkbookCache, ARROW_AVAILABLE
 from app.agents import tools
-from app.api import upload, query, agent_excel, agent_upload, storage
+from app.api import upload, query, agent_excel, agent_upload, storage, sessions, admin
 from app.core.logger import logger, console
 from app.core.config import get_settings
 from rich.panel import Panel
+from pathlib import Path
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -24,14 +33,107 @@ app.add_middleware(
 )
 
 # Initialize components
-excel_processor = ExcelProcessor()
+settings = get_settings()
+
+# Compress large responses (JSON results and schemas, streamed rows)
+if settings.response_gzip_min_bytes:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.response_gzip_min_bytes, compresslevel=6)
+
+workbook_cache = None
+if settings.parse_cache_enabled:
+    if ARROW_AVAILABLE:
+        workbook_cache = WorkbookCache(
+            Path(settings.parse_cache_dir),
+            max_bytes=settings.parse_cache_max_mb * 1024 * 1024
+        )
+    else:
+        logger.warning("[yellow]⚠ pyarrow not installed, parsed-workbook cache disabled[/yellow]", extra={"markup": True})
+
+# Result cache shared by the default processor and all session processors
+query_cache = QueryCache(max_bytes=settings.query_cache_mb * 1024 * 1024) if settings.query_cache_enabled else None
+
+# Slow-query log shared by all processors
+slow_query_log = SlowQueryLog(
+    threshold_s=settings.slow_query_threshold_ms / 1000,
+    capacity=settings.slow_query_log_size
+) if settings.slow_query_log_enabled else None
+
+sqlite_options = SQLiteOptions(
+    page_size=settings.sqlite_page_size,
+    cache_size_mb=settings.sqlite_cache_size_mb,
+    mmap_size_mb=settings.sqlite_mmap_size_mb,
+    temp_store=settings.sqlite_temp_store,
+    synchronous=settings.sqlite_synchronous,
+    bulk_synchronous=settings.sqlite_bulk_synchronous,
+    vacuum_free_ratio=settings.sqlite_vacuum_free_ratio
+)
+
+duckdb_options = {
+    "threads": settings.duckdb_threads,
+    "memory_limit_mb": settings.duckdb_memory_limit_mb
+}
+engine_options = {
+    "sqlite": None,
+    "duckdb": duckdb_options,
+    "parquet": {**duckdb_options, "compression_level": settings.parquet_compression_level}
+}.get(settings.query_engine)
+
+# Worker pool shared by the default processor and all session processors
+ingestion_scheduler = IngestionScheduler(max_workers=settings.ingest_workers)
+
+
+def create_processor(db_path: str, max_database_mb: int = 0) -> ExcelProcessor:
+    """Create a processor configured from the settings"""
+    return ExcelProcessor(
+        db_path=db_path,
+        streaming=settings.ingest_streaming,
+        chunk_size=settings.ingest_chunk_size,
+        cache=workbook_cache,
+        query_cache=query_cache,
+        slow_query_log=slow_query_log,
+        infer_types=settings.ingest_infer_types,
+        strict_tables=settings.ingest_strict_tables,
+        incremental=settings.ingest_incremental,
+        column_stats=settings.ingest_column_stats,
+        quality_checks=settings.quality_check_on_load,
+        quality_max_rows=settings.quality_max_rows,
+        auto_index=settings.auto_index,
+        index_min_rows=settings.auto_index_min_rows,
+        query_timeout=settings.query_timeout_s,
+        max_join_rows=settings.query_max_join_rows,
+        statement_cache_size=settings.query_statement_cache_size,
+        sqlite_options=sqlite_options,
+        read_connections=settings.sqlite_read_connections,
+        scheduler=ingestion_scheduler,
+        engine=settings.query_engine,
+        engine_options=engine_options,
+        max_database_mb=max_database_mb
+    )
+
+
+excel_processor = create_processor(settings.database_path)
 tools.set_processor(excel_processor)
 
-# Set processors in routers
-upload.set_excel_processor(excel_processor)
-query.set_excel_processor(excel_processor)
-agent_excel.set_excel_processor(excel_processor)
-agent_upload.set_excel_processor(excel_processor)
+session_manager = SessionManager(
+    default=excel_processor,
+    factory=lambda session_id: create_processor(
+        session_db_path(settings.session_dir, session_id), max_database_mb=settings.session_quota_mb
+    ),
+    max_sessions=settings.session_max_count,
+    max_total_mb=settings.session_budget_mb,
+    session_quota_mb=settings.session_quota_mb,
+    session_max_tables=settings.session_max_tables,
+    idle_timeout_s=settings.session_idle_timeout_s
+)
+
+# Set session manager in routers
+upload.set_session_manager(session_manager)
+query.set_session_manager(session_manager)
+query.set_result_cursors(ResultCursors(ttl_s=settings.query_cursor_ttl_s, max_bytes=settings.query_cursor_max_mb * 1024 * 1024))
+agent_excel.set_session_manager(session_manager)
+agent_upload.set_session_manager(session_manager)
+sessions.set_session_manager(session_manager)
+admin.set_slow_query_log(slow_query_log)
 
 # Include routers
 app.include_router(upload.router)
@@ -39,6 +141,8 @@ app.include_router(query.router)
 app.include_router(agent_excel.router)
 app.include_router(agent_upload.router)
 app.include_router(storage.router)
+app.include_router(sessions.router)
+app.include_router(admin.router)
 
 
 @app.on_event("startup")
@@ -56,7 +160,9 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown event"""
+    session_manager.close()
     excel_processor.close()
+    ingestion_scheduler.shutdown()
     logger.info("[yellow]Server shutting down...[/yellow]", extra={"markup": True})
 
 
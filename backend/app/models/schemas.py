@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Dict, Any, Union
 from datetime import datetime
 
 
@@ -7,6 +7,9 @@ class FileUploadResponse(BaseModel):
     """Response for file upload"""
     filename: str
     tables_created: List[str]
+    tables_reused: List[str] = []  # Unchanged sheets whose tables were kept
+    tables_rebuilt: List[str] = []  # New or changed sheets that were (re)loaded
+    tables_appended: List[str] = []  # Existing tables that new rows were appended/upserted to
     row_count: int
     status: str = "success"
 
@@ -15,6 +18,7 @@ class QuestionRequest(BaseModel):
     """Request for asking a question"""
     question: str
     model: Optional[str] = None  # Optional model override
+    session_id: Optional[str] = None  # Overrides the X-Session-ID header
 
 
 class QuestionResponse(BaseModel):
@@ -43,6 +47,12 @@ class ErrorResponse(BaseModel):
 class SQLQueryRequest(BaseModel):
     """Request for executing custom SQL query"""
     query: str
+    params: Optional[Union[List[Any], Dict[str, Any]]] = None  # Values for ? (list) or $name (dict) placeholders
+    session_id: Optional[str] = None  # Overrides the X-Session-ID header
+    timeout_s: Optional[float] = Field(default=None, ge=0)  # Overrides the default query timeout (capped)
+    stream: Optional[Literal["ndjson", "csv", "arrow"]] = None  # Stream the rows in this format instead of one JSON document
+    page_size: Optional[int] = Field(default=None, ge=1, le=10000)  # Return one page of rows and a cursor for the next
+    cursor: Optional[str] = None  # next_cursor of the previous page (repeat the same query)
 
 
 class SQLQueryResponse(BaseModel):
@@ -52,6 +62,8 @@ class SQLQueryResponse(BaseModel):
     rows: List[List[Any]]
     row_count: int
     status: str = "success"
+    total_rows: Optional[int] = None  # Rows of the whole result (paginated requests)
+    next_cursor: Optional[str] = None  # Cursor of the next page (None after the last page)
 
 
 class AgentExcelRequest(BaseModel):
@@ -64,6 +76,7 @@ class AgentExcelRequest(BaseModel):
     query: str
     excel_urls: Optional[List[str]] = None
     openaiFileIdRefs: Optional[List[Any]] = None  # Can be dict or string
+    session_id: Optional[str] = None  # Overrides the X-Session-ID / openai-conversation-id header
 
 
 class AgentExcelLocalRequest(BaseModel):
@@ -0,0 +1 @@
+# Unit tests (no running server needed)
@@ -0,0 +1,87 @@
+"""
+Unit tests for the SQLite connection pool
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from app.core.connections import ConnectionPool, PoolTimeoutError
+from app.core.sqlite_config import SQLiteOptions
+
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool(":memory:", SQLiteOptions(), max_readers=1, reader_wait_s=0.2)
+    pool.writer.execute("CREATE TABLE sales (id INTEGER, amount REAL)")
+    pool.writer.execute("INSERT INTO sales VALUES (1, 10.0), (2, 20.0)")
+    pool.writer.commit()
+    yield pool
+    pool.close()
+
+
+class TestReaders:
+    """Readers are pooled and waited for a bounded time"""
+
+    def test_reader_reused(self, pool):
+        with pool.reader() as first:
+            pass
+        with pool.reader() as second:
+            assert second is first
+
+    def test_busy_pool_times_out(self, pool):
+        with pool.reader():
+            started = time.monotonic()
+            with pytest.raises(PoolTimeoutError):
+                with pool.reader():
+                    pass
+            assert time.monotonic() - started < 5
+
+    def test_reader_returned_after_timeout(self, pool):
+        with pool.reader():
+            with pytest.raises(PoolTimeoutError):
+                with pool.reader():
+                    pass
+        with pool.reader() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 2
+
+
+class TestReadOnlyAuthorizer:
+    """Pooled readers can read and report, nothing else"""
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT SUM(amount) FROM sales",
+        "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 5) SELECT * FROM n",
+        "PRAGMA table_info(sales)",
+        "SELECT * FROM pragma_table_info('sales')",
+        "PRAGMA query_only",
+        "SELECT name FROM sqlite_master",
+    ])
+    def test_reads_allowed(self, pool, sql):
+        with pool.reader() as conn:
+            conn.execute(sql).fetchall()
+
+    @pytest.mark.parametrize("sql", [
+        "INSERT INTO sales VALUES (3, 30.0)",
+        "UPDATE sales SET amount = 0",
+        "DELETE FROM sales",
+        "DROP TABLE sales",
+        "CREATE TABLE x (a)",
+        "CREATE TEMP TABLE x (a)",
+        "ATTACH DATABASE ':memory:' AS other",
+        "PRAGMA query_only = OFF",
+        "PRAGMA writable_schema = ON",
+        "BEGIN",
+    ])
+    def test_writes_denied(self, pool, sql):
+        with pool.reader() as conn:
+            with pytest.raises(sqlite3.DatabaseError):
+                conn.execute(sql)
+            assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        with pool.reader() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 2
+
+    def test_writer_unrestricted(self, pool):
+        pool.writer.execute("CREATE TABLE x (a)")
+        pool.writer.execute("DROP TABLE x")
@@ -0,0 +1,116 @@
+"""
+Unit tests for the DuckDB query engine
+"""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from app.core.duckdb_engine import DuckDBEngine
+
+
+@pytest.fixture
+def engine():
+    engine = DuckDBEngine()
+    with engine.loading():
+        engine.write_dataframe("sales", pd.DataFrame({"id": [1, 2, 3], "amount": [10.0, 20.0, 30.0]}))
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def secret_file(tmp_path):
+    path = tmp_path / "fake.env"
+    path.write_text("API_KEY=secret\n")
+    return path
+
+
+class TestFileAccess:
+    """Queries cannot read server files"""
+
+    @pytest.mark.parametrize("query", [
+        "SELECT * FROM read_text('{path}')",
+        "SELECT * FROM read_csv('{path}')",
+        "SELECT * FROM glob('{directory}/*')",
+        "SELECT * FROM '{path}'",
+    ])
+    def test_file_functions_rejected(self, engine, secret_file, query):
+        with pytest.raises(Exception) as excinfo:
+            engine.query(query.format(path=secret_file, directory=secret_file.parent))
+        assert "secret" not in str(excinfo.value)
+
+    def test_access_cannot_be_reenabled(self, engine):
+        with pytest.raises(Exception):
+            engine.query("SET enable_external_access = true")
+
+    def test_extensions_not_installed(self, engine):
+        with pytest.raises(Exception):
+            engine.query("INSTALL httpfs")
+
+    def test_loaded_tables_still_queryable(self, engine):
+        result = engine.query("SELECT SUM(amount) AS total FROM sales")
+        assert result["total"].tolist() == [60.0]
+
+    def test_file_backed_database(self, tmp_path, secret_file):
+        engine = DuckDBEngine(str(tmp_path / "data.duckdb"))
+        try:
+            with engine.loading():
+                engine.write_dataframe("t", pd.DataFrame({"a": [1]}))
+            assert engine.query("SELECT a FROM t")["a"].tolist() == [1]
+            with pytest.raises(Exception):
+                engine.query(f"SELECT * FROM read_text('{secret_file}')")
+        finally:
+            engine.close()
+
+
+class TestParameters:
+    """Bound values reach DuckDB as values, never as SQL text"""
+
+    def test_positional(self, engine):
+        assert engine.query("SELECT amount FROM sales WHERE id = ?", params=[2])["amount"].tolist() == [20.0]
+
+    def test_named(self, engine):
+        result = engine.query("SELECT id FROM sales WHERE amount > $low AND amount < $high", params={"low": 5, "high": 25})
+        assert result["id"].tolist() == [1, 2]
+
+    @pytest.mark.parametrize("value", ["it's", "x'; DROP TABLE sales; --", 0.1 + 0.2, 2 ** 62])
+    def test_values_round_trip(self, engine, value):
+        assert engine.query("SELECT ? AS v", params=[value])["v"].tolist() == [value]
+
+    def test_null(self, engine):
+        assert engine.query("SELECT ? IS NULL AS v", params=[None])["v"].tolist() == [True]
+
+    def test_injection_is_a_value(self, engine):
+        assert engine.query("SELECT COUNT(*) AS n FROM sales WHERE CAST(id AS VARCHAR) = ?", params=["1 OR 1=1"])["n"][0] == 0
+        assert len(engine.query("SELECT * FROM sales")) == 3
+
+    def test_repeated_after_reload(self, engine):
+        engine.query("SELECT amount FROM sales WHERE id = ?", params=[1])
+        with engine.loading():
+            engine.write_dataframe("sales", pd.DataFrame({"id": [1], "amount": [99.0]}))
+        assert engine.query("SELECT amount FROM sales WHERE id = ?", params=[1])["amount"].tolist() == [99.0]
+
+    def test_several_statements_rejected(self, engine):
+        with pytest.raises(ValueError):
+            engine.query("SELECT * FROM sales WHERE id = ?; SELECT 1", params=[1])
+
+    def test_streamed(self, engine):
+        batches = list(engine.query_batches("SELECT id FROM sales WHERE id >= ? ORDER BY id", batch_size=1, params=[2]))
+        assert pd.concat(batches)["id"].tolist() == [2, 3]
+
+
+class TestStreamedTypes:
+    """Later chunks widen columns they do not fit instead of being cast"""
+
+    @pytest.mark.parametrize("later, column_type, values", [
+        ((12.5,), "REAL", [1.0, 2.0, 12.5]),
+        (("n/a",), "TEXT", ["1", "2", "n/a"]),
+        ((None,), "INTEGER", [1, 2, None]),
+    ])
+    def test_later_chunk(self, engine, later, column_type, values):
+        with engine.loading():
+            column_types = engine.write_chunks("streamed", ["value"], iter([[(1,), (2,)], [later]]))
+        assert column_types == [column_type]
+        result = engine.query("SELECT value FROM streamed ORDER BY rowid")["value"]
+        assert [None if pd.isna(value) else value for value in result] == values
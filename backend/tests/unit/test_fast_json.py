@@ -0,0 +1,81 @@
+"""
+Unit tests for JSON encoding of API responses
+"""
+
+import json
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core import fast_json
+from app.core.fast_json import dataframe_rows_json, dumps
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param and not fast_json.ORJSON_AVAILABLE:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(fast_json, "ORJSON_AVAILABLE", request.param)
+
+
+class TestDataFrameRows:
+    """Rows keep every value exactly, in column order"""
+
+    def test_float64_round_trip(self, encoder):
+        values = [0.1 + 0.2, 1 / 3, 1e-300, 123456789.123456789, 2.0 ** 0.5, -0.0]
+        rows = json.loads(dataframe_rows_json(pd.DataFrame({"x": values})))
+        assert [row[0] for row in rows] == values
+
+    def test_float32_shortest_form(self, encoder):
+        rows = json.loads(dataframe_rows_json(pd.DataFrame({"x": np.array([0.1, 2.5], dtype=np.float32)})))
+        assert rows == [[0.1], [2.5]]
+
+    def test_missing_and_infinite_floats_null(self, encoder):
+        frame = pd.DataFrame({"x": [1.5, np.nan, np.inf], "y": pd.array([None, 2.5, 3.0], dtype="Float64")})
+        assert json.loads(dataframe_rows_json(frame)) == [[1.5, None], [None, 2.5], [None, 3.0]]
+
+    def test_mixed_columns_in_order(self, encoder):
+        frame = pd.DataFrame({
+            "id": [1, 2],
+            "price": [0.1 + 0.2, None],
+            "name": ["é", None],
+            "at": pd.to_datetime(["2024-01-02 03:04:05", None]),
+            "ratio": [1 / 3, 0.5],
+        })
+        assert json.loads(dataframe_rows_json(frame)) == [
+            [1, 0.30000000000000004, "é", "2024-01-02T03:04:05.000", 1 / 3],
+            [2, None, None, None, 0.5],
+        ]
+
+    def test_without_floats(self, encoder):
+        frame = pd.DataFrame({"id": [1, 2], "name": ["a", None]})
+        assert json.loads(dataframe_rows_json(frame)) == [[1, "a"], [2, None]]
+
+    def test_empty(self, encoder):
+        assert json.loads(dataframe_rows_json(pd.DataFrame({"x": pd.Series([], dtype=float)}))) == []
+
+
+class TestDumps:
+    """Responses nest DataFrames, NumPy and pandas values"""
+
+    def test_nested_values(self, encoder):
+        content = {
+            "rows": pd.DataFrame({"x": [0.1 + 0.2]}),
+            "count": np.int64(3),
+            "mean": np.float64(1 / 3),
+            "at": datetime(2024, 1, 2, 3, 4, 5),
+            "missing": pd.NaT,
+        }
+        decoded = json.loads(dumps(content))
+        assert decoded["rows"] == [[0.30000000000000004]]
+        assert decoded["count"] == 3
+        assert math.isclose(decoded["mean"], 1 / 3, rel_tol=0, abs_tol=0)
+        assert decoded["at"].startswith("2024-01-02T03:04:05")
+        assert decoded["missing"] is None
+
+    def test_unsupported_type(self, encoder):
+        with pytest.raises(TypeError):
+            dumps({"value": object()})
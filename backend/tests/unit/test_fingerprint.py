@@ -0,0 +1,90 @@
+"""
+Unit tests for per-sheet content fingerprints
+"""
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from app.core.fingerprint import FileFingerprints, xlsx_sheet_fingerprints
+
+
+def write_workbook(path, sheets, number_format=None):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        sheet = workbook.create_sheet(name)
+        for row in rows:
+            sheet.append(row)
+        if number_format:
+            for cell in sheet["B"][1:]:
+                cell.number_format = number_format
+    workbook.save(path)
+    return path
+
+
+@pytest.fixture
+def sheets():
+    return {
+        "Orders": [["id", "amount", "status"], [1, 10.5, "open"], [2, 20.0, "closed"]],
+        "Customers": [["id", "name"], [1, "Ada"], [2, "Grace"]],
+    }
+
+
+class TestSheetFingerprints:
+    """A sheet's fingerprint changes with its own content only"""
+
+    def test_one_per_sheet(self, tmp_path, sheets):
+        fingerprints = xlsx_sheet_fingerprints(write_workbook(tmp_path / "a.xlsx", sheets))
+        assert set(fingerprints) == {"Orders", "Customers"}
+        assert fingerprints["Orders"] != fingerprints["Customers"]
+
+    def test_same_content_same_fingerprint(self, tmp_path, sheets):
+        first = xlsx_sheet_fingerprints(write_workbook(tmp_path / "a.xlsx", sheets))
+        second = xlsx_sheet_fingerprints(write_workbook(tmp_path / "b.xlsx", sheets))
+        assert first == second
+
+    def test_edit_changes_that_sheet_only(self, tmp_path, sheets):
+        before = xlsx_sheet_fingerprints(write_workbook(tmp_path / "a.xlsx", sheets))
+        sheets["Orders"][1][1] = 11.5
+        after = xlsx_sheet_fingerprints(write_workbook(tmp_path / "b.xlsx", sheets))
+        assert after["Orders"] != before["Orders"]
+        assert after["Customers"] == before["Customers"]
+
+    def test_shared_string_edit(self, tmp_path, sheets):
+        before = xlsx_sheet_fingerprints(write_workbook(tmp_path / "a.xlsx", sheets))
+        sheets["Customers"][2][1] = "Hopper"
+        after = xlsx_sheet_fingerprints(write_workbook(tmp_path / "b.xlsx", sheets))
+        assert after["Customers"] != before["Customers"]
+        assert after["Orders"] == before["Orders"]
+
+    def test_number_format_counts(self, tmp_path, sheets):
+        plain = xlsx_sheet_fingerprints(write_workbook(tmp_path / "a.xlsx", sheets))
+        dated = xlsx_sheet_fingerprints(write_workbook(tmp_path / "b.xlsx", sheets, number_format="yyyy-mm-dd"))
+        assert dated["Orders"] != plain["Orders"]
+
+    def test_not_a_workbook(self, tmp_path):
+        path = tmp_path / "broken.xlsx"
+        path.write_bytes(b"not a zip")
+        assert xlsx_sheet_fingerprints(path) == {}
+
+
+class TestFileFingerprints:
+    """Files without per-sheet parts fall back to the file digest, salted"""
+
+    def test_text_file_digest(self, tmp_path):
+        path = tmp_path / "orders.csv"
+        path.write_text("id,amount\n1,10\n")
+        digest = FileFingerprints(path).sheet()
+        path.write_text("id,amount\n1,11\n")
+        assert FileFingerprints(path).sheet() != digest
+
+    def test_salt(self, tmp_path, sheets):
+        path = write_workbook(tmp_path / "a.xlsx", sheets)
+        assert FileFingerprints(path, "streaming").sheet("Orders") != FileFingerprints(path, "dataframe").sheet("Orders")
+
+    def test_unknown_sheet_uses_file_digest(self, tmp_path, sheets):
+        path = write_workbook(tmp_path / "a.xlsx", sheets)
+        fingerprints = FileFingerprints(path)
+        assert fingerprints.sheet("Missing") == fingerprints.sheet(None)
+        assert fingerprints.sheet("Orders") != fingerprints.sheet(None)
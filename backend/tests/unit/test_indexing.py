@@ -0,0 +1,54 @@
+"""
+Unit tests for automatic indexing after loads
+"""
+
+import sqlite3
+
+import pytest
+
+from app.core.catalog import TableInfo
+from app.core.indexing import index_tables
+
+
+def create(conn, name, columns, rows):
+    conn.execute(f"CREATE TABLE {name} ({', '.join(columns)})")
+    conn.executemany(f"INSERT INTO {name} VALUES ({', '.join('?' * len(columns))})", rows)
+    return TableInfo(name=name, row_count=len(rows), columns=columns, dtypes=["int64"] * len(columns))
+
+
+def analyzed(conn):
+    return {table for (table,) in conn.execute("SELECT DISTINCT tbl FROM sqlite_stat1")}
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def catalog(conn):
+    catalog = {
+        "orders": create(conn, "orders", ["buyer", "amount"], [(i % 30, i) for i in range(100)]),
+        "notes": create(conn, "notes", ["amount", "text"], [(i, "x") for i in range(100)]),
+    }
+    index_tables(conn, list(catalog), catalog)
+    conn.execute("DELETE FROM sqlite_stat1")
+    return catalog
+
+
+class TestIndexTables:
+    """Existing tables are reported (and re-analyzed) only when they gain an index"""
+
+    def test_new_join_key_indexes_existing_table(self, conn, catalog):
+        catalog["buyers"] = create(conn, "buyers", ["buyer", "label"], [(i, "b") for i in range(30)])
+        changed = index_tables(conn, ["buyers"], catalog)
+        assert changed == ["orders", "buyers"]
+        assert catalog["orders"].indexes == ["amount", "buyer"]
+        assert analyzed(conn) == {"orders", "buyers"}
+
+    def test_unchanged_tables_not_analyzed(self, conn, catalog):
+        catalog["more"] = create(conn, "more", ["amount", "text"], [(i, "y") for i in range(10)])
+        assert index_tables(conn, ["more"], catalog) == ["more"]
+        assert analyzed(conn) == {"more"}
@@ -0,0 +1,126 @@
+"""
+Unit tests for the Parquet table store
+"""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from app.core.parquet_engine import ParquetEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = ParquetEngine(str(tmp_path / "store"))
+    with engine.loading():
+        engine.write_dataframe("sales", pd.DataFrame({"id": [1, 2], "amount": [10.0, 20.0]}))
+    yield engine
+    engine.close()
+
+
+def total(engine, table="sales"):
+    return engine.query(f"SELECT COUNT(*) AS n, SUM(amount) AS total FROM {table}").iloc[0].tolist()
+
+
+class TestFileAccess:
+    """Queries reach the store's files only"""
+
+    def test_views_over_store_work(self, engine):
+        assert total(engine) == [2, 30.0]
+
+    @pytest.mark.parametrize("query", [
+        "SELECT * FROM read_text('{path}')",
+        "SELECT * FROM read_csv('{path}')",
+        "SELECT * FROM glob('{directory}/*')",
+    ])
+    def test_files_outside_store_rejected(self, engine, tmp_path, query):
+        secret = tmp_path / "fake.env"
+        secret.write_text("API_KEY=secret\n")
+        with pytest.raises(Exception):
+            engine.query(query.format(path=secret, directory=tmp_path))
+
+    def test_reopened_store_is_queryable(self, engine, tmp_path):
+        reopened = ParquetEngine(str(tmp_path / "store"))
+        try:
+            assert total(reopened) == [2, 30.0]
+        finally:
+            reopened.close()
+
+
+class TestWrites:
+    """Replacing and appending leave no partial state behind"""
+
+    def test_replace_swaps_directory(self, engine):
+        with engine.loading():
+            engine.write_dataframe("sales", pd.DataFrame({"id": [3], "amount": [5.0]}))
+        assert total(engine) == [1, 5.0]
+        assert [path.name for path in (engine.store_dir / "sales").iterdir()] == ["v000002"]
+
+    def test_replace_keeps_files_of_running_query(self, engine):
+        with engine._reading():
+            with engine.loading():
+                engine.write_dataframe("sales", pd.DataFrame({"id": [3], "amount": [5.0]}))
+            assert (engine.store_dir / "sales" / "v000001" / "part-00000.parquet").exists()
+        assert not (engine.store_dir / "sales" / "v000001").exists()
+        assert total(engine) == [1, 5.0]
+
+    def test_failed_replace_keeps_table(self, engine):
+        with pytest.raises(RuntimeError):
+            with engine.loading(), engine._staging("sales"):
+                raise RuntimeError("load failed")
+        assert total(engine) == [2, 30.0]
+        assert [path.name for path in (engine.store_dir / "sales").iterdir()] == ["v000001"]
+
+    def test_append_adds_complete_part(self, engine):
+        with engine.loading():
+            engine.write_dataframe("new_rows", pd.DataFrame({"id": [3], "amount": [5.0]}))
+            engine.append_table("new_rows", "sales", ["id", "amount"])
+        assert total(engine) == [3, 35.0]
+        parts = sorted(path.name for path in (engine.store_dir / "sales" / "v000001").iterdir())
+        assert parts == ["part-00000.parquet", "part-00001.parquet"]
+
+    def test_interrupted_load_cleaned_up_on_open(self, engine, tmp_path):
+        table_dir = engine.store_dir / "sales"
+        (table_dir / ".v000002.abc").mkdir()
+        (table_dir / "v000001" / "part-00001.parquet.tmp").write_bytes(b"partial")
+        (engine.store_dir / "orphan" / ".v000001.abc").mkdir(parents=True)
+        reopened = ParquetEngine(str(tmp_path / "store"))
+        try:
+            assert reopened.table_names() == ["sales"]
+            assert [path.name for path in table_dir.iterdir()] == ["v000001"]
+            assert [path.name for path in (table_dir / "v000001").iterdir()] == ["part-00000.parquet"]
+            assert total(reopened) == [2, 30.0]
+        finally:
+            reopened.close()
+
+    def test_flat_layout_becomes_first_version(self, tmp_path):
+        engine = ParquetEngine(str(tmp_path / "store"))
+        with engine.loading():
+            engine.write_dataframe("sales", pd.DataFrame({"id": [1], "amount": [1.0]}))
+        engine.close()
+        table_dir = tmp_path / "store" / "sales"
+        (table_dir / "v000001" / "part-00000.parquet").rename(table_dir / "part-00000.parquet")
+        (table_dir / "v000001").rmdir()
+
+        reopened = ParquetEngine(str(tmp_path / "store"))
+        try:
+            assert total(reopened) == [1, 1.0]
+        finally:
+            reopened.close()
+
+
+class TestStreamedTypes:
+    """Later chunks widen columns they do not fit instead of being cast"""
+
+    @pytest.mark.parametrize("later, column_type, values", [
+        ((12.5,), "REAL", [1.0, 2.0, 12.5]),
+        (("n/a",), "TEXT", ["1", "2", "n/a"]),
+        ((None,), "INTEGER", [1, 2, None]),
+    ])
+    def test_later_chunk(self, engine, later, column_type, values):
+        with engine.loading():
+            column_types = engine.write_chunks("streamed", ["value"], iter([[(1,), (2,)], [later]]))
+        assert column_types == [column_type]
+        result = engine.query("SELECT value FROM streamed")["value"]
+        assert sorted((None if pd.isna(value) else value for value in result), key=str) == sorted(values, key=str)
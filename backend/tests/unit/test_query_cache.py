@@ -0,0 +1,121 @@
+"""
+Unit tests for result-cache keys and invalidation
+"""
+
+import pandas as pd
+import pytest
+
+from app.core.query_cache import QueryCache, is_cacheable, normalize_sql, query_shape, referenced_tables
+
+
+def key(sql, versions=None, params=None, namespace="ns"):
+    return QueryCache.make_key(namespace, normalize_sql(sql), versions or {"sales": 1}, params)
+
+
+class TestNormalizeSql:
+    """Equivalent spellings share a key; anything naming result columns does not"""
+
+    def test_keywords_whitespace_and_comments(self):
+        assert normalize_sql("SELECT id FROM sales  -- all\n WHERE amount > 1;") == normalize_sql(
+            "SELECT id from sales /* all */ where amount > 1"
+        )
+
+    def test_alias_case_kept(self):
+        assert key("SELECT x AS Total FROM sales") != key("SELECT x AS total FROM sales")
+
+    def test_expression_text_kept(self):
+        assert key("SELECT a IS NULL FROM sales") != key("SELECT a is null FROM sales")
+
+    def test_identifier_case_kept(self):
+        assert "Region" in normalize_sql("SELECT * FROM sales WHERE Region = 'EU'")
+
+    def test_literals_kept(self):
+        assert key("SELECT * FROM sales WHERE region = 'EU'") != key("SELECT * FROM sales WHERE region = 'eu'")
+
+    def test_subquery_keywords_folded(self):
+        assert normalize_sql("WITH t AS (SELECT a FROM b) SELECT a FROM t") == "with t as (select a from b) select a from t"
+
+    def test_params_in_key(self):
+        assert key("SELECT * FROM sales WHERE id = ?", params=[1]) != key("SELECT * FROM sales WHERE id = ?", params=[2])
+
+    def test_versions_in_key(self):
+        assert key("SELECT * FROM sales", {"sales": 1}) != key("SELECT * FROM sales", {"sales": 2})
+
+    def test_query_shape(self):
+        assert query_shape(normalize_sql("SELECT * FROM sales WHERE id = 5 AND region = 'EU'")) == (
+            "select * from sales where id = ? and region = ?"
+        )
+
+
+class TestReferencedTables:
+    """Tables are found regardless of case and quoting"""
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM Sales",
+        'SELECT * FROM "SALES"',
+        "SELECT * FROM [sales]",
+        "SELECT * FROM orders JOIN sales USING (id)",
+    ])
+    def test_found(self, sql):
+        assert "sales" in referenced_tables(normalize_sql(sql), ["sales", "customers"])
+
+    def test_literals_ignored(self):
+        assert referenced_tables(normalize_sql("SELECT 'sales' FROM orders"), ["sales", "orders"]) == ["orders"]
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT RANDOM() FROM sales",
+        "SELECT * FROM read_csv('x.csv')",
+        "SELECT * FROM sqlite_master",
+        "SELECT DATE('now') FROM sales",
+    ])
+    def test_volatile_not_cacheable(self, sql):
+        assert not is_cacheable(normalize_sql(sql))
+
+
+class TestQueryCache:
+    """Entries are evicted by budget and dropped when their tables change"""
+
+    @pytest.fixture
+    def frame(self):
+        return pd.DataFrame({"id": range(100)})
+
+    def test_hit_returns_copy(self, frame):
+        cache = QueryCache()
+        cache.put(key("SELECT id FROM sales"), frame)
+        cached = cache.get(key("select id from sales"))
+        cached.loc[0, "id"] = -1
+        assert cache.get(key("SELECT id FROM sales")).loc[0, "id"] == 0
+        assert cache.stats()["hits"] == 2
+
+    def test_invalidate_drops_readers_of_table(self, frame):
+        cache = QueryCache()
+        cache.put(key("SELECT id FROM sales"), frame)
+        cache.put(key("SELECT id FROM orders", {"orders": 1}), frame)
+        cache.invalidate("ns", ["sales"])
+        assert cache.get(key("SELECT id FROM sales")) is None
+        assert cache.get(key("SELECT id FROM orders", {"orders": 1})) is not None
+        assert cache.stats()["invalidations"] == 1
+
+    def test_namespaces_separate(self, frame):
+        cache = QueryCache()
+        cache.put(key("SELECT id FROM sales", namespace="a"), frame)
+        cache.invalidate("b", ["sales"])
+        assert cache.get(key("SELECT id FROM sales", namespace="a")) is not None
+        assert cache.get(key("SELECT id FROM sales", namespace="b")) is None
+
+    def test_least_recently_used_evicted(self, frame):
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        cache = QueryCache(max_bytes=size * 4)
+        for table in ("a", "b", "c"):
+            cache.put(key(f"SELECT id FROM {table}", {table: 1}), frame)
+        cache.get(key("SELECT id FROM a", {"a": 1}))
+        cache.put(key("SELECT id FROM d", {"d": 1}), frame)
+        cache.put(key("SELECT id FROM e", {"e": 1}), frame)
+        assert cache.get(key("SELECT id FROM a", {"a": 1})) is not None
+        assert cache.get(key("SELECT id FROM b", {"b": 1})) is None
+        assert cache.stats()["evictions"] == 1
+
+    def test_large_results_not_cached(self, frame):
+        cache = QueryCache(max_bytes=100)
+        cache.put(key("SELECT id FROM sales"), frame)
+        assert cache.stats()["entries"] == 0
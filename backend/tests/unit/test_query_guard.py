@@ -0,0 +1,149 @@
+"""
+Unit tests for the pre-execution query checks
+"""
+
+import sqlite3
+
+import pytest
+
+from app.core.catalog import TableInfo
+from app.core.query_guard import QueryRejectedError, check_query, limit_rows
+
+
+def table(name, rows, columns):
+    return TableInfo(name=name, row_count=rows, columns=columns, dtypes=["int64"] * len(columns))
+
+
+@pytest.fixture
+def catalog():
+    return {
+        "orders": table("orders", 100_000, ["order_id", "customer_id", "amount"]),
+        "customers": table("customers", 50_000, ["customer_id", "name"]),
+        "regions": table("regions", 10, ["region_id", "name"]),
+    }
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (a INTEGER, note TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, "limit" if i % 2 else "x") for i in range(50)])
+    conn.execute("CREATE TABLE u (a INTEGER)")
+    conn.executemany("INSERT INTO u VALUES (?)", [(i,) for i in range(50)])
+    yield conn
+    conn.close()
+
+
+class TestWriteRejection:
+    """Only read-only statements pass"""
+
+    @pytest.mark.parametrize("sql", [
+        "DELETE FROM orders",
+        "  update orders SET amount = 0",
+        "DROP TABLE orders",
+        "SELECT 1; DROP TABLE orders",
+        "ATTACH DATABASE 'x.db' AS x",
+        "PRAGMA foo; INSERT INTO orders VALUES (1, 2, 3)",
+        "/* harmless */ CREATE TABLE x (a)",
+        "COPY orders TO 'out.csv'",
+        "INSTALL httpfs",
+    ])
+    def test_rejected(self, catalog, sql):
+        with pytest.raises(QueryRejectedError, match="read-only"):
+            check_query(sql, catalog)
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM orders",
+        "WITH x AS (SELECT 1) SELECT * FROM x",
+        "SELECT 'DROP TABLE orders' AS text",
+        "SELECT * FROM orders -- DELETE FROM orders",
+        "EXPLAIN SELECT * FROM orders",
+    ])
+    def test_allowed(self, catalog, sql):
+        check_query(sql, catalog)
+
+
+class TestCartesianProducts:
+    """Tables combined without a condition are estimated against the limit"""
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM orders, customers",
+        "SELECT * FROM orders CROSS JOIN customers",
+        "SELECT * FROM orders o JOIN customers c ON 1 = 1",
+        "SELECT * FROM orders o, customers c WHERE o.amount > 10",
+        "SELECT COUNT(*) FROM (SELECT * FROM orders, customers)",
+    ])
+    def test_rejected(self, catalog, sql):
+        with pytest.raises(QueryRejectedError, match="without a join condition"):
+            check_query(sql, catalog, max_join_rows=1_000_000)
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM orders o JOIN customers c ON o.customer_id = c.customer_id",
+        "SELECT * FROM orders o, customers c WHERE o.customer_id = c.customer_id",
+        "SELECT * FROM orders JOIN customers USING (customer_id)",
+        "SELECT * FROM orders NATURAL JOIN customers",
+        "SELECT * FROM orders, regions",  # 1,000,000 rows: at the limit
+        "SELECT * FROM orders WHERE customer_id IN (SELECT customer_id FROM customers)",
+    ])
+    def test_allowed(self, catalog, sql):
+        check_query(sql, catalog, max_join_rows=1_000_000)
+
+    @pytest.mark.parametrize("condition", [
+        "LOWER(o.customer_id) = LOWER(c.customer_id)",
+        "TRIM(o.customer_id) = TRIM(c.customer_id)",
+        "o.customer_id = CAST(c.customer_id AS TEXT)",
+        "o.customer_id::VARCHAR = c.customer_id::VARCHAR",
+        "o.customer_id + 0 = c.customer_id",
+        "c.customer_id IN (o.customer_id)",
+        "o.amount > 0 AND COALESCE(o.customer_id, 0) = c.customer_id",
+        "o.customer_id = c.unknown_column",
+    ])
+    def test_expression_join_keys_allowed(self, catalog, condition):
+        check_query(f"SELECT * FROM orders o JOIN customers c ON {condition}", catalog, max_join_rows=1_000_000)
+
+    def test_expression_in_where_allowed(self, catalog):
+        check_query(
+            "SELECT * FROM orders o, customers c WHERE LOWER(o.customer_id) = LOWER(c.customer_id)",
+            catalog, max_join_rows=1_000_000
+        )
+
+    def test_condition_on_one_table_rejected(self, catalog):
+        with pytest.raises(QueryRejectedError, match="without a join condition"):
+            check_query("SELECT * FROM orders o JOIN customers c ON LOWER(c.name) = 'x'", catalog, max_join_rows=1_000_000)
+
+    def test_check_off(self, catalog):
+        check_query("SELECT * FROM orders, customers", catalog, max_join_rows=0)
+
+    def test_unknown_tables_let_through(self, catalog):
+        check_query("SELECT * FROM orders, some_view", catalog, max_join_rows=1)
+
+
+class TestLimitRows:
+    """A LIMIT is added to row-returning queries without one at top level"""
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM t",
+        "SELECT * FROM t;",
+        "SELECT * FROM t -- all rows",
+        "SELECT * FROM t /* c */;",
+        "SELECT * FROM t ORDER BY a -- by a\n",
+        "WITH c AS (SELECT * FROM t LIMIT 40) SELECT * FROM c",
+        "SELECT a FROM t UNION ALL SELECT a FROM u",
+        "SELECT * FROM t WHERE note = 'limit'",
+        "SELECT * FROM t WHERE a IN (SELECT a FROM u LIMIT 30)",
+    ])
+    def test_limited(self, conn, sql):
+        limited = limit_rows(sql, 10)
+        assert limited is not None
+        assert len(conn.execute(limited).fetchall()) == 10
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM t LIMIT 3",
+        "SELECT * FROM t LIMIT 3 OFFSET 2",
+        "SELECT 1; SELECT 2",
+        "PRAGMA table_info(t)",
+        "EXPLAIN QUERY PLAN SELECT * FROM t",
+        "",
+    ])
+    def test_left_alone(self, sql):
+        assert limit_rows(sql, 10) is None
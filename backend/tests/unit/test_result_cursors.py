@@ -0,0 +1,95 @@
+"""
+Unit tests for paginated result snapshots
+"""
+
+import pandas as pd
+import pytest
+
+from app.core.result_cursors import CursorExpiredError, ResultCursors
+
+
+@pytest.fixture
+def result():
+    return pd.DataFrame({"id": range(25)})
+
+
+def pages(cursors, token, page_size=10, owner="s1", query="q"):
+    while token:
+        rows, total, token = cursors.page(token, page_size, owner, query)
+        yield rows["id"].tolist(), total
+
+
+class TestPaging:
+    """Pages are consecutive slices of one snapshot"""
+
+    def test_all_rows_once(self, result):
+        cursors = ResultCursors()
+        token = cursors.open(result, "s1", "q")
+        seen = list(pages(cursors, token))
+        assert [rows for rows, _ in seen] == [list(range(10)), list(range(10, 20)), list(range(20, 25))]
+        assert {total for _, total in seen} == {25}
+
+    def test_token_reusable(self, result):
+        cursors = ResultCursors()
+        token = cursors.open(result, "s1", "q")
+        _, _, second = cursors.page(token, 10, "s1", "q")
+        assert cursors.page(second, 10, "s1", "q")[0]["id"].iloc[0] == 10
+        assert cursors.page(second, 10, "s1", "q")[0]["id"].iloc[0] == 10
+
+    def test_empty_result(self):
+        cursors = ResultCursors()
+        token = cursors.open(pd.DataFrame({"id": []}), "s1", "q")
+        rows, total, next_token = cursors.page(token, 10, "s1", "q")
+        assert (len(rows), total, next_token) == (0, 0, None)
+
+
+class TestAccess:
+    """Cursors only work for their session and query, and expire"""
+
+    def test_other_session(self, result):
+        cursors = ResultCursors()
+        token = cursors.open(result, "s1", "q")
+        with pytest.raises(CursorExpiredError):
+            cursors.page(token, 10, "s2", "q")
+
+    def test_other_query(self, result):
+        cursors = ResultCursors()
+        token = cursors.open(result, "s1", "q")
+        with pytest.raises(ValueError):
+            cursors.page(token, 10, "s1", "other")
+
+    @pytest.mark.parametrize("token", ["", "abc", "abc.", "abc.x", "unknown.0"])
+    def test_invalid_token(self, token):
+        with pytest.raises(CursorExpiredError):
+            ResultCursors().page(token, 10, "s1", "q")
+
+    def test_expired(self, result, monkeypatch):
+        clock = [1000.0]
+        monkeypatch.setattr("app.core.result_cursors.time.monotonic", lambda: clock[0])
+        cursors = ResultCursors(ttl_s=60)
+        token = cursors.open(result, "s1", "q")
+        clock[0] += 30
+        cursors.page(token, 10, "s1", "q")
+        clock[0] += 61
+        with pytest.raises(CursorExpiredError):
+            cursors.page(token, 10, "s1", "q")
+        assert cursors.total_bytes == 0
+
+
+class TestBudget:
+    """Snapshots are bounded by bytes, least recently used evicted first"""
+
+    def test_oldest_evicted(self, result):
+        size = int(result.memory_usage(index=True, deep=True).sum())
+        cursors = ResultCursors(max_bytes=size * 2)
+        first = cursors.open(result, "s1", "q")
+        second = cursors.open(result, "s1", "q")
+        cursors.page(first, 10, "s1", "q")
+        cursors.open(result, "s1", "q")
+        cursors.page(first, 10, "s1", "q")
+        with pytest.raises(CursorExpiredError):
+            cursors.page(second, 10, "s1", "q")
+
+    def test_too_large(self, result):
+        with pytest.raises(ValueError, match="too large"):
+            ResultCursors(max_bytes=10).open(result, "s1", "q")
@@ -0,0 +1,101 @@
+"""
+Unit tests for streamed result encodings and the spool
+"""
+
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+from app.core.result_stream import SpooledStream, encode_batches
+
+
+def read_all(stream):
+    return b"".join(stream)
+
+
+class TestEncodeBatches:
+    """Batches encode as one continuous document"""
+
+    @pytest.fixture
+    def batches(self):
+        return [pd.DataFrame({"id": [1, 2], "name": ["a", "b"]}), pd.DataFrame({"id": [3], "name": ["c"]})]
+
+    def test_ndjson(self, batches):
+        lines = b"".join(encode_batches(batches, "ndjson")).decode().splitlines()
+        assert lines == ['{"id":1,"name":"a"}', '{"id":2,"name":"b"}', '{"id":3,"name":"c"}']
+
+    def test_ndjson_floats_full_precision(self):
+        values = [1.23456789012e-7, 0.1 + 0.2, 123456789.123456789, None]
+        batch = pd.DataFrame({"name": ["a", "b", "c", "d"], "value": values})
+        lines = b"".join(encode_batches([batch], "ndjson")).decode().splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"name": name, "value": value} for name, value in zip("abcd", values)
+        ]
+
+    def test_csv_has_one_header(self, batches):
+        text = b"".join(encode_batches(batches, "csv")).decode()
+        assert text.splitlines() == ["id,name", "1,a", "2,b", "3,c"]
+
+    def test_arrow_round_trip(self, batches):
+        pa = pytest.importorskip("pyarrow")
+        table = pa.ipc.open_stream(b"".join(encode_batches(batches, "arrow"))).read_all()
+        assert table.column("id").to_pylist() == [1, 2, 3]
+
+    def test_unknown_format(self, batches):
+        with pytest.raises(ValueError):
+            encode_batches(batches, "xml")
+
+
+class TestSpooledStream:
+    """The producer runs at its own speed and always releases its source"""
+
+    def test_chunks_in_order(self):
+        assert read_all(SpooledStream(iter([b"ab", b"", b"cd", b"e"]))) == b"abcde"
+
+    def test_large_chunks_read_in_parts(self):
+        stream = SpooledStream(iter([b"x" * 10]), read_size=4)
+        assert [len(chunk) for chunk in stream] == [4, 4, 2]
+
+    def test_source_released_without_reader(self):
+        done = threading.Event()
+        SpooledStream(iter([b"a"] * 100), on_done=done.set)
+        assert done.wait(5)
+
+    def test_source_released_before_slow_reader_finishes(self):
+        done = threading.Event()
+        stream = iter(SpooledStream(iter([b"a", b"b", b"c"]), on_done=done.set))
+        first = next(stream)
+        assert done.wait(5)
+        assert first + b"".join(stream) == b"abc"
+
+    def test_error_raised_after_chunks(self):
+        def failing():
+            yield b"rows"
+            raise RuntimeError("lost connection")
+
+        received = []
+        with pytest.raises(RuntimeError, match="lost connection"):
+            for chunk in SpooledStream(failing()):
+                received.append(chunk)
+        assert received == [b"rows"]
+
+    def test_close_stops_producer(self):
+        release = threading.Event()
+        done = threading.Event()
+        produced = []
+
+        def slow():
+            for chunk in (b"a", b"b", b"c"):
+                release.wait(5)
+                produced.append(chunk)
+                yield chunk
+
+        stream = SpooledStream(slow(), on_done=done.set)
+        stream.close()
+        release.set()
+        assert done.wait(5)
+        assert len(produced) == 1
+        assert read_all(stream) == b""
+        stream.close()
@@ -0,0 +1,228 @@
+"""
+Unit tests for session budgets and quotas
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.excel_processor import DatabaseSizeError, ExcelProcessor, LoadOptions
+from app.core.ingestion import IngestionError
+from app.core.sessions import SessionBusyError, SessionManager, SessionQuotaError
+
+MB = 1024 * 1024
+
+
+class FakeProcessor:
+    """Processor stand-in that counts size measurements"""
+
+    def __init__(self, size=0):
+        self.size = size
+        self.data_version = 0
+        self.catalog = {}
+        self.measurements = 0
+        self.closed = False
+        self.dropped = []
+        self.engine = SimpleNamespace(delete_files=lambda: None)
+
+    def write(self, size):
+        self.size = size
+        self.data_version += 1
+
+    def database_size(self):
+        self.measurements += 1
+        return self.size
+
+    def drop_tables(self, table_names):
+        self.dropped.extend(table_names)
+        self.data_version += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def processors():
+    return {}
+
+
+@pytest.fixture
+def manager(processors):
+    def factory(session_id):
+        processors[session_id] = FakeProcessor()
+        return processors[session_id]
+
+    return SessionManager(FakeProcessor(), factory, max_sessions=10, max_total_mb=10, session_quota_mb=4, session_max_tables=2)
+
+
+class TestBudget:
+    """Idle sessions are evicted from cached sizes"""
+
+    def test_size_measured_after_writes_only(self, manager, processors):
+        with manager.use("a") as processor:
+            processor.write(2 * MB)
+        manager.flush()
+        assert processor.measurements == 1
+        assert manager.sessions["a"].size == 2 * MB
+
+        with manager.use("a"):
+            pass
+        manager.flush()
+        assert processor.measurements == 1
+
+    def test_enforce_budget_does_not_measure(self, manager, processors):
+        with manager.use("a") as processor:
+            processor.write(MB)
+        manager.flush()
+        manager.enforce_budget()
+        manager.stats()
+        assert processor.measurements == 1
+
+    def test_least_recently_used_evicted_first(self, manager, processors):
+        for session_id in ("a", "b", "c"):
+            with manager.use(session_id) as processor:
+                processor.write(4 * MB)
+        manager.flush()
+        assert list(manager.sessions) == ["b", "c"]
+        assert processors["a"].closed
+
+    def test_active_sessions_kept(self, manager, processors):
+        with manager.use("a") as processor:
+            processor.write(6 * MB)
+            with manager.use("b") as other:
+                other.write(6 * MB)
+            manager.flush()
+            assert "a" in manager.sessions
+        manager.flush()
+        assert list(manager.sessions) == ["b"]
+
+    def test_session_count_limit(self, processors):
+        manager = SessionManager(FakeProcessor(), lambda session_id: FakeProcessor(), max_sessions=2)
+        for session_id in ("a", "b", "c"):
+            with manager.use(session_id):
+                pass
+        manager.flush()
+        assert list(manager.sessions) == ["b", "c"]
+
+    def test_released_on_worker_thread(self, manager, processors):
+        threads = []
+        with manager.use("a") as processor:
+            processor.database_size = lambda: threads.append(threading.current_thread()) or MB
+            processor.write(MB)
+        manager.flush()
+        assert threads and threads[0] is not threading.current_thread()
+        assert manager.sessions["a"].active == 0
+
+
+class TestOpen:
+    """Processors of new sessions are created outside the manager's lock"""
+
+    def test_factory_runs_unlocked(self):
+        def factory(session_id):
+            # Another thread can use the manager while a processor is created
+            other = threading.Thread(target=manager.stats)
+            other.start()
+            other.join(timeout=5)
+            assert not other.is_alive()
+            return FakeProcessor()
+
+        manager = SessionManager(FakeProcessor(), factory)
+        with manager.use("a"):
+            assert "a" in manager.sessions
+
+    def test_concurrent_open_keeps_one_processor(self):
+        created = []
+
+        def factory(session_id):
+            processor = FakeProcessor()
+            created.append(processor)
+            if len(created) == 1:
+                # A second request opens the same session meanwhile
+                with manager.use(session_id):
+                    pass
+            return processor
+
+        manager = SessionManager(FakeProcessor(), factory)
+        with manager.use("a") as processor:
+            assert processor is created[1]
+        manager.flush()
+        assert created[0].closed and not created[1].closed
+        assert manager.sessions["a"].active == 0
+
+
+class TestDrop:
+    """Sessions in use cannot be dropped"""
+
+    def test_active_session_refused(self, manager, processors):
+        with manager.use("a"):
+            with pytest.raises(SessionBusyError):
+                manager.drop("a")
+            assert not processors["a"].closed
+        manager.flush()
+        assert manager.drop("a")
+        assert processors["a"].closed
+
+    def test_unknown_session(self, manager):
+        assert not manager.drop("missing")
+
+
+class TestQuota:
+    """Loads over the per-session quota are undone"""
+
+    def test_new_tables_dropped(self, manager):
+        with manager.use("a") as processor:
+            processor.write(5 * MB)
+            processor.catalog = {"t1": None}
+            with pytest.raises(SessionQuotaError):
+                manager.check_quota(processor, ["t1"])
+        assert processor.dropped == ["t1"]
+
+    def test_table_count(self, manager):
+        with manager.use("a") as processor:
+            processor.catalog = {"t1": None, "t2": None, "t3": None}
+            with pytest.raises(SessionQuotaError):
+                manager.check_quota(processor, ["t3"])
+
+    def test_within_quota(self, manager):
+        with manager.use("a") as processor:
+            processor.write(MB)
+            manager.check_quota(processor, [])
+        assert processor.dropped == []
+
+    def test_default_processor_exempt(self, manager):
+        manager.default.write(100 * MB)
+        manager.check_quota(manager.default, ["t1"])
+        assert manager.default.dropped == []
+
+
+class TestAppendSizeLimit:
+    """Appends that would exceed the size limit leave the table unchanged"""
+
+    @pytest.fixture
+    def processor(self):
+        processor = ExcelProcessor(workers=1, quality_checks=False, max_database_mb=1)
+        yield processor
+        processor.close()
+
+    @staticmethod
+    def write_csv(path, rows, start=0):
+        path.write_text("id,note\n" + "".join(f"{i},{'x' * 60}-{i}\n" for i in range(start, start + rows)))
+        return path
+
+    def test_oversized_append_refused(self, processor, tmp_path):
+        processor.load_excel_files([self.write_csv(tmp_path / "orders.csv", 100)])
+        with pytest.raises(IngestionError) as excinfo:
+            processor.load_excel_files(
+                [self.write_csv(tmp_path / "more.csv", 30_000)], options=LoadOptions(mode="append", base_name="orders")
+            )
+        assert isinstance(excinfo.value.error, DatabaseSizeError)
+        assert processor.execute_query("SELECT COUNT(*) AS n FROM orders")["n"].iloc[0] == 100
+        assert processor.engine.table_names() == ["orders"]
+
+    def test_small_append_allowed(self, processor, tmp_path):
+        processor.load_excel_files([self.write_csv(tmp_path / "orders.csv", 100)])
+        processor.load_excel_files(
+            [self.write_csv(tmp_path / "more.csv", 100, start=100)], options=LoadOptions(mode="append", base_name="orders")
+        )
+        assert processor.execute_query("SELECT COUNT(*) AS n FROM orders")["n"].iloc[0] == 200
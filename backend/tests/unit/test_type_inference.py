@@ -0,0 +1,64 @@
+"""
+Unit tests for dtype inference of parsed sheets
+"""
+
+import pandas as pd
+import pytest
+
+from app.core.type_inference import optimize_dtypes
+
+
+def infer(values):
+    return optimize_dtypes(pd.DataFrame({"col": values}))["col"]
+
+
+class TestNumericStrings:
+    """Text columns become numbers only if no value would change"""
+
+    @pytest.mark.parametrize("values", [
+        ["00123", "04567", "98765"],  # ZIP codes
+        ["0001", "0002", "0010"],  # SKUs
+        ["1e5", "2e3", "7"],
+        [" 12", "13 ", "14"],
+        ["-007", "5", "6"],
+        ["12", "abc", "14"],
+    ])
+    def test_codes_stay_text(self, values):
+        result = infer(values)
+        assert not pd.api.types.is_numeric_dtype(result)
+        assert result.astype(str).tolist() == values
+
+    def test_integers_parsed(self):
+        result = infer(["12", "-3", "0", None])
+        assert pd.api.types.is_integer_dtype(result)
+        assert result.tolist()[:3] == [12, -3, 0]
+        assert pd.isna(result.iloc[3])
+
+    def test_decimals_parsed(self):
+        result = infer(["0.5", "12.25", "-0.75", ".5"])
+        assert pd.api.types.is_float_dtype(result)
+        assert result.tolist() == [0.5, 12.25, -0.75, 0.5]
+
+    def test_mixed_numbers_and_numeric_text(self):
+        result = infer([1, "2", 3.5])
+        assert pd.api.types.is_float_dtype(result)
+        assert result.tolist() == [1.0, 2.0, 3.5]
+
+
+class TestCompactDtypes:
+    """Numbers are downcast without changing values"""
+
+    def test_whole_floats_become_integers(self):
+        result = infer([1.0, None, 3.0])
+        assert pd.api.types.is_integer_dtype(result)
+        assert result.dropna().tolist() == [1, 3]
+
+    def test_float_precision_kept(self):
+        assert infer([0.1, 0.2]).tolist() == [0.1, 0.2]
+
+    def test_repeated_text_becomes_category(self):
+        assert isinstance(infer(["a", "b", "a", "a"]).dtype, pd.CategoricalDtype)
+
+    def test_date_strings_parsed(self):
+        result = infer(["2024-01-02", "2024-02-03"])
+        assert pd.api.types.is_datetime64_any_dtype(result)